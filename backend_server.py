@@ -1,16 +1,27 @@
+import os
+import json
+import uuid
+import asyncio
 import uvicorn
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from crew_runner import ResearchGraph
-from tools.rag_tools import load_and_embed_notebooks
+from tools.delegation_tools import fanout_complete
+from tools.rag_tools import start_background_indexing, embedding_function
+from utils.job_queue import JobQueue, JobQueueFull, current_job_id
+from utils.llm_scheduler import get_scheduler, llm_job
+from utils.metrics import install_metrics
+from utils.research_cache import ResearchCache
 
-# --- THE FIX: Run the RAG tool setup ONCE on startup ---
+# --- THE FIX: Sync the RAG knowledge base ONCE on startup, in the background ---
+# Only new/changed/deleted notebooks are re-embedded, and requests are served
+# against the last good index while the sync runs.
 print("--- [BackendServer] Starting... ---")
-print("--- [BackendServer] Initializing DLAI Knowledge Base... ---")
+print("--- [BackendServer] Syncing DLAI Knowledge Base in the background... ---")
 try:
-    load_and_embed_notebooks()
-    print("--- [BackendServer] DLAI Knowledge Base is READY. ---")
+    start_background_indexing()
 except Exception as e:
     print(f"--- [BackendServer] CRITICAL: Failed to initialize RAG tools: {e} ---")
 # ---
@@ -23,6 +34,7 @@ except Exception as e:
     print(f"--- [BackendServer] CRITICAL: Failed to initialize ResearchGraph: {e} ---")
 
 app = FastAPI()
+install_metrics(app, "backend")  # GET /metrics + route timings
 
 # CORS Middleware for frontend
 app.add_middleware(
@@ -36,31 +48,243 @@ app.add_middleware(
 class ResearchRequest(BaseModel):
     topic: str
     plan: str
+    bypass_cache: bool = False  # Force a fresh run past the research and LLM caches (results still refresh them)
+
+# --- RESEARCH RESULT CACHE ---
+# Finished runs are cached on the normalised (topic, plan). Near-duplicate
+# topics are matched with the same MiniLM embeddings as the RAG tool.
+# Set RESEARCH_CACHE_SIMILARITY=0 for exact matches only.
+research_cache = ResearchCache(
+    db_path=os.environ.get("RESEARCH_CACHE_DB", "research_cache.sqlite3"),
+    ttl_s=float(os.environ.get("RESEARCH_CACHE_TTL_S", 24 * 3600)),
+    max_entries=int(os.environ.get("RESEARCH_CACHE_MAX_ENTRIES", 500)),
+    similarity_threshold=float(os.environ.get("RESEARCH_CACHE_SIMILARITY", 0.95)),
+    embed_fn=embedding_function.embed_query,
+)
+
+async def cached_research(topic: str, plan: str, bypass: bool = False) -> dict:
+    """Returns a cache hit for (topic, plan), or None. Embedding runs off the event loop."""
+    try:
+        hit = await asyncio.to_thread(research_cache.get, topic, plan, bypass)
+    except Exception as e:
+        print(f"--- [BackendServer] WARNING: research cache lookup failed: {e} ---")
+        return None
+    if hit:
+        print(f"--- [BackendServer] Research cache hit ({hit['match']}, {hit['similarity']}) for: {topic} ---")
+    return hit
+
+async def store_research(topic: str, plan: str, result: dict):
+    try:
+        await asyncio.to_thread(research_cache.put, topic, plan, result)
+    except Exception as e:
+        print(f"--- [BackendServer] WARNING: research cache store failed: {e} ---")
+
+# --- RESEARCH JOB QUEUE ---
+# Every research run goes through a bounded queue drained by a fixed number of
+# graph workers, so a burst of topics can't pile onto the single Ollama
+# instance. The queue answers 429 when full, and jobs live in SQLite, so
+# queued work survives a restart. Finished jobs are kept for
+# RESEARCH_JOB_TTL_S, and only the newest RESEARCH_JOB_KEEP of them.
+RESEARCH_WORKERS = int(os.environ.get("RESEARCH_WORKERS", 2))
+RESEARCH_MAX_QUEUED = int(os.environ.get("RESEARCH_MAX_QUEUED", 20))
+RESEARCH_JOB_DB = os.environ.get("RESEARCH_JOB_DB", "research_jobs.sqlite3")
+RESEARCH_JOB_KEEP = int(os.environ.get("RESEARCH_JOB_KEEP", 1000))
+RESEARCH_JOB_TTL_S = float(os.environ.get("RESEARCH_JOB_TTL_S", 7 * 24 * 3600))
+
+# Progress events of streamed jobs, per job id, for the SSE relay to read.
+job_progress = {}
+
+async def run_research_job(payload: dict) -> dict:
+    """Runs one research job through the graph (called by the queue workers)."""
+    initial_state = {"research_topic": payload["topic"], "plan": payload["plan"],
+                     "bypass_cache": payload.get("bypass_cache", False)}
+    job_id = current_job_id.get() or uuid.uuid4().hex
+
+    # LLM calls are queued (and token-counted) under this job's id
+    with llm_job(job_id):
+        if payload.get("stream"):
+            print(f"--- [BackendServer] Streaming ResearchGraph for: {payload['topic']} ---")
+            # No queue means nobody is listening (e.g. a job recovered after a restart)
+            progress = job_progress.get(job_id)
+            if progress is not None:
+                progress.put_nowait({"type": "status", "message": "Research started."})
+            result = {"partial": True}  # Until the done event says otherwise
+            async for event in research_graph.astream_research(initial_state):
+                if event["type"] == "done":
+                    result = event  # Sent by the relay once the job is recorded as completed
+                elif progress is not None:
+                    progress.put_nowait(event)
+        else:
+            # Use .ainvoke() for the async graph
+            print(f"--- [BackendServer] A-Invoking ResearchGraph for: {payload['topic']} ---")
+            result = await research_graph.graph.ainvoke(initial_state)
+            result = {**result, "partial": not fanout_complete(result.get("research_context"))}
+    print("--- [BackendServer] ResearchGraph A-Invoke Complete. ---")
+    draft = result.get("draft")
+    # Only a complete run is worth serving to similar topics for a day
+    if draft and not result["partial"]:
+        await store_research(payload["topic"], payload["plan"], {"draft": draft})
+    else:
+        print(f"--- [BackendServer] Not caching an incomplete run for: {payload['topic']} ---")
+    return {"draft": draft or "No draft found."}
+
+job_queue = JobQueue(run_research_job, db_path=RESEARCH_JOB_DB,
+                     max_queued=RESEARCH_MAX_QUEUED, workers=RESEARCH_WORKERS,
+                     keep_finished=RESEARCH_JOB_KEEP, finished_ttl_s=RESEARCH_JOB_TTL_S)
+
+@app.on_event("startup")
+async def start_job_queue():
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+
+async def submit_job_or_429(request: ResearchRequest, stream: bool = False) -> dict:
+    """Records a cache hit as an already-completed job; otherwise queues a run."""
+    payload = {"topic": request.topic, "plan": request.plan, "bypass_cache": request.bypass_cache}
+    if stream:
+        payload["stream"] = True
+    hit = await cached_research(request.topic, request.plan, request.bypass_cache)
+    try:
+        return job_queue.submit(payload, result=hit["result"] if hit else None)
+    except JobQueueFull as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+def get_job_or_404(job_id: str) -> dict:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job id: {job_id}")
+    return job
+
+def job_status(job: dict) -> dict:
+    return {k: job[k] for k in ("id", "status", "error", "created_at", "started_at",
+                                "finished_at", "queue_wait_s", "run_s")}
+
+@app.post("/jobs", status_code=202)
+async def submit_research_job(request: ResearchRequest):
+    """Queues a research run and returns its job id right away."""
+    print(f"--- [BackendServer] Queuing research job for: {request.topic} ---")
+    return job_status(await submit_job_or_429(request))
+
+@app.get("/jobs")
+async def get_job_queue_stats():
+    return job_queue.stats()
+
+@app.get("/cache/stats")
+async def get_research_cache_stats():
+    llm_cache = research_graph.completion_cache
+    return {**research_cache.stats(), "llm_completions": llm_cache.stats() if llm_cache is not None else None}
+
+@app.get("/llm/stats")
+async def get_llm_scheduler_stats():
+    """Ollama admission queue: in-flight requests, queue depth, wait times and per-job tokens."""
+    return get_scheduler().stats()
+
+@app.get("/jobs/{job_id}")
+async def get_research_job(job_id: str):
+    return job_status(get_job_or_404(job_id))
+
+@app.get("/jobs/{job_id}/result")
+async def get_research_job_result(job_id: str):
+    job = get_job_or_404(job_id)
+    if job["status"] != "completed":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job['status']}, not completed.")
+    return {**job_status(job), "result": job["result"]["draft"]}
+
+@app.delete("/jobs/{job_id}")
+async def cancel_research_job(job_id: str):
+    get_job_or_404(job_id)
+    return job_status(job_queue.cancel(job_id))
 
 # --- THE FINAL ASYNC FIX ---
 @app.post("/run-research")
 async def run_research(request: ResearchRequest):
     """
     Asynchronously runs the research graph.
+    Goes through the job queue and waits for the result.
     """
     print(f"--- [BackendServer] Received research request for: {request.topic} ---")
+    job = await submit_job_or_429(request)
     try:
-        topic = request.topic
-        plan = request.plan
-        
-        initial_state = {"research_topic": topic, "plan": plan}
-        
-        # Use .ainvoke() for the async graph
-        print("--- [BackendServer] A-Invoking ResearchGraph... ---")
-        result = await research_graph.graph.ainvoke(initial_state)
-        print("--- [BackendServer] ResearchGraph A-Invoke Complete. ---")
-        
-        final_draft = result.get('draft', 'No draft found.')
-        return {"result": final_draft}
-        
-    except Exception as e:
-        print(f"--- [BackendServer] ERROR during research: {e} ---")
-        return {"result": f"An error occurred: {str(e)}"}
+        job = await job_queue.wait(job["id"])
+    except asyncio.CancelledError:
+        # Client went away: don't keep its job in the queue.
+        job_queue.cancel(job["id"])
+        raise
+    
+    if job["status"] == "completed":
+        return {"result": job["result"]["draft"]}
+    print(f"--- [BackendServer] ERROR during research: {job['error'] or job['status']} ---")
+    return {"result": f"An error occurred: {job['error'] or 'job ' + job['status']}"}
+
+# --- STREAMING VARIANT (Server-Sent Events) ---
+# Emits the Planner output, each 5W1H crew result as it lands and the Writer's
+# tokens, so the UI shows progress right away and proxies see a live socket.
+# Streamed runs are jobs like any other: they wait for a queue worker, count
+# against RESEARCH_MAX_QUEUED (429 when full) and relay the job's progress.
+SSE_PING_SECONDS = 15
+
+def format_sse(event_type: str, data: dict) -> str:
+    return f"event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+async def research_event_stream(job: dict):
+    """Relays a streamed job's progress events as SSE, with keep-alive pings while idle."""
+    job_id = job["id"]
+    if job["status"] == "completed":
+        yield format_sse("done", {"type": "done", "draft": job["result"]["draft"], "cached": True})
+        return
+
+    progress = job_progress.setdefault(job_id, asyncio.Queue())
+    finished = asyncio.create_task(job_queue.wait(job_id))
+    try:
+        yield format_sse("status", {"type": "status", "message": "Research queued.", "job_id": job_id})
+        while True:
+            getter = asyncio.create_task(progress.get())
+            done, _ = await asyncio.wait({getter, finished}, timeout=SSE_PING_SECONDS,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if getter in done:
+                event = getter.result()
+                yield format_sse(event["type"], event)
+                continue
+            getter.cancel()
+            if finished not in done:
+                yield ": ping\n\n"
+                continue
+            while not progress.empty():
+                event = progress.get_nowait()
+                yield format_sse(event["type"], event)
+            job = finished.result()
+            if job["status"] == "completed":
+                yield format_sse("done", {"type": "done", "draft": job["result"]["draft"]})
+            else:
+                print(f"--- [BackendServer] ERROR during streamed research: {job['error'] or job['status']} ---")
+                yield format_sse("error", {"type": "error",
+                                           "error": f"An error occurred: {job['error'] or 'job ' + job['status']}"})
+            break
+    finally:
+        finished.cancel()
+        job_progress.pop(job_id, None)
+        # Client went away (or we finished): don't leave the job queued or running.
+        job_queue.cancel(job_id)
+
+@app.get("/run-research/stream")
+async def run_research_stream(topic: str, plan: str = "", bypass_cache: bool = False):
+    """
+    Streaming variant of /run-research (text/event-stream).
+    Event types: status, planner, crew_result, token, done, error.
+    Answers 429 when the research queue is full.
+    """
+    print(f"--- [BackendServer] Received streaming research request for: {topic} ---")
+    job = await submit_job_or_429(ResearchRequest(topic=topic, plan=plan, bypass_cache=bypass_cache), stream=True)
+    if job["status"] != "completed":
+        # Registered before any await, so a worker picking the job up at once finds it
+        job_progress[job["id"]] = asyncio.Queue()
+    return StreamingResponse(
+        research_event_stream(job),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 if __name__ == "__main__":
     print("--- [BackendServer] Starting Uvicorn on http://0.0.0.0:8000 ---")
@@ -0,0 +1,280 @@
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import traceback
+
+# --- OFFLINE BENCHMARK SUITE ---
+# Starts local stand-ins (fake Ollama, fake 5W1H crews, fake quantum server),
+# points the project at them and drives each scenario at a fixed
+# concurrency. Latency percentiles and throughput go to a JSON file that
+# can be diffed between commits.
+#
+#   python -m bench.run_benchmarks --scenarios delegate,executor --requests 50 --concurrency 8
+#
+# Scenarios:
+#   delegate  - delegate_to_5w1h_crews against the fake crews
+#   rag       - search_dlai_knowledge_base (needs the MiniLM model available locally)
+#   executor  - code_executor_server POST /execute
+#   quantum   - the Run Quantum Circuit tool against the fake quantum server
+#   research  - backend_server POST /run-research end to end (fake Ollama + fake crews)
+# A scenario that can't start (e.g. a missing model) is reported as skipped.
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from bench.stubs import StubServer, fake_ollama_app, fake_crews_app, fake_quantum_app  # noqa: E402
+
+ALL_SCENARIOS = ("delegate", "rag", "executor", "quantum", "research")
+
+RAG_QUERIES = [
+    "How do I build a RAG pipeline with LangChain?",
+    "What is retrieval augmented generation?",
+    "How do embeddings work?",
+    "How do I evaluate an LLM application?",
+    "What is a vector database?",
+    "How do agents use tools?",
+    "How does fine-tuning differ from prompting?",
+    "What is chunking in document retrieval?",
+]
+
+EXECUTOR_CODE = "    total = sum(i * i for i in range(10000))\n    print(total)"
+
+BELL_QASM = 'OPENQASM 2.0;\ninclude "qelib1.inc";\nqreg q[2];\ncreg c[2];\nh q[0];\ncx q[0],q[1];\nmeasure q -> c;'
+
+
+def percentile(sorted_values: list, p: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(max(1, math.ceil(p / 100.0 * len(sorted_values))), len(sorted_values))
+    return sorted_values[rank - 1]
+
+
+def summarise(latencies: list, errors: int, wall_s: float, extra: dict = None) -> dict:
+    values = sorted(latencies)
+    total = len(values) + errors
+    return {
+        "requests": total,
+        "ok": len(values),
+        "errors": errors,
+        "wall_s": round(wall_s, 4),
+        "throughput_rps": round(total / wall_s, 3) if wall_s else 0.0,
+        "latency_s": {
+            "p50": round(percentile(values, 50), 4),
+            "p95": round(percentile(values, 95), 4),
+            "p99": round(percentile(values, 99), 4),
+            "mean": round(sum(values) / len(values), 4) if values else 0.0,
+            "max": round(values[-1], 4) if values else 0.0,
+        },
+        **(extra or {}),
+    }
+
+
+async def drive(call, requests: int, concurrency: int, warmup: int = 0) -> dict:
+    """Runs `await call(i)` requests times with at most concurrency in flight."""
+    for i in range(warmup):
+        await call(-1 - i)
+    latencies, errors, notes = [], 0, {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                note = await call(i)
+                latencies.append(time.perf_counter() - started)
+                if note:
+                    notes[note] = notes.get(note, 0) + 1
+            except Exception as e:
+                errors += 1
+                key = f"error: {type(e).__name__}"
+                notes[key] = notes.get(key, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return summarise(latencies, errors, time.perf_counter() - started, {"notes": notes} if notes else None)
+
+
+# --- scenarios: each returns an async call(i) ---
+
+async def setup_delegate(stubs: dict, args):
+    from tools.delegation_tools import delegate_to_5w1h_crews
+
+    async def call(i):
+        result = await delegate_to_5w1h_crews.ainvoke({"topic": f"benchmark topic {i}", "plan": "benchmark plan"})
+        return "partial" if result.get("_meta", {}).get("partial") else None
+    return call
+
+
+async def setup_rag(stubs: dict, args):
+    from tools.rag_tools import search_dlai_knowledge_base, index_ready, start_background_indexing
+    start_background_indexing()
+    await asyncio.to_thread(index_ready.wait, args.index_timeout)
+
+    async def call(i):
+        await asyncio.to_thread(search_dlai_knowledge_base, RAG_QUERIES[i % len(RAG_QUERIES)])
+    return call
+
+
+async def setup_executor(stubs: dict, args):
+    import httpx
+    import code_executor_server
+    server = stubs["executor"] = StubServer(code_executor_server.app).start()
+    client = httpx.AsyncClient(base_url=server.url, timeout=60.0)
+
+    async def call(i):
+        response = await client.post("/execute", json={"code": EXECUTOR_CODE, "permission": True})
+        response.raise_for_status()
+        if response.json().get("status") != "COMPLETED":
+            raise RuntimeError(response.json().get("error"))
+    return call
+
+
+async def setup_quantum(stubs: dict, args):
+    from tools import quantum_tools
+    quantum_tools.QUANTUM_SERVER_URL = stubs["quantum"].url
+
+    async def call(i):
+        result = await asyncio.to_thread(
+            quantum_tools.run_quantum_circuit.invoke, {"qasm_circuit": BELL_QASM, "device_id": "fake_simulator", "shots": 100}
+        )
+        if "Error" in result:
+            raise RuntimeError(result)
+    return call
+
+
+async def setup_research(stubs: dict, args):
+    import httpx
+    import backend_server
+    if not hasattr(backend_server, "research_graph"):
+        raise RuntimeError("backend_server could not build its ResearchGraph (see log above)")
+    server = stubs["backend"] = StubServer(backend_server.app).start()
+    client = httpx.AsyncClient(base_url=server.url, timeout=args.research_timeout)
+
+    async def call(i):
+        response = await client.post("/run-research", json={
+            "topic": f"benchmark topic {i}", "plan": "benchmark plan", "bypass_cache": True,
+        })
+        response.raise_for_status()
+    return call
+
+
+SETUPS = {
+    "delegate": setup_delegate,
+    "rag": setup_rag,
+    "executor": setup_executor,
+    "quantum": setup_quantum,
+    "research": setup_research,
+}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def parse_overrides(text: str) -> dict:
+    """'how=2.0,why=1.5' -> {"how": {"latency_s": 2.0}, "why": {"latency_s": 1.5}}"""
+    overrides = {}
+    for item in filter(None, (text or "").split(",")):
+        crew, latency = item.split("=")
+        overrides[crew.strip()] = {"latency_s": float(latency)}
+    return overrides
+
+
+def configure_environment(stubs: dict, workdir: str, args):
+    """Points the project at the stand-ins. Must run before the project modules are imported."""
+    os.environ.update({
+        "OLLAMA_BASE_URL": stubs["ollama"].url,
+        "CREW_HOST_URL": stubs["crews"].url,
+        "DELEGATION_DEADLINE_S": str(args.delegation_deadline),
+        "LLM_CACHE": "off",
+        "RESEARCH_CACHE_SIMILARITY": "0",
+        "RESEARCH_CACHE_DB": os.path.join(workdir, "research_cache.sqlite3"),
+        "RESEARCH_JOB_DB": os.path.join(workdir, "research_jobs.sqlite3"),
+        "RESEARCH_WORKERS": str(args.concurrency),
+        "RESEARCH_MAX_QUEUED": str(max(args.requests, 20)),
+        "OLLAMA_MAX_IN_FLIGHT": str(args.ollama_in_flight),
+    })
+
+
+async def run(args) -> dict:
+    workdir = tempfile.mkdtemp(prefix="bench_")
+    stubs = {
+        "ollama": StubServer(fake_ollama_app(args.token_latency, args.tokens)).start(),
+        "crews": StubServer(fake_crews_app(args.crew_latency, args.crew_jitter, args.crew_error_rate,
+                                           parse_overrides(args.crew_overrides), seed=args.seed)).start(),
+        "quantum": StubServer(fake_quantum_app()).start(),
+    }
+    configure_environment(stubs, workdir, args)
+
+    results = {}
+    try:
+        for name in args.scenarios:
+            print(f"--- [bench] {name}: {args.requests} requests at concurrency {args.concurrency} ---")
+            try:
+                call = await SETUPS[name](stubs, args)
+            except Exception as e:
+                traceback.print_exc()
+                results[name] = {"skipped": f"{type(e).__name__}: {e}"}
+                continue
+            results[name] = await drive(call, args.requests, args.concurrency, args.warmup)
+            latency = results[name]["latency_s"]
+            print(f"--- [bench] {name}: p50={latency['p50']}s p95={latency['p95']}s p99={latency['p99']}s "
+                  f"{results[name]['throughput_rps']} req/s, {results[name]['errors']} errors ---")
+    finally:
+        for server in stubs.values():
+            server.stop()
+
+    return {
+        "git_revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "scenarios": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline latency/throughput benchmarks.")
+    parser.add_argument("--scenarios", default="delegate,executor,quantum",
+                        help=f"Comma-separated subset of: {', '.join(ALL_SCENARIOS)} (or 'all')")
+    parser.add_argument("--requests", type=int, default=30, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=1, help="Untimed requests before each scenario")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--token-latency", type=float, default=0.01, help="Fake Ollama seconds per token")
+    parser.add_argument("--tokens", type=int, default=40, help="Fake Ollama tokens per completion")
+    parser.add_argument("--ollama-in-flight", type=int, default=2)
+    parser.add_argument("--crew-latency", type=float, default=0.3, help="Fake crew mean latency (s)")
+    parser.add_argument("--crew-jitter", type=float, default=0.1, help="Fake crew latency std dev (s)")
+    parser.add_argument("--crew-error-rate", type=float, default=0.0)
+    parser.add_argument("--crew-overrides", default="", help="Per-crew mean latency, e.g. 'how=2.0,why=1.5'")
+    parser.add_argument("--delegation-deadline", type=float, default=45.0)
+    parser.add_argument("--index-timeout", type=float, default=600.0)
+    parser.add_argument("--research-timeout", type=float, default=600.0)
+    args = parser.parse_args(argv)
+    args.scenarios = list(ALL_SCENARIOS) if args.scenarios == "all" else [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = set(args.scenarios) - set(ALL_SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"--- [bench] Wrote {args.output} ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import json
+import time
+import random
+import socket
+import asyncio
+import threading
+import uvicorn
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+# --- BENCHMARK STAND-INS ---
+# Local, offline replacements for the services a research run talks to:
+# a fake Ollama (/api/generate and /api/chat, streamed NDJSON with a fixed
+# per-token latency; it counts its peak concurrent requests), fake 5W1H crew services (latency ~ normal(mean, jitter)
+# plus an error rate) and a fake quantum server. StubServer runs any of
+# them on a free local port in a background thread.
+
+CREWS = ("who", "what", "when", "where", "how", "why")
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubServer:
+    """Runs an ASGI app with uvicorn on 127.0.0.1:<free port> in a daemon thread."""
+
+    def __init__(self, app, port: int = None):
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    def start(self, timeout: float = 10.0) -> "StubServer":
+        self._thread.start()
+        deadline = time.monotonic() + timeout
+        while not self._server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Stub server on port {self.port} did not start")
+            time.sleep(0.02)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+# --- fake Ollama ---
+
+def fake_ollama_app(token_latency_s: float = 0.02, tokens: int = 40, first_token_s: float = 0.1) -> FastAPI:
+    app = FastAPI()
+    app.state.requests = 0
+    app.state.in_flight = 0
+    app.state.peak_in_flight = 0
+
+    async def stream(body: dict, chat: bool):
+        app.state.requests += 1
+        app.state.in_flight += 1
+        app.state.peak_in_flight = max(app.state.peak_in_flight, app.state.in_flight)
+        try:
+            prompt = json.dumps(body.get("messages") or body.get("prompt") or "")
+            await asyncio.sleep(first_token_s)
+            for i in range(tokens):
+                await asyncio.sleep(token_latency_s)
+                text = f"token{i} "
+                chunk = {"message": {"role": "assistant", "content": text}} if chat else {"response": text}
+                yield json.dumps({"model": body.get("model"), "done": False, **chunk}) + "\n"
+            final = {"message": {"role": "assistant", "content": ""}} if chat else {"response": ""}
+            yield json.dumps({"model": body.get("model"), "done": True, "prompt_eval_count": len(prompt) // 4,
+                              "eval_count": tokens, **final}) + "\n"
+        finally:
+            app.state.in_flight -= 1
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        return StreamingResponse(stream(await request.json(), chat=False), media_type="application/x-ndjson")
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        return StreamingResponse(stream(await request.json(), chat=True), media_type="application/x-ndjson")
+
+    return app
+
+
+# --- fake 5W1H crews ---
+
+class CrewExecutionRequest(BaseModel):
+    topic: str
+    plan: str
+
+
+def fake_crews_app(latency_s: float = 0.3, jitter_s: float = 0.1, error_rate: float = 0.0,
+                   overrides: dict = None, seed: int = None) -> FastAPI:
+    """
+    overrides maps a crew to its own {"latency_s", "jitter_s", "error_rate"},
+    e.g. {"how": {"latency_s": 2.0}} for one slow crew.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    overrides = overrides or {}
+
+    async def run(crew: str, request: CrewExecutionRequest):
+        if crew not in CREWS:
+            raise HTTPException(status_code=404, detail=f"Unknown crew '{crew}'")
+        profile = {"latency_s": latency_s, "jitter_s": jitter_s, "error_rate": error_rate, **overrides.get(crew, {})}
+        await asyncio.sleep(max(0.0, rng.gauss(profile["latency_s"], profile["jitter_s"])))
+        if rng.random() < profile["error_rate"]:
+            raise HTTPException(status_code=503, detail=f"{crew} crew failed (injected)")
+        return {"status": "COMPLETED", "result": f"{crew.capitalize()} findings for {request.topic}."}
+
+    @app.post("/run/{crew}")
+    async def run_crew(crew: str, request: CrewExecutionRequest):
+        return await run(crew, request)
+
+    for crew in CREWS:
+        async def legacy(request: CrewExecutionRequest, crew=crew):
+            return await run(crew, request)
+        app.add_api_route(f"/run_{crew}", legacy, methods=["POST"])
+
+    return app
+
+
+# --- fake quantum server ---
+
+class CircuitJobRequest(BaseModel):
+    qasm_circuit: str
+    device_id: str
+    shots: int = 1024
+
+
+class JobStatusRequest(BaseModel):
+    job_id: str
+
+
+def fake_quantum_app(submit_latency_s: float = 0.05, run_time_s: float = 0.5) -> FastAPI:
+    """Mimics quantum_server.py: jobs report RUNNING until run_time_s has passed."""
+    app = FastAPI()
+    jobs = {}
+
+    @app.get("/devices")
+    async def devices():
+        return {"devices": "- ID: fake_simulator\n  Name: Fake Simulator\n  Status: online\n  Qubits: 32\n"}
+
+    @app.post("/run")
+    async def run(request: CircuitJobRequest):
+        await asyncio.sleep(submit_latency_s)
+        job_id = f"fake-{len(jobs) + 1}"
+        jobs[job_id] = (time.monotonic(), request.shots)
+        return {"status": f"Job ID: {job_id}, Status: QUEUED"}
+
+    @app.post("/status")
+    async def status(request: JobStatusRequest):
+        if request.job_id not in jobs:
+            return {"status": f"Error checking quantum job status: unknown job {request.job_id}"}
+        submitted, shots = jobs[request.job_id]
+        if time.monotonic() - submitted < run_time_s:
+            return {"status": "Job Status: RUNNING"}
+        return {"status": f"Job Status: COMPLETED, Results: {{'00': {shots // 2}, '11': {shots - shots // 2}}}"}
+
+    return app
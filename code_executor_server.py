@@ -1,63 +1,182 @@
+import os
+import json
+import queue
+import threading
 import uvicorn
-from fastapi import FastAPI
+from typing import List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-import subprocess
-import json
-import io
-import contextlib
+from utils.metrics import install_metrics
+from utils.sandbox_pool import SandboxPool, SessionManager, SessionLimitReached, SessionStartFailed
 
 app = FastAPI()
+install_metrics(app, "code_executor")  # GET /metrics + route timings
+
+# Jobs run in a pool of warm, resource-limited worker processes
+# (SANDBOX_WORKERS, SANDBOX_CPU_S, SANDBOX_WALL_S, SANDBOX_MEMORY_MB).
+sandbox_pool = SandboxPool()
+# Stateful sessions get a dedicated worker each (SANDBOX_MAX_SESSIONS,
+# SANDBOX_SESSION_IDLE_S, SANDBOX_SESSION_MEMORY_MB).
+sessions = SessionManager()
+# Output is cut to its head and tail past max_output_bytes (default and
+# ceiling: SANDBOX_OUTPUT_MAX_BYTES).
+EXECUTE_BATCH_MAX = int(os.environ.get("EXECUTE_BATCH_MAX", 32))
+
+@app.on_event("startup")
+def start_sandbox_pool():
+    sandbox_pool.start()
+    sessions.start()
+
+@app.on_event("shutdown")
+def stop_sandbox_pool():
+    sessions.shutdown()
+    sandbox_pool.shutdown()
 
 class CodeExecutionRequest(BaseModel):
     code: str
     permission: bool = False # Human-in-the-Loop flag
+    session_id: Optional[str] = None # Run as a cell in this session ("new" creates one)
+    max_output_bytes: Optional[int] = None # Keep the head and tail of longer output
+
+class BatchExecutionRequest(BaseModel):
+    snippets: List[str] # Independent jobs, run concurrently
+    permission: bool = False
+    max_output_bytes: Optional[int] = None
+
+class SessionRequest(BaseModel):
+    memory_mb: Optional[int] = None # Capped at SANDBOX_SESSION_MEMORY_MB
+
+DENIED_RESPONSE = {
+    "status": "DENIED",
+    "error": "Code Execution DENIED: Human-in-the-Loop permission not granted. Set 'permission=True'."
+}
+
+def run_request(request: CodeExecutionRequest, on_output=None) -> dict:
+    """Runs one (already permitted) request on the pool or in its session."""
+    # --- SANDBOX WARNING ---
+    # Each job runs in its own worker process with CPU, memory and wall-clock
+    # limits, but still on the host machine. A production version MUST
+    # use a dedicated Docker container (e.g., using 'docker run --rm python:3.12')
+    # or a secure sandboxing library.
+    if request.session_id:
+        try:
+            session_id = sessions.create()["session_id"] if request.session_id == "new" else request.session_id
+            result = sessions.execute(session_id, request.code, max_output_bytes=request.max_output_bytes,
+                                      on_output=on_output)
+        except (SessionLimitReached, SessionStartFailed) as e:
+            return {"status": "FAILED", "error": f"Execution Error: {e}"}
+        except KeyError:
+            return {"status": "FAILED", "error": f"Execution Error: unknown or expired session '{request.session_id}'. Use session_id='new'."}
+    else:
+        result = sandbox_pool.execute(request.code, max_output_bytes=request.max_output_bytes, on_output=on_output)
+
+    if result["status"] == "COMPLETED":
+        response = {
+            "status": "COMPLETED",
+            "output": result["output"],
+            "message": f"Code executed successfully. Output logged."
+        }
+    else:
+        response = {
+            "status": "FAILED",
+            "error": result["error"],
+            "output": result.get("output", "")
+        }
+    response["output_bytes"] = result.get("output_bytes", 0)
+    response["truncated"] = result.get("truncated", False)
+    if "session_id" in result:
+        response["session_id"] = None if result.get("session_lost") else result["session_id"]
+    return response
 
 @app.post("/execute")
 def execute_code(request: CodeExecutionRequest):
     """
-    Executes Python code in a controlled subprocess.
+    Executes Python code in a pooled, resource-limited worker process.
     Requires permission=True flag for safety.
     """
     print(f"ExecutorServer: Received {len(request.code)} bytes of code.")
     
     # --- HITL SAFETY CHECK ---
     if not request.permission:
-        return {
-            "status": "DENIED",
-            "error": "Code Execution DENIED: Human-in-the-Loop permission not granted. Set 'permission=True'."
-        }
-    
-    # --- SANDBOX WARNING ---
-    # This is still executing on the host machine. A production version MUST
-    # use a dedicated Docker container (e.g., using 'docker run --rm python:3.12')
-    # or a secure sandboxing library.
+        return DENIED_RESPONSE
+    return run_request(request)
+
+@app.post("/execute/stream")
+def execute_code_stream(request: CodeExecutionRequest):
+    """
+    Like /execute, but streams newline-delimited JSON while the code runs:
+    {"type": "output", "data": ...} events, then one {"type": "result", ...}
+    event with the /execute fields minus "output" (already streamed).
+    """
+    print(f"ExecutorServer: Received {len(request.code)} bytes of code (streaming).")
+    if not request.permission:
+        return StreamingResponse(iter([json.dumps({"type": "result", **DENIED_RESPONSE}) + "\n"]),
+                                 media_type="application/x-ndjson")
+
+    events = queue.Queue()
+
+    def run():
+        try:
+            response = run_request(request, on_output=lambda data: events.put({"type": "output", "data": data}))
+        except Exception as e:
+            response = {"status": "FAILED", "error": f"Execution Error: {type(e).__name__}: {e}"}
+        response.pop("output", None)
+        events.put({"type": "result", **response})
+        events.put(None)
+
+    # The job keeps running to the end if the client disconnects.
+    threading.Thread(target=run, daemon=True).start()
+
+    def stream():
+        while (event := events.get()) is not None:
+            yield json.dumps(event) + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/execute/batch")
+def execute_batch(request: BatchExecutionRequest):
+    """
+    Runs independent snippets concurrently across the pool and returns
+    their /execute results in input order.
+    """
+    print(f"ExecutorServer: Received a batch of {len(request.snippets)} snippets.")
+    if not request.permission:
+        return DENIED_RESPONSE
+    if len(request.snippets) > EXECUTE_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {EXECUTE_BATCH_MAX} snippets per batch")
+    if not request.snippets:
+        return {"status": "COMPLETED", "results": []}
 
-    # Execute the code and capture output (stdout/stderr)
+    jobs = [CodeExecutionRequest(code=code, permission=True, max_output_bytes=request.max_output_bytes)
+            for code in request.snippets]
+    with ThreadPoolExecutor(max_workers=min(len(jobs), sandbox_pool.size)) as executor:
+        results = list(executor.map(run_request, jobs))
+    return {"status": "COMPLETED", "results": results}
+
+@app.post("/sessions")
+def create_session(request: SessionRequest = None):
     try:
-        # Use a string buffer to capture standard output
-        output_buffer = io.StringIO()
-        
-        # We wrap the code in a function so that 'exec' doesn't pollute the global scope
-        code_to_exec = f"def sandboxed_execution():\n{request.code}\n_output = sandboxed_execution()"
-        
-        # Use contextlib.redirect_stdout to capture print statements
-        with contextlib.redirect_stdout(output_buffer):
-            # This is the execution step. It's safe only because we require the permission flag.
-            exec(code_to_exec, {})
-        
-        output = output_buffer.getvalue()
-        
-        return {
-            "status": "COMPLETED",
-            "output": output,
-            "message": f"Code executed successfully. Output logged."
-        }
+        return sessions.create((request or SessionRequest()).memory_mb)
+    except SessionLimitReached as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except SessionStartFailed as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-    except Exception as e:
-        return {
-            "status": "FAILED",
-            "error": f"Execution Error: {type(e).__name__}: {str(e)}"
-        }
+@app.delete("/sessions/{session_id}")
+def close_session(session_id: str):
+    if not sessions.close(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown session '{session_id}'")
+    return {"status": "closed", "session_id": session_id}
+
+@app.get("/sessions")
+def list_sessions():
+    return sessions.stats()
+
+@app.get("/sandbox/stats")
+def get_sandbox_stats():
+    return sandbox_pool.stats()
 
 if __name__ == "__main__":
     print("--- 🚀 Starting Code Executor Microservice on http://0.0.0.0:9090 ---")
@@ -0,0 +1,260 @@
+import os
+import time
+import socket
+import asyncio
+import threading
+import importlib
+import yaml
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+from fastapi import FastAPI, HTTPException, Header
+from pydantic import BaseModel
+from utils.llm_scheduler import get_scheduler, load_ollama, llm_job, llm_priority
+from utils.http_cache import get_response_cache
+from utils.metrics import install_metrics
+
+# --- 5W1H CREW HOST ---
+# One service hosting all six 5W1H crews, instead of six processes that each
+# load their own LLM client and tools. Crews are defined from
+# config/agents.yaml (the *Agent entries) and the parallel tasks in
+# config/tasks.yaml. They share one LLM client and one tool pool, and each
+# crew has its own concurrency limit.
+#
+# Routes: POST /run/{crew} plus the legacy POST /run_{crew}. By default the
+# host listens on the six legacy ports (8001-8006), so SERVICE_URLS in
+# delegation_tools.py keeps working unchanged.
+
+CONFIG_PATH = "config"
+LEGACY_PORTS = {"who": 8001, "what": 8002, "when": 8003, "where": 8004, "how": 8005, "why": 8006}
+
+CREW_HOST_HOST = os.environ.get("CREW_HOST_HOST", "0.0.0.0")
+CREW_HOST_PORTS = [int(p) for p in os.environ.get("CREW_HOST_PORTS", ",".join(map(str, LEGACY_PORTS.values()))).split(",")]
+CREW_HOST_WORKERS = int(os.environ.get("CREW_HOST_WORKERS", 1))
+# "placeholder" answers like the old per-crew services; "crewai" runs the real crews.
+CREW_HOST_MODE = os.environ.get("CREW_HOST_MODE", "placeholder").lower()
+CREW_LLM_MODEL = os.environ.get("CREW_LLM_MODEL", "mistral")
+# Max concurrent runs per crew (per worker). Override one crew with e.g. CREW_CONCURRENCY_HOW=1.
+DEFAULT_CREW_CONCURRENCY = int(os.environ.get("CREW_CONCURRENCY", 2))
+
+# Tool names usable in agents.yaml -> "module:attribute". Imported on first use.
+TOOL_REGISTRY = {
+    "firecrawl_search_and_scrape": "tools.web_tools:firecrawl_search_and_scrape",
+    "search_hf_models": "tools.web_tools:search_hf_models",
+    "get_hf_daily_papers": "tools.web_tools:get_hf_daily_papers",
+    "search_arxiv": "tools.web_tools:search_arxiv",
+    "search_github_repositories": "tools.github_tools:search_github_repositories",
+    "execute_python_code": "tools.code_execution_tools:execute_python_code",
+    "search_oreilly": "tools.librarian_tools:search_oreilly",
+    "search_coursera": "tools.librarian_tools:search_coursera",
+    "search_deeplearning_ai": "tools.librarian_tools:search_deeplearning_ai",
+    "search_dlai_knowledge_base": "tools.rag_tools:search_dlai_knowledge_base",
+    "federated_search": "tools.search_tools:federated_search",
+}
+
+
+class CrewExecutionRequest(BaseModel):
+    topic: str
+    plan: str
+
+
+def load_crew_specs(config_path: str = CONFIG_PATH) -> dict:
+    """
+    Returns {crew: spec} for every '<Name>Agent' in agents.yaml, e.g.
+    "who" -> WhoAgent. The task description comes from the agent's task
+    in tasks.yaml (looked up inside parallel task groups too).
+    """
+    with open(os.path.join(config_path, "agents.yaml"), "r") as f:
+        agents = yaml.safe_load(f)["agents"]
+    with open(os.path.join(config_path, "tasks.yaml"), "r") as f:
+        tasks = yaml.safe_load(f)["tasks"]
+
+    task_by_agent, pending = {}, list(tasks)
+    while pending:
+        task = pending.pop(0)
+        if task.get("agent"):
+            task_by_agent.setdefault(task["agent"], task)
+        pending.extend(task.get("tasks", []))
+
+    specs = {}
+    for agent_name, agent in agents.items():
+        if not agent_name.endswith("Agent"):
+            continue
+        crew = agent_name[:-len("Agent")].lower()
+        task = task_by_agent.get(agent_name, {})
+        specs[crew] = {
+            "agent": agent_name,
+            "system_prompt": agent["system_prompt"].strip(),
+            "tools": agent.get("tools", []),
+            "task": (task.get("description") or f"Research the topic from the {crew} angle.").strip(),
+            "max_concurrency": int(os.environ.get(f"CREW_CONCURRENCY_{crew.upper()}", DEFAULT_CREW_CONCURRENCY)),
+        }
+    return specs
+
+
+class SharedResources:
+    """The LLM client and tools, created once per worker and shared by every crew."""
+
+    def __init__(self, model: str = CREW_LLM_MODEL):
+        self.model = model
+        self._llm = None
+        self._tools = {}
+        self._lock = threading.Lock()
+
+    @property
+    def llm(self):
+        with self._lock:
+            if self._llm is None:
+                print(f"--- [CrewHost] Loading shared Ollama LLM ({self.model})... ---")
+                self._llm = load_ollama(model=self.model)
+            return self._llm
+
+    def tool(self, name: str):
+        with self._lock:
+            if name not in self._tools:
+                if name not in TOOL_REGISTRY:
+                    raise KeyError(f"Unknown tool '{name}' in agents.yaml (see TOOL_REGISTRY)")
+                module_name, attribute = TOOL_REGISTRY[name].split(":")
+                self._tools[name] = getattr(importlib.import_module(module_name), attribute)
+            return self._tools[name]
+
+    def tools(self, names: list) -> list:
+        return [self.tool(name) for name in names]
+
+
+class CrewHost:
+
+    def __init__(self, specs: dict, resources: SharedResources, mode: str = CREW_HOST_MODE):
+        self.specs = specs
+        self.resources = resources
+        self.mode = mode
+        self._limits = {crew: asyncio.Semaphore(spec["max_concurrency"]) for crew, spec in specs.items()}
+        self.counters = {crew: {"running": 0, "waiting": 0, "completed": 0, "failed": 0, "total_s": 0.0} for crew in specs}
+
+    def build_crew(self, crew: str):
+        """A fresh CrewAI crew on top of the shared LLM and tools (crews keep per-run state)."""
+        from crewai import Agent, Task, Crew
+
+        spec = self.specs[crew]
+        agent = Agent(
+            role=spec["agent"],
+            goal=spec["task"],
+            backstory=spec["system_prompt"],
+            llm=self.resources.llm,
+            tools=self.resources.tools(spec["tools"]),
+            allow_delegation=False,
+            verbose=False,
+        )
+        task = Task(
+            description=f"{spec['task']}\n\nResearch topic: {{topic}}\n\nResearch plan: {{plan}}",
+            expected_output=f"The {crew.capitalize()} findings for the research topic, with sources.",
+            agent=agent,
+        )
+        return Crew(agents=[agent], tasks=[task], verbose=False)
+
+    def _run_sync(self, crew: str, topic: str, plan: str) -> dict:
+        if self.mode != "crewai":
+            # For now, return a placeholder result
+            return {
+                "status": "DELEGATED",
+                "result": f"{self.specs[crew]['agent']} Crew is independently researching {topic}.",
+            }
+        output = self.build_crew(crew).kickoff(inputs={"topic": topic, "plan": plan})
+        return {"status": "COMPLETED", "result": str(output)}
+
+    async def run(self, crew: str, topic: str, plan: str, job: str = None) -> dict:
+        counters = self.counters[crew]
+        counters["waiting"] += 1
+        async with self._limits[crew]:
+            counters["waiting"] -= 1
+            counters["running"] += 1
+            started = time.monotonic()
+            try:
+                # kickoff() blocks, so it runs on a thread; the limit keeps the pool bounded.
+                # Crew LLM calls queue behind the interactive Writer, per research job.
+                with llm_job(job or f"{crew}-{os.getpid()}"), llm_priority("background"):
+                    result = await asyncio.to_thread(self._run_sync, crew, topic, plan)
+                counters["completed"] += 1
+                return result
+            except Exception:
+                counters["failed"] += 1
+                raise
+            finally:
+                counters["running"] -= 1
+                counters["total_s"] += time.monotonic() - started
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "pid": os.getpid(),
+            "crews": {
+                crew: {
+                    "agent": spec["agent"],
+                    "tools": spec["tools"],
+                    "max_concurrency": spec["max_concurrency"],
+                    **{k: round(v, 3) if isinstance(v, float) else v for k, v in self.counters[crew].items()},
+                }
+                for crew, spec in self.specs.items()
+            },
+        }
+
+
+app = FastAPI()
+install_metrics(app, "crew_host")  # GET /metrics + route timings
+crew_host = CrewHost(load_crew_specs(), SharedResources())
+
+
+async def run_crew(crew: str, request: CrewExecutionRequest, job: str = None):
+    if crew not in crew_host.specs:
+        raise HTTPException(status_code=404, detail=f"Unknown crew '{crew}'. Known crews: {', '.join(crew_host.specs)}")
+    print(f"{crew.upper()}_CREW: Received task for topic: {request.topic}")
+    try:
+        return await crew_host.run(crew, request.topic, request.plan, job)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"{crew} crew failed: {type(e).__name__}: {e}")
+
+
+@app.post("/run/{crew}")
+async def run_crew_route(crew: str, request: CrewExecutionRequest, x_research_job: str = Header(None)):
+    return await run_crew(crew, request, x_research_job)
+
+
+def _legacy_route(crew: str):
+    async def legacy_run(request: CrewExecutionRequest, x_research_job: str = Header(None)):
+        return await run_crew(crew, request, x_research_job)
+    return legacy_run
+
+
+# The old per-service paths (/run_who, /run_what, ...), on every port.
+for _crew in crew_host.specs:
+    app.add_api_route(f"/run_{_crew}", _legacy_route(_crew), methods=["POST"])
+
+
+@app.get("/crews")
+async def crews():
+    response_cache = get_response_cache()
+    return {**crew_host.stats(), "llm_scheduler": get_scheduler().stats(),
+            "http_cache": response_cache.stats() if response_cache is not None else None}
+
+
+def bind_sockets(host: str, ports: list) -> list:
+    sockets = []
+    for port in ports:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        sock.set_inheritable(True)
+        sockets.append(sock)
+    return sockets
+
+
+if __name__ == "__main__":
+    ports = ", ".join(map(str, CREW_HOST_PORTS))
+    print(f"--- 🚀 Starting 5W1H Crew Host ({len(crew_host.specs)} crews, {CREW_HOST_WORKERS} workers, mode={CREW_HOST_MODE}) on ports {ports} ---")
+    config = uvicorn.Config("crew_host_service:app", host=CREW_HOST_HOST, port=CREW_HOST_PORTS[0], workers=CREW_HOST_WORKERS)
+    server = uvicorn.Server(config)
+    # Every worker accepts on all ports, so one process group replaces the six services.
+    sockets = bind_sockets(CREW_HOST_HOST, CREW_HOST_PORTS)
+    if CREW_HOST_WORKERS > 1:
+        Multiprocess(config, target=server.run, sockets=sockets).run()
+    else:
+        server.run(sockets=sockets)
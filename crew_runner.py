@@ -1,11 +1,18 @@
 import os, yaml, json, asyncio
-from langchain_community.llms import Ollama
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import RunnableLambda
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langgraph.graph import StateGraph, END
 from typing import TypedDict, List, Dict, Any, Union
 
 # Import the *only* tool we need now
-from tools.delegation_tools import delegate_to_5w1h_crews
+from tools.delegation_tools import delegate_to_5w1h_crews, iter_crew_results, compile_crew_results, fanout_complete
+from langchain_core.callbacks.manager import adispatch_custom_event
+from utils.llm_cache import CompletionCache
+from utils.llm_scheduler import load_ollama, llm_priority
+from utils.metrics import timed_node
+from utils.context_compaction import compact_research_context
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -14,23 +21,81 @@ class DelegationResearchState(TypedDict):
     research_topic: str
     plan: str
     research_context: Dict[str, Any] # Stores the dict from the parallel tool
+    sections: Dict[str, str] # Incremental mode: one drafted section per crew
     draft: str
     messages: List 
+    bypass_cache: bool # Skip the LLM completion cache for this run
+    compaction: Dict[str, Any] # Token report from the ContextCompactor node
+
+# --- CONTEXT COMPACTION (between DelegationExecutor and Writer) ---
+CONTEXT_COMPACTION = os.environ.get("CONTEXT_COMPACTION", "on").lower() not in ("off", "0", "false")
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("CONTEXT_TOKEN_BUDGET", 3000))
+CONTEXT_MIN_CREW_SHARE = float(os.environ.get("CONTEXT_MIN_CREW_SHARE", 0.5))
+CONTEXT_DEDUPE_THRESHOLD = float(os.environ.get("CONTEXT_DEDUPE_THRESHOLD", 0.92))
+
+# Scheduler priority class per agent: the user is waiting on the writers.
+AGENT_PRIORITIES = {
+    "Writer": "interactive",
+    "SectionWriter": "interactive",
+    "ReportMerger": "interactive",
+    "Planner": "planning",
+}
+
+def _message_text(message) -> str:
+    """Renders an LLM output (plain string or message with tool calls) as text."""
+    if isinstance(message, str):
+        return message
+    text = getattr(message, "content", "") or ""
+    for call in getattr(message, "tool_calls", None) or []:
+        text += f"\n[tool call] {call.get('name')}: {json.dumps(call.get('args', {}))}"
+    return text.strip()
+
+def _dump_completion(output) -> dict:
+    if isinstance(output, BaseMessage):
+        return {"type": "message", "message": message_to_dict(output)}
+    return {"type": "text", "text": str(output)}
+
+def _load_completion(value: dict):
+    if value["type"] == "message":
+        return messages_from_dict([value["message"]])[0]
+    return value["text"]
+
+def default_completion_cache():
+    """The completion cache configured by env (LLM_CACHE=off disables it)."""
+    if os.environ.get("LLM_CACHE", "on").lower() in ("off", "0", "false"):
+        return None
+    return CompletionCache(
+        db_path=os.environ.get("LLM_CACHE_DB", "llm_cache.sqlite3"),
+        memory_size=int(os.environ.get("LLM_CACHE_MEMORY_SIZE", 256)),
+        max_entries=int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 5000)),
+    )
 
 class ResearchGraph:
     
-    def __init__(self):
+    def __init__(self, mode: str = None, completion_cache: CompletionCache = None):
+        """
+        mode="sequential" (default): Planner -> DelegationExecutor -> ContextCompactor -> Writer.
+        mode="incremental": each crew result is drafted into a section the
+        moment it lands, then a short merge pass assembles the report.
+        completion_cache defaults to default_completion_cache().
+        """
         print("Initializing ResearchGraph...")
         self.config_path = "config"
+        self.mode = (mode or os.environ.get("RESEARCH_GRAPH_MODE", "sequential")).lower()
+        self.final_writer = "ReportMerger" if self.mode == "incremental" else "Writer"
         self.llm = self.load_llm()
         self.all_tools = [delegate_to_5w1h_crews] # Only one tool
         self.agents_config, self.tasks_config = self.load_configs()
+        self.completion_cache = completion_cache if completion_cache is not None else default_completion_cache()
+        self.llm_params = self.llm._identifying_params
+        self.agents = self.compile_agents()
         self.graph = self.compile_graph()
         print("✅ ResearchGraph Initialized.")
 
     def load_llm(self):
         print("Loading Ollama LLM (mistral)...")
-        return Ollama(model="mistral") 
+        # Scheduled: all LLM calls in the process share one Ollama admission queue
+        return load_ollama(model="mistral") 
 
     def load_configs(self):
         print("Loading agents.yaml and tasks.yaml...")
@@ -40,71 +105,282 @@ class ResearchGraph:
             tasks_config = yaml.safe_load(f)
         return agents_config, tasks_config
 
+    def task_prompt(self, agent_name: str) -> str:
+        """Finds the prompt of the task assigned to agent_name in tasks.yaml."""
+        pending = list(self.tasks_config['tasks'])
+        while pending:
+            task = pending.pop(0)
+            if task.get('agent') == agent_name and 'prompt' in task:
+                return task['prompt']
+            pending.extend(task.get('tasks', []))
+        raise KeyError(f"No task with a prompt is assigned to agent '{agent_name}' in tasks.yaml")
+
+    def compile_agents(self) -> dict:
+        """
+        Builds each agent's prompt template and chain once. Agents without
+        a task prompt (e.g. the 5W1H crews, which run as services) are skipped.
+        """
+        compiled = {}
+        for agent_name, agent in self.agents_config['agents'].items():
+            try:
+                task_prompt = self.task_prompt(agent_name)
+            except KeyError:
+                continue
+            system_prompt = agent['system_prompt'].replace("{", "{{").replace("}", "}}")
+            prompt = PromptTemplate.from_template(f"{system_prompt}\n\n{task_prompt}")
+            tools = self.all_tools if agent_name == "Planner" else []
+            # Plain-completion LLMs (like Ollama here) can't bind tools; the
+            # delegation node then falls back to the state's topic and plan.
+            llm = self.llm.bind_tools(tools) if tools and hasattr(self.llm, "bind_tools") else self.llm
+            compiled[agent_name] = {
+                "prompt": prompt,
+                "chain": prompt | llm,
+                "tools": tools,
+                "tool_schema": [convert_to_openai_tool(t) for t in tools],
+            }
+        return compiled
+
+    def prompt_inputs(self, agent_name: str, state: DelegationResearchState, **extra) -> dict:
+        """The template variables for an agent, filled from the graph state (and any extra fields)."""
+        # Timings in the fan-out's _meta change on every run; keeping them out
+        # of the prompt lets identical re-runs hit the completion cache.
+        research_context = {k: v for k, v in (state.get('research_context') or {}).items() if k != "_meta"}
+        values = {
+            "research_topic": state['research_topic'],
+            "plan": state.get('plan', 'N/A'),
+            "research_context": research_context,
+            **extra,
+        }
+        return {name: values[name] for name in self.agents[agent_name]["prompt"].input_variables}
+
+    def render_prompt(self, agent_name: str, state: DelegationResearchState, **extra) -> str:
+        """System prompt + task prompt, filled from the graph state (and any extra fields)."""
+        return self.agents[agent_name]["prompt"].format(**self.prompt_inputs(agent_name, state, **extra))
+
+    def completion_key(self, agent_name: str, rendered: str) -> str:
+        return CompletionCache.make_key(
+            self.llm_params.get("model"), rendered, self.agents[agent_name]["tool_schema"], self.llm_params
+        )
+
     # --- NODES ARE NOW ASYNC DEFS ---
 
-    async def run_agent_node(self, state: DelegationResearchState, agent_name: str, tools: List = []):
-        """Async helper to run an agent node."""
+    async def run_agent_node(self, state: DelegationResearchState, agent_name: str, **extra):
+        """Async helper to run an agent node (through the completion cache)."""
         print(f"--- 🧠 Executing Agent: {agent_name} ---")
-        
-        system_prompt = self.agents_config['agents'][agent_name]['system_prompt']
-        task_config = self.tasks_config['tasks'][agent_name]
-        task_prompt = task_config['prompt'].format(
-            research_topic=state['research_topic'], 
-            plan=state.get('plan', 'N/A'),
-            research_context=state.get('research_context', {})
-        )
-        
-        prompt = PromptTemplate.from_template(f"{system_prompt}\n\n{task_prompt}")
-        
-        if tools:
-            llm_with_tools = self.llm.bind_tools(tools)
-            chain = prompt | llm_with_tools
+        agent = self.agents[agent_name]
+        inputs = self.prompt_inputs(agent_name, state, **extra)
+
+        key = cached = None
+        if self.completion_cache is not None:
+            key = self.completion_key(agent_name, agent["prompt"].format(**inputs))
+            value = await asyncio.to_thread(self.completion_cache.get, key, bool(state.get("bypass_cache")))
+            if value is not None:
+                print(f"--- ♻️ {agent_name}: completion served from cache ---")
+                cached = _load_completion(value)
+
+        if agent["tools"]:
+            if cached is not None:
+                return {"messages": [cached]}
             # Use .ainvoke() for async
-            llm_response = await chain.ainvoke(state)
-            return {"messages": [llm_response]}
+            with llm_priority(AGENT_PRIORITIES.get(agent_name, "background")):
+                llm_response = await agent["chain"].ainvoke(inputs)
         else:
-            chain = prompt | self.llm
-            # Use .ainvoke() for async
-            llm_response = await chain.ainvoke(state)
-            return {"draft": llm_response}
+            # Stream so the Writer's tokens show up on the graph's event stream
+            # (a cached completion arrives as a single chunk).
+            chain = agent["chain"] if cached is None else RunnableLambda(lambda _: cached)
+            llm_response = ""
+            with llm_priority(AGENT_PRIORITIES.get(agent_name, "background")):
+                async for chunk in chain.astream(inputs, config={"run_name": f"{agent_name}Chain"}):
+                    llm_response += chunk
+            if cached is not None:
+                return {"draft": llm_response}
+
+        if key is not None:
+            await asyncio.to_thread(
+                self.completion_cache.put, key, _dump_completion(llm_response), self.llm_params.get("model")
+            )
+        return {"messages": [llm_response]} if agent["tools"] else {"draft": llm_response}
+
+    def delegation_args(self, state: DelegationResearchState) -> dict:
+        """The Planner's tool-call arguments, or the state's topic and plan if it made none."""
+        last_message = state["messages"][-1] if state.get("messages") else None
+        tool_calls = getattr(last_message, "tool_calls", None) or []
+        args = tool_calls[0]['args'] if tool_calls else {}
+        return {"topic": args.get("topic", state['research_topic']), "plan": args.get("plan", state.get('plan', 'N/A'))}
 
     async def run_tool_node(self, state: DelegationResearchState):
         """Async helper to run the parallel tool node."""
         print("--- 🛠️ Executing Parallel Delegation Tool ---")
-        last_message = state["messages"][-1]
-        tool_call = last_message.tool_calls[0] # We only have one tool
-        
-        # Call the async tool
-        tool_output = await delegate_to_5w1h_crews.ainvoke(tool_call['args'])
+        # Call the async tool (we only have one)
+        tool_output = await delegate_to_5w1h_crews.ainvoke(self.delegation_args(state))
         
         print("--- ✅ Parallel Delegation Complete ---")
         # Store results directly in the main context
         return {"research_context": tool_output, "messages": []}
 
+    def compaction_embedder(self):
+        """The RAG tool's MiniLM embed_documents, loaded on first use (None: rank lexically)."""
+        if not hasattr(self, "_compaction_embed_fn"):
+            try:
+                from tools.rag_tools import embedding_function
+                self._compaction_embed_fn = embedding_function.embed_documents
+            except Exception as e:
+                print(f"--- ⚠️ Context compaction: embeddings unavailable ({e}); ranking lexically ---")
+                self._compaction_embed_fn = None
+        return self._compaction_embed_fn
+
+    async def run_compaction_node(self, state: DelegationResearchState):
+        """Dedupes, ranks and packs the crews' results into the Writer's token budget."""
+        if not CONTEXT_COMPACTION:
+            return {}
+        print("--- 🗜️ Compacting research context ---")
+        query = f"{state['research_topic']}\n{state.get('plan', '')}"
+        embed_fn = await asyncio.to_thread(self.compaction_embedder)
+        compacted, report = await asyncio.to_thread(
+            compact_research_context, state.get("research_context") or {}, query,
+            CONTEXT_TOKEN_BUDGET, CONTEXT_MIN_CREW_SHARE, CONTEXT_DEDUPE_THRESHOLD, embed_fn
+        )
+        print(f"--- ✅ Context: {report['tokens_before']} -> {report['tokens_after']} tokens "
+              f"({report['tokens_saved']} saved, {report['duplicates_dropped']} duplicates dropped) ---")
+        try:
+            await adispatch_custom_event("context_compacted", report)
+        except RuntimeError:
+            pass
+        return {"research_context": compacted, "compaction": report}
+
+    async def astream_research(self, initial_state: dict):
+        """
+        Runs the graph and yields progress events as they happen:
+        the Planner's output, each 5W1H crew result as it lands,
+        Writer tokens as they are generated, and finally the draft (with
+        partial set when the crew fan-out was cut short or had errors).
+        """
+        final_state = {}
+        async for event in self.graph.astream_events(initial_state, version="v2"):
+            kind = event["event"]
+            node = event.get("metadata", {}).get("langgraph_node")
+
+            if kind == "on_chain_end" and not event.get("parent_ids"):
+                final_state = event["data"].get("output") or {}
+            elif kind == "on_chain_end" and event["name"] == "Planner" and node == "Planner":
+                messages = (event["data"].get("output") or {}).get("messages") or []
+                if messages:
+                    yield {"type": "planner", "content": _message_text(messages[-1])}
+            elif kind == "on_custom_event" and event["name"] == "crew_result":
+                yield {"type": "crew_result", **event["data"]}
+            elif kind == "on_custom_event" and event["name"] == "context_compacted":
+                yield {"type": "compaction", **event["data"]}
+            elif kind == "on_custom_event" and event["name"] == "section_draft":
+                yield {"type": "section", **event["data"]}
+            elif kind == "on_chain_stream" and event["name"] == f"{self.final_writer}Chain":
+                yield {"type": "token", "text": str(event["data"]["chunk"])}
+
+        yield {"type": "done", "draft": final_state.get("draft", "No draft found."),
+               "partial": not fanout_complete(final_state.get("research_context"))}
+
+    # --- INCREMENTAL MODE ---
+
+    async def draft_section(self, state: DelegationResearchState, crew_name: str, findings: Any) -> str:
+        """Drafts one report section from one crew's findings."""
+        if isinstance(findings, dict) and findings.get("error"):
+            section = f"## {crew_name}\n\nNo findings: {findings['error']}"
+        else:
+            result = await self.run_agent_node(state, "SectionWriter", crew_name=crew_name, crew_findings=findings)
+            section = result["draft"]
+        try:
+            await adispatch_custom_event("section_draft", {"crew": crew_name, "content": section})
+        except RuntimeError:
+            pass
+        return section
+
+    async def run_incremental_delegation_node(self, state: DelegationResearchState):
+        """
+        Fans out to the crews and starts drafting each section as soon as its
+        crew answers, while the other crews are still running.
+        """
+        print("--- 🛠️ Executing Incremental Delegation (drafting while crews run) ---")
+        args = self.delegation_args(state)
+        topic, plan = args["topic"], args["plan"]
+
+        started = asyncio.get_running_loop().time()
+        results, timings, drafting = {}, {}, {}
+        async for name, result, elapsed in iter_crew_results(topic, plan):
+            results[name] = result
+            timings[name] = elapsed
+            drafting[name] = asyncio.create_task(self.draft_section(state, name, result))
+
+        research_context = compile_crew_results(results, timings, asyncio.get_running_loop().time() - started)
+        drafted = await asyncio.gather(*drafting.values())
+        sections = dict(zip(drafting.keys(), drafted))
+        for name in research_context["_meta"]["missing"]:
+            sections[name] = f"## {name}\n\nNo findings: the crew missed the deadline."
+        print("--- ✅ Incremental Delegation Complete ---")
+        return {"research_context": research_context, "sections": sections, "messages": []}
+
+    async def run_merge_node(self, state: DelegationResearchState):
+        sections = state.get("sections") or {}
+        joined = "\n\n".join(sections[name] for name in sorted(sections))
+        return await self.run_agent_node(state, "ReportMerger", sections=joined)
+
     def compile_graph(self):
+        if self.mode == "incremental":
+            return self.compile_incremental_graph()
         print("Compiling graph (Parallel Microservice Flow)...")
         workflow = StateGraph(DelegationResearchState)
         
         # --- THE FINAL FIX: Define async nodes, not sync lambdas ---
         async def planner_node(state):
-            return await self.run_agent_node(state, "Planner", self.all_tools)
+            return await self.run_agent_node(state, "Planner")
             
         async def tool_node(state):
             return await self.run_tool_node(state)
             
+        async def compactor_node(state):
+            return await self.run_compaction_node(state)
+
         async def writer_node(state):
             return await self.run_agent_node(state, "Writer")
 
-        workflow.add_node("Planner", planner_node)
-        workflow.add_node("DelegationExecutor", tool_node)
-        workflow.add_node("Writer", writer_node)
+        workflow.add_node("Planner", timed_node("Planner")(planner_node))
+        workflow.add_node("DelegationExecutor", timed_node("DelegationExecutor")(tool_node))
+        workflow.add_node("ContextCompactor", timed_node("ContextCompactor")(compactor_node))
+        workflow.add_node("Writer", timed_node("Writer")(writer_node))
 
         # Build the simple, sequential graph
         workflow.set_entry_point("Planner")
         workflow.add_edge("Planner", "DelegationExecutor")
-        workflow.add_edge("DelegationExecutor", "Writer")
+        workflow.add_edge("DelegationExecutor", "ContextCompactor")
+        workflow.add_edge("ContextCompactor", "Writer")
         workflow.add_edge("Writer", END)
         
         compiled_graph = workflow.compile()
         print("✅ Graph Compiled.")
         return compiled_graph
+
+    def compile_incremental_graph(self):
+        print("Compiling graph (Incremental Writer Flow)...")
+        workflow = StateGraph(DelegationResearchState)
+
+        async def planner_node(state):
+            return await self.run_agent_node(state, "Planner")
+
+        async def delegation_node(state):
+            return await self.run_incremental_delegation_node(state)
+
+        async def merge_node(state):
+            return await self.run_merge_node(state)
+
+        workflow.add_node("Planner", timed_node("Planner")(planner_node))
+        workflow.add_node("IncrementalDelegation", timed_node("IncrementalDelegation")(delegation_node))
+        workflow.add_node("ReportMerger", timed_node("ReportMerger")(merge_node))
+
+        # Sections are drafted inside IncrementalDelegation as crews land,
+        # so the merge only has to stitch them together.
+        workflow.set_entry_point("Planner")
+        workflow.add_edge("Planner", "IncrementalDelegation")
+        workflow.add_edge("IncrementalDelegation", "ReportMerger")
+        workflow.add_edge("ReportMerger", END)
+
+        compiled_graph = workflow.compile()
+        print("✅ Graph Compiled.")
+        return compiled_graph
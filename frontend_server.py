@@ -41,6 +41,90 @@ def main_page():
                        const timerDisplay = document.getElementById('timer-display');
                        timerDisplay.classList.add('hidden');
                    }
+               '''),
+               # --- JAVASCRIPT FOR STREAMED RESULTS (SSE from /run-research/stream) ---
+               Script(f'const BACKEND_SERVER_URL = "{BACKEND_SERVER_URL}";'),
+               Script('''
+                   let researchSource;
+
+                   function addBlock(parent, title, body, cls) {
+                       const block = document.createElement('div');
+                       block.className = cls;
+                       const heading = document.createElement('p');
+                       heading.className = 'font-semibold text-blue-300';
+                       heading.textContent = title;
+                       const content = document.createElement('p');
+                       content.className = 'whitespace-pre-wrap text-gray-300';
+                       content.textContent = body;
+                       block.append(heading, content);
+                       parent.appendChild(block);
+                   }
+
+                   function runResearchStream(form) {
+                       const topic = form.topic.value.trim();
+                       if (!topic) return false;
+                       if (researchSource) researchSource.close();
+
+                       const panel = document.createElement('div');
+                       panel.className = 'mb-8 border border-gray-700 rounded-lg p-4 space-y-3';
+                       const title = document.createElement('h2');
+                       title.className = 'text-xl font-bold';
+                       title.textContent = topic;
+                       const progress = document.createElement('div');
+                       progress.className = 'space-y-2';
+                       const draft = document.createElement('div');
+                       draft.className = 'whitespace-pre-wrap border-t border-gray-700 pt-3';
+                       const status = document.createElement('p');
+                       status.className = 'text-sm text-gray-400';
+                       panel.append(title, progress, draft, status);
+                       document.getElementById('results-container').appendChild(panel);
+
+                       startTimer();
+                       const params = new URLSearchParams({topic: topic, plan: ''});
+                       const source = new EventSource(BACKEND_SERVER_URL + '/run-research/stream?' + params);
+                       researchSource = source;
+
+                       function finish(message) {
+                           source.close();
+                           stopTimer();
+                           status.textContent = message;
+                       }
+
+                       source.addEventListener('status', e => { status.textContent = JSON.parse(e.data).message; });
+                       source.addEventListener('planner', e => {
+                           addBlock(progress, '🗺️ Research Plan', JSON.parse(e.data).content, 'bg-gray-800 rounded p-2');
+                           status.textContent = 'Waiting for the 5W1H crews...';
+                       });
+                       source.addEventListener('crew_result', e => {
+                           const data = JSON.parse(e.data);
+                           const result = data.result || {};
+                           const body = result.result || result.error || JSON.stringify(result);
+                           addBlock(progress, '✅ ' + data.crew, body, 'bg-gray-800 rounded p-2');
+                       });
+                       source.addEventListener('compaction', e => {
+                           const data = JSON.parse(e.data);
+                           status.textContent = `Context compacted: ${data.tokens_before} -> ${data.tokens_after} tokens (${data.tokens_saved} saved).`;
+                       });
+                       source.addEventListener('section', e => {
+                           const data = JSON.parse(e.data);
+                           addBlock(progress, '✍️ Section: ' + data.crew, data.content, 'bg-gray-700 rounded p-2');
+                       });
+                       source.addEventListener('token', e => {
+                           status.textContent = 'Writing the report...';
+                           draft.textContent += JSON.parse(e.data).text;
+                       });
+                       source.addEventListener('done', e => {
+                           const data = JSON.parse(e.data);
+                           if (!draft.textContent) draft.textContent = data.draft;
+                           finish('Done.');
+                       });
+                       // Fires for our own 'error' events and for dropped connections.
+                       // Closing here also stops EventSource from re-running the research.
+                       source.addEventListener('error', e => {
+                           finish(e.data ? JSON.parse(e.data).error : 'Connection to the backend was lost.');
+                       });
+                       return false;
+                   }
                ''')
            ),            Body(
                Div(
@@ -59,13 +143,8 @@ def main_page():
                        Button("🚀 Run Research", type="submit",
                               cls="bg-blue-600 hover:bg-blue-700 rounded-lg px-4 py-2 font-semibold"),
                        cls="flex space-x-2",
-                       hx_post=f"{BACKEND_SERVER_URL}/run-research",
-                       hx_target="#results-container",
-                       hx_swap="beforeend",
-                       hx_indicator="#loading-spinner",
-                       # --- HTMX HOOKS FOR TIMER ---
-                       hx_on_submit="startTimer()",
-                       hx_on_after_swap="stopTimer()" # Stops timer when results are streamed back
+                       # --- STREAMED RESULTS: the plan, each crew and the draft render as they arrive ---
+                       onsubmit="return runResearchStream(this)"
                    ),
                    Div(id="results-container", cls="mt-8"),
                    Div("🌀 Thinking...", id="loading-spinner", cls="htmx-indicator mt-4 text-lg text-blue-400", style="display:none;"),
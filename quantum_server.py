@@ -1,13 +1,45 @@
+import os
+import asyncio
 import uvicorn
 from fastapi import FastAPI
 from pydantic import BaseModel
+from utils.metrics import install_metrics
+from utils.quantum_jobs import JobTracker
+from tools import quantum_backend
 from tools.quantum_backend import (
     list_quantum_devices, 
-    run_quantum_circuit, 
-    check_quantum_job_status
+    submit_quantum_circuit, 
+    poll_quantum_job,
+    format_job_status
 )
 
 app = FastAPI()
+install_metrics(app, "quantum_server")  # GET /metrics + route timings
+
+# Submitted jobs are tracked here: one background poller with adaptive
+# backoff, and finished results kept in SQLite (see utils/quantum_jobs.py).
+QUANTUM_JOB_DB = os.environ.get("QUANTUM_JOB_DB", "quantum_jobs.sqlite3")
+QUANTUM_POLL_MIN_S = float(os.environ.get("QUANTUM_POLL_MIN_S", 2.0))
+QUANTUM_POLL_MAX_S = float(os.environ.get("QUANTUM_POLL_MAX_S", 60.0))
+QUANTUM_MAX_WAIT_S = float(os.environ.get("QUANTUM_MAX_WAIT_S", 60.0))
+# Consecutive failed status checks before a job is marked UNKNOWN and dropped
+QUANTUM_MAX_POLL_ERRORS = int(os.environ.get("QUANTUM_MAX_POLL_ERRORS", 8))
+# A status check that takes longer counts as one of those errors
+QUANTUM_POLL_TIMEOUT_S = float(os.environ.get("QUANTUM_POLL_TIMEOUT_S", 30.0))
+# How long /status waits for the first poll of a job it hasn't seen before
+QUANTUM_FIRST_POLL_WAIT_S = 15.0
+
+job_tracker = JobTracker(poll_quantum_job, db_path=QUANTUM_JOB_DB,
+                         min_interval_s=QUANTUM_POLL_MIN_S, max_interval_s=QUANTUM_POLL_MAX_S,
+                         max_poll_errors=QUANTUM_MAX_POLL_ERRORS, poll_timeout_s=QUANTUM_POLL_TIMEOUT_S)
+
+@app.on_event("startup")
+async def start_job_tracker():
+    await job_tracker.start()
+
+@app.on_event("shutdown")
+async def stop_job_tracker():
+    await job_tracker.stop()
 
 class CircuitJobRequest(BaseModel):
     qasm_circuit: str
@@ -23,20 +55,51 @@ def get_devices():
     return {"devices": list_quantum_devices()}
 
 @app.post("/run")
-def submit_job(request: CircuitJobRequest):
+async def submit_job(request: CircuitJobRequest):
     print(f"QuantumServer: Received request for /run on device {request.device_id}")
-    result = run_quantum_circuit(
-        qasm_circuit=request.qasm_circuit,
-        device_id=request.device_id,
-        shots=request.shots
-    )
-    return {"status": result}
+    if quantum_backend.provider is None:
+        return {"status": "Error: QbraidProvider failed to initialize."}
+    try:
+        job_id, status = await asyncio.to_thread(
+            submit_quantum_circuit,
+            qasm_circuit=request.qasm_circuit,
+            device_id=request.device_id,
+            shots=request.shots
+        )
+    except ValueError as e:
+        return {"status": f"Error: {e}"}
+    except Exception as e:
+        return {"status": f"Error submitting quantum job: {e}"}
+    job_tracker.track(job_id, request.device_id, status)
+    return {"status": f"Job ID: {job_id}, Status: {status}", "job_id": job_id}
+
+def job_status_text(job: dict) -> str:
+    if job["status"] == "UNKNOWN":
+        return f"Job Status: UNKNOWN, Error: {job['error']}"
+    if job["status"] is not None:
+        return format_job_status(job)
+    if job["last_poll_error"]:
+        return f"Error checking quantum job status: {job['last_poll_error']}"
+    return "Job Status: UNKNOWN (not polled yet)"
 
 @app.post("/status")
-def get_job_status(request: JobStatusRequest):
-    print(f"QuantumServer: Received request for /status on job {request.job_id}")
-    result = check_quantum_job_status(job_id=request.job_id)
-    return {"status": result}
+async def get_job_status(request: JobStatusRequest, wait: float = 0):
+    """
+    The job's last known status, from the tracker (no provider call).
+    With ?wait=N, blocks up to N seconds (at most QUANTUM_MAX_WAIT_S) until
+    the job's status changes or it finishes.
+    """
+    print(f"QuantumServer: Received request for /status on job {request.job_id} (wait {wait}s)")
+    timeout = min(max(wait, 0.0), QUANTUM_MAX_WAIT_S)
+    known = job_tracker.get(request.job_id)
+    if known is None or known["status"] is None:
+        timeout = max(timeout, QUANTUM_FIRST_POLL_WAIT_S)
+    job = await job_tracker.wait(request.job_id, timeout)
+    return {"status": job_status_text(job), "job": job}
+
+@app.get("/jobs/stats")
+async def get_job_tracker_stats():
+    return job_tracker.stats()
 
 if __name__ == "__main__":
     print("--- 🚀 Starting Quantum Microservice on http://0.0.0.0:9000 ---")
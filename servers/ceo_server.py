@@ -2,10 +2,12 @@
 # This is the "CEO" (v5.0 "Manager") server
 # It runs on the "Dumb" (v28.0) (CPU) (v35.0) base
 from fastapi import FastAPI, BackgroundTasks
+from utils.metrics import install_metrics
 import aiohttp
 import logging
 
 app = FastAPI()
+install_metrics(app, "ceo_server")  # GET /metrics + route timings
 logging.basicConfig(level=logging.INFO)
 
 # "C-Suite" (v17.0) Agent URLs (from docker-compose)
@@ -1,7 +1,9 @@
 # "Hulk Smash 36.0" (Master Blueprint)
 # This is the "CHRO" (v23.0 "R&D Loop") server (GPU)
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 app = FastAPI()
+install_metrics(app, "chro_server")  # GET /metrics + route timings
 @app.post("/critique")
 def critique(data: dict):
     # This "Hulk" (v28.0) (GPU) agent "smashes" (v28.0) (runs) the "LangGraph" (v18.0) "R&D Loop" (v23.0)
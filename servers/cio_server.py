@@ -1,7 +1,9 @@
 # "Hulk Smash 36.0" (Master Blueprint)
 # This is the "CIO" (v21.0 "Gleener") server (GPU)
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 app = FastAPI()
+install_metrics(app, "cio_server")  # GET /metrics + route timings
 @app.get("/")
 def read_root():
     return {"message": "CIO_server (v21.0 'Gleener') is operational (GPU)."}
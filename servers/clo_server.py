@@ -1,7 +1,9 @@
 # "Hulk Smash 36.0" (Master Blueprint)
 # This is the "CLO" (v12.0 "Conscience") server
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 app = FastAPI()
+install_metrics(app, "clo_server")  # GET /metrics + route timings
 @app.get("/")
 def read_root():
     return {"message": "CLO_server (v12.0 'Conscience') is operational."}
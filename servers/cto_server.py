@@ -1,7 +1,9 @@
 # "Hulk Smash 36.0" (Master Blueprint)
 # This is the "CTO" (v30.0 "Embodied") server (GPU)
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 app = FastAPI()
+install_metrics(app, "cto_server")  # GET /metrics + route timings
 @app.post("/execute_rd")
 def execute_rd(mission: dict):
     # This is where the "Hulk" (v28.0) (GPU) "smashes" (v28.0) (runs)
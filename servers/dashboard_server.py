@@ -1,7 +1,9 @@
 # "Hulk Smash 36.0" (Master Blueprint)
 # This is the "dashboard_server" (v6.0 "Hybrid Swarm")
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 app = FastAPI()
+install_metrics(app, "dashboard_server")  # GET /metrics + route timings
 @app.get("/")
 def read_root():
     return {"message": "dashboard_server (v6.0 'Hybrid Swarm') is operational."}
@@ -1,7 +1,9 @@
 # "Hulk Smash 36.0" (Master Blueprint)
 # This is the "docker_proxy" (v12.0 "Padded Cell")
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 app = FastAPI()
+install_metrics(app, "docker_proxy")  # GET /metrics + route timings
 @app.get("/")
 def read_root():
     return {"message": "docker_proxy (v12.0 'Padded Cell') is operational."}
@@ -2,10 +2,12 @@
 # This is the "EA_server" (v32.0 "Padded Layer")
 # It runs on the "Dumb" (v28.0) (CPU) (v35.0) base
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 import aiohttp
 import logging
 
 app = FastAPI()
+install_metrics(app, "ea_server")  # GET /metrics + route timings
 logging.basicConfig(level=logging.INFO)
 
 CEO_URL = "http://ceo_server:8001" # Service name from docker-compose
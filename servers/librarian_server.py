@@ -1,7 +1,9 @@
 # "Hulk Smash 36.0" (Master Blueprint)
 # This is the "Librarian" (v21.0 "Corporate Memory") server
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 app = FastAPI()
+install_metrics(app, "librarian_server")  # GET /metrics + route timings
 @app.get("/")
 def read_root():
     return {"message": "Librarian_server (v21.0) is operational."}
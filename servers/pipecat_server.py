@@ -1,7 +1,9 @@
 # "Hulk Smash 36.0" (Master Blueprint)
 # This is the "pipecat_server" (v30.0 "Embodied")
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 app = FastAPI()
+install_metrics(app, "pipecat_server")  # GET /metrics + route timings
 @app.get("/")
 def read_root():
     return {"message": "pipecat_server (v30.0 'Eyes & Ears') is operational."}
@@ -1,7 +1,9 @@
 # "Hulk Smash 36.0" (Master Blueprint)
 # This is the "quantum_server" (v7.0 "AGI Loop") (GPU)
 from fastapi import FastAPI
+from utils.metrics import install_metrics
 app = FastAPI()
+install_metrics(app, "quantum_server")  # GET /metrics + route timings
 @app.get("/")
 def read_root():
     return {"message": "quantum_server (v7.0 'AGI Loop') is operational (GPU)."}
@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+# The services import their siblings as top-level packages (utils, tools).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import http_cache  # noqa: E402
+
+
+@pytest.fixture
+def response_cache(tmp_path, monkeypatch):
+    """A fresh, enabled process-wide ResponseCache in tmp_path."""
+    cache = http_cache.ResponseCache(db_path=str(tmp_path / "http_cache.sqlite3"))
+    monkeypatch.setattr(http_cache, "HTTP_CACHE_ENABLED", True)
+    monkeypatch.setattr(http_cache, "_cache", cache)
+    return cache
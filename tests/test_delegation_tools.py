@@ -0,0 +1,33 @@
+from tools.delegation_tools import SERVICE_URLS, compile_crew_results, fanout_complete
+
+
+def answers(**overrides) -> dict:
+    return {name: overrides.get(name, {"result": f"{name} findings"}) for name in SERVICE_URLS}
+
+
+def test_complete_fan_out():
+    context = compile_crew_results(answers(), {}, 1.0)
+    assert context["_meta"]["partial"] is False and context["_meta"]["failed"] == []
+    assert fanout_complete(context)
+
+
+def test_missing_crews_make_the_run_partial():
+    results = answers()
+    missed = next(iter(SERVICE_URLS))
+    del results[missed]
+    context = compile_crew_results(results, {}, 1.0)
+    assert context["_meta"]["missing"] == [missed]
+    assert "did not answer" in context[missed]["error"]
+    assert not fanout_complete(context)
+
+
+def test_crews_that_answered_with_an_error_make_the_run_incomplete():
+    failed = list(SERVICE_URLS)[-1]
+    context = compile_crew_results(answers(**{failed: {"error": "Failed to call it"}}), {}, 1.0)
+    assert context["_meta"]["partial"] is False and context["_meta"]["failed"] == [failed]
+    assert not fanout_complete(context)
+
+
+def test_no_fan_out_at_all_is_not_complete():
+    assert not fanout_complete(None)
+    assert not fanout_complete({"who": "text without _meta"})
@@ -0,0 +1,179 @@
+import time
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse
+
+from bench.stubs import StubServer
+from utils.github_client import GitHubClient, RateLimitExceeded
+
+# Trimmed recordings of api.github.com answers for "qiskit".
+SEARCH_RESPONSE = {
+    "total_count": 2,
+    "incomplete_results": False,
+    "items": [
+        {"full_name": "Qiskit/qiskit", "html_url": "https://github.com/Qiskit/qiskit",
+         "description": "Qiskit is an open-source SDK for working with quantum computers.",
+         "stargazers_count": 5400, "language": "Python", "topics": ["quantum-computing", "qiskit", "sdk"],
+         "updated_at": "2026-10-01T12:00:00Z"},
+        {"full_name": "qiskit-community/qiskit-machine-learning",
+         "html_url": "https://github.com/qiskit-community/qiskit-machine-learning",
+         "description": None, "stargazers_count": 700, "language": "Python", "topics": [],
+         "updated_at": "2026-09-20T08:30:00Z"},
+    ],
+}
+READMES = {
+    "Qiskit/qiskit": "# Qiskit\n[![License](https://img.shields.io/badge.svg)](LICENSE)\n\n"
+                     "Qiskit is an open-source SDK for working with quantum computers.\n",
+    "qiskit-community/qiskit-machine-learning": "# Qiskit Machine Learning\n\nQuantum kernels and neural networks.\n",
+}
+GRAPHQL_RESPONSE = {"data": {"search": {"nodes": [
+    {"nameWithOwner": "Qiskit/qiskit", "url": "https://github.com/Qiskit/qiskit",
+     "description": "Qiskit is an open-source SDK for working with quantum computers.",
+     "stargazerCount": 5400, "updatedAt": "2026-10-01T12:00:00Z", "primaryLanguage": {"name": "Python"},
+     "repositoryTopics": {"nodes": [{"topic": {"name": "quantum-computing"}}]},
+     "readmeMd": {"text": "<p align=center><img src=logo.png></p>\nQiskit is an open-source SDK."},
+     "readmeRst": None, "readme": None},
+    {},
+]}}}
+
+
+def rate_headers(resource: str, remaining: int, reset_in: float = 60) -> dict:
+    return {"x-ratelimit-limit": "30", "x-ratelimit-remaining": str(remaining),
+            "x-ratelimit-reset": str(int(time.time() + reset_in)), "x-ratelimit-resource": resource}
+
+
+def github_stub(limited: dict = None) -> FastAPI:
+    """
+    Serves the recordings above. limited maps a path to the answers
+    (status, headers) it gives before the real one, e.g. a 403 or 429.
+    """
+    app = FastAPI()
+    app.state.hits = {}
+    app.state.bodies = []
+    limited = {path: list(answers) for path, answers in (limited or {}).items()}
+
+    def rate_limited(path: str):
+        app.state.hits[path] = app.state.hits.get(path, 0) + 1
+        if limited.get(path):
+            status, headers = limited[path].pop(0)
+            return JSONResponse({"message": "API rate limit exceeded"}, status, headers=headers)
+        return None
+
+    @app.get("/search/repositories")
+    def search(request: Request):
+        return rate_limited("/search/repositories") or JSONResponse(
+            SEARCH_RESPONSE, headers=rate_headers("search", 29))
+
+    @app.get("/repos/{owner}/{name}/readme")
+    def readme(owner: str, name: str, request: Request):
+        path = f"/repos/{owner}/{name}/readme"
+        etag = f'"{owner}-{name}-v1"'
+        if request.headers.get("if-none-match") == etag:
+            app.state.hits[path] = app.state.hits.get(path, 0) + 1
+            return Response(status_code=304, headers={"etag": etag})
+        return rate_limited(path) or Response(READMES[f"{owner}/{name}"], media_type="text/plain",
+                                              headers={"etag": etag, **rate_headers("core", 4999)})
+
+    @app.post("/graphql")
+    async def graphql(request: Request):
+        app.state.bodies.append(await request.json())
+        return rate_limited("/graphql") or JSONResponse(GRAPHQL_RESPONSE, headers=rate_headers("graphql", 4999))
+
+    return app
+
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(app):
+        servers.append(StubServer(app).start())
+        return servers[-1].url
+    yield start
+    for server in servers:
+        server.stop()
+
+
+def search(url: str, token: str = None, max_wait_s: float = 5.0, **kwargs):
+    async def run():
+        client = GitHubClient(token, base_url=url)
+        client.limits.max_wait_s = max_wait_s
+        try:
+            return await client.search_repositories("qiskit", **kwargs)
+        finally:
+            await client.aclose()
+    return asyncio.run(run())
+
+
+def test_rest_search_with_readmes(serve, response_cache):
+    app = github_stub()
+    repos = search(serve(app), top_k=2, readme_chars=200)
+    assert [repo["title"] for repo in repos] == ["Qiskit/qiskit", "qiskit-community/qiskit-machine-learning"]
+    assert repos[0]["stars"] == 5400 and repos[0]["topics"] == ["quantum-computing", "qiskit", "sdk"]
+    assert repos[1]["snippet"] == ""
+    # The badge line is dropped from the excerpt
+    assert repos[0]["readme"] == "# Qiskit Qiskit is an open-source SDK for working with quantum computers."
+    assert app.state.hits["/search/repositories"] == 1
+
+
+def test_expired_entries_are_revalidated_with_their_etag(serve, response_cache):
+    app = github_stub()
+    url = serve(app)
+    first = search(url, top_k=2, readme_chars=200)
+    response_cache.ttls["github"] = 0
+    response_cache.stale_s = 0
+    second = search(url, top_k=2, readme_chars=200)
+    assert second == first
+    assert response_cache.stats()["revalidated"] == 2  # Both READMEs came back 304
+
+
+def test_graphql_search_with_token(serve, response_cache):
+    app = github_stub()
+    repos = search(serve(app), token="test-token", top_k=2, readme_chars=100)
+    assert len(repos) == 1  # Nodes that aren't repositories are skipped
+    assert repos[0]["language"] == "Python" and repos[0]["topics"] == ["quantum-computing"]
+    assert repos[0]["readme"] == "Qiskit is an open-source SDK."
+    assert app.state.bodies[0]["variables"] == {"q": "qiskit sort:stars-desc", "n": 2}
+    assert "readmeMd" in app.state.bodies[0]["query"]
+    assert "/search/repositories" not in app.state.hits
+
+
+@pytest.mark.parametrize("path, token, answer", [
+    ("/search/repositories", None, (403, {"retry-after": "1", **rate_headers("search", 0, 1)})),
+    ("/graphql", "test-token", (429, {"retry-after": "1"})),
+])
+def test_rate_limited_call_waits_and_retries(serve, response_cache, path, token, answer):
+    app = github_stub({path: [answer]})
+    started = time.monotonic()
+    repos = search(serve(app), token=token, top_k=2)
+    assert time.monotonic() - started >= 1.0
+    assert repos[0]["title"] == "Qiskit/qiskit"
+    assert app.state.hits[path] == 2
+
+
+def test_rate_limit_too_far_away_raises(serve, response_cache):
+    app = github_stub({"/search/repositories": [(403, {"retry-after": "600"})]})
+    with pytest.raises(RateLimitExceeded):
+        search(serve(app), top_k=2, max_wait_s=5.0)
+    assert app.state.hits["/search/repositories"] == 1
+
+
+def test_spent_budget_waits_for_the_reset_before_calling(serve, response_cache):
+    app = github_stub()
+    url = serve(app)
+
+    async def run():
+        client = GitHubClient(None, base_url=url)
+        # The last answer said the search budget is spent until about a second from now
+        client.limits.update("search", rate_headers("search", 0, 1))
+        started = time.monotonic()
+        try:
+            await client.search_repositories("qiskit", top_k=2)
+        finally:
+            await client.aclose()
+        return time.monotonic() - started
+
+    assert asyncio.run(run()) >= 1.0
+    assert app.state.hits["/search/repositories"] == 1
@@ -0,0 +1,136 @@
+import time
+import asyncio
+
+import pytest
+
+from utils import http_cache
+from utils.http_cache import ResponseCache
+
+
+class CountingFetch:
+    def __init__(self, *values):
+        self.values = list(values)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        value = self.values.pop(0)
+        if isinstance(value, Exception):
+            raise value
+        return value
+
+
+def wait_for(predicate, timeout: float = 5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+def test_fresh_entries_are_served_without_fetching(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"))
+    fetch = CountingFetch(["result"])
+    assert cache.cached_call("arxiv", ("papers", "qubits", 5), fetch) == ["result"]
+    assert cache.cached_call("arxiv", ("papers", "qubits", 5), fetch) == ["result"]
+    assert fetch.calls == 1
+    # The disk tier survives a restart
+    assert ResponseCache(db_path=str(tmp_path / "cache.sqlite3")).cached_call("arxiv", ("papers", "qubits", 5), fetch) == ["result"]
+    assert fetch.calls == 1
+
+
+def test_errors_are_not_cached(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"))
+    fetch = CountingFetch(RuntimeError("rate limited"), "ok")
+    with pytest.raises(RuntimeError):
+        cache.cached_call("firecrawl", ("search", "q"), fetch)
+    assert cache.cached_call("firecrawl", ("search", "q"), fetch) == "ok"
+    assert fetch.calls == 2
+
+
+def test_stale_entries_are_served_while_one_refresh_runs(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"), ttls={"huggingface": 0.1}, stale_s=60)
+    fetch = CountingFetch("old", "new")
+    cache.cached_call("huggingface", ("models", "asr"), fetch)
+    time.sleep(0.15)
+    assert cache.cached_call("huggingface", ("models", "asr"), fetch) == "old"
+    wait_for(lambda: fetch.calls == 2)
+    wait_for(lambda: cache.cached_call("huggingface", ("models", "asr"), fetch) == "new")
+    assert cache.stats()["stale_hits"] == 1
+
+
+def test_expired_entries_are_fetched_again(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"), ttls={"arxiv": 0.1}, stale_s=0)
+    fetch = CountingFetch("old", "new")
+    cache.cached_call("arxiv", ("q",), fetch)
+    time.sleep(0.15)
+    assert cache.cached_call("arxiv", ("q",), fetch) == "new"
+
+
+def test_conditional_fetch_sends_validators_and_renews_on_304(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"), ttls={"web": 0}, stale_s=0)
+    sent = []
+
+    async def fetch(headers):
+        sent.append(headers)
+        if headers.get("If-None-Match") == '"v1"':
+            return 304, None, {}
+        return 200, "page text", {"etag": '"v1"', "last_modified": "Sat, 17 Oct 2026 10:00:00 GMT"}
+
+    async def main():
+        first = await cache.aconditional("web", ("https://example.org",), fetch)
+        second = await cache.aconditional("web", ("https://example.org",), fetch)
+        return first, second
+
+    assert asyncio.run(main()) == ("page text", "page text")
+    assert sent == [{}, {"If-None-Match": '"v1"', "If-Modified-Since": "Sat, 17 Oct 2026 10:00:00 GMT"}]
+    assert cache.stats()["revalidated"] == 1
+
+
+def test_disk_tier_is_capped_in_bytes(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"), max_bytes=250, memory_size=1)
+    for i in range(5):
+        cache.store(cache.make_key("web", i), "web", "x" * 100)
+        time.sleep(0.01)
+    stats = cache.stats()
+    assert stats["disk"]["web"]["bytes"] <= 250
+    assert stats["evictions"] == 3
+    assert cache.lookup(cache.make_key("web", 0)) is None
+    assert cache.lookup(cache.make_key("web", 4))["value"] == "x" * 100
+
+
+def test_cache_off_calls_straight_through(monkeypatch):
+    monkeypatch.setattr(http_cache, "HTTP_CACHE_ENABLED", False)
+    fetch = CountingFetch("a", "b")
+    assert http_cache.cached_call("arxiv", ("q",), fetch) == "a"
+    assert http_cache.cached_call("arxiv", ("q",), fetch) == "b"
+
+
+def test_should_cache_skips_unusable_values(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"))
+    fetch = CountingFetch("", "# Page")
+    assert cache.cached_call("firecrawl", ("scrape", "u"), fetch, should_cache=bool) == ""
+    assert cache.cached_call("firecrawl", ("scrape", "u"), fetch, should_cache=bool) == "# Page"
+    assert cache.cached_call("firecrawl", ("scrape", "u"), fetch, should_cache=bool) == "# Page"
+    assert fetch.calls == 2
+
+
+def test_hits_do_not_write_to_disk_one_by_one(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"))
+    cache.store(cache.make_key("web", "hot"), "web", "page")
+    statements = []
+    cache._db.set_trace_callback(statements.append)
+    for _ in range(100):
+        assert cache.lookup(cache.make_key("web", "hot"))["value"] == "page"
+    assert statements == []
+
+
+def test_batched_recency_still_guides_eviction(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "cache.sqlite3"), max_bytes=350, memory_size=1)
+    for i in range(3):
+        cache.store(cache.make_key("web", i), "web", "x" * 100)
+        time.sleep(0.01)
+    cache.lookup(cache.make_key("web", 0))  # The oldest entry is now the most recently used
+    time.sleep(0.01)
+    cache.store(cache.make_key("web", 3), "web", "x" * 100)
+    assert cache.lookup(cache.make_key("web", 1)) is None
+    assert cache.lookup(cache.make_key("web", 0)) is not None
@@ -0,0 +1,141 @@
+import asyncio
+
+import pytest
+
+from utils.job_queue import JobQueue, JobQueueFull
+
+
+def test_workers_bound_concurrency_and_record_results(tmp_path):
+    running, peak = 0, 0
+
+    async def runner(payload):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.05)
+        running -= 1
+        return {"echo": payload["n"]}
+
+    async def main():
+        queue = JobQueue(runner, db_path=str(tmp_path / "jobs.sqlite3"), max_queued=10, workers=2)
+        await queue.start()
+        jobs = [queue.submit({"n": n}) for n in range(5)]
+        done = [await queue.wait(job["id"], timeout=5) for job in jobs]
+        await queue.stop()
+        return done
+
+    done = asyncio.run(main())
+    assert [job["status"] for job in done] == ["completed"] * 5
+    assert [job["result"] for job in done] == [{"echo": n} for n in range(5)]
+    assert peak == 2
+
+
+def test_submit_raises_when_full(tmp_path):
+    async def main():
+        gate = asyncio.Event()
+
+        async def runner(payload):
+            await gate.wait()
+            return {}
+
+        queue = JobQueue(runner, db_path=str(tmp_path / "jobs.sqlite3"), max_queued=2, workers=1)
+        await queue.start()
+        queue.submit({})
+        await asyncio.sleep(0.01)  # The worker takes the first job off the queue
+        queue.submit({})
+        queue.submit({})
+        with pytest.raises(JobQueueFull):
+            queue.submit({})
+        gate.set()
+        await queue.stop()
+
+    asyncio.run(main())
+
+
+def test_known_result_is_recorded_without_running(tmp_path):
+    async def runner(payload):
+        raise AssertionError("should not run")
+
+    async def main():
+        queue = JobQueue(runner, db_path=str(tmp_path / "jobs.sqlite3"), workers=1)
+        await queue.start()
+        job = queue.submit({"topic": "t"}, result={"draft": "cached"})
+        await queue.stop()
+        return job
+
+    job = asyncio.run(main())
+    assert job["status"] == "completed"
+    assert job["result"] == {"draft": "cached"}
+
+
+def test_failed_and_cancelled_jobs(tmp_path):
+    async def runner(payload):
+        if payload.get("fail"):
+            raise ValueError("bad input")
+        await asyncio.sleep(10)
+
+    async def main():
+        queue = JobQueue(runner, db_path=str(tmp_path / "jobs.sqlite3"), workers=2)
+        await queue.start()
+        failing = queue.submit({"fail": True})
+        slow = queue.submit({})
+        await asyncio.sleep(0.05)
+        queue.cancel(slow["id"])
+        results = await queue.wait(failing["id"], timeout=5), await queue.wait(slow["id"], timeout=5)
+        await queue.stop()
+        return results
+
+    failed, cancelled = asyncio.run(main())
+    assert failed["status"] == "failed"
+    assert "ValueError: bad input" in failed["error"]
+    assert cancelled["status"] == "cancelled"
+
+
+def test_unfinished_jobs_resume_after_restart(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+
+    async def runner(payload):
+        return {"ran": payload["n"]}
+
+    async def main():
+        first = JobQueue(runner, db_path=db_path, workers=1)
+        job = first.submit({"n": 7})  # Never started: the process "died" with the job queued
+        first._db.close()
+
+        second = JobQueue(runner, db_path=db_path, workers=1)
+        await second.start()
+        finished = await second.wait(job["id"], timeout=5)
+        await second.stop()
+        return finished
+
+    finished = asyncio.run(main())
+    assert finished["status"] == "completed"
+    assert finished["result"] == {"ran": 7}
+
+
+def test_old_and_surplus_finished_jobs_are_pruned(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite3")
+
+    async def runner(payload):
+        return {"ran": payload["n"]}
+
+    async def main():
+        first = JobQueue(runner, db_path=db_path, workers=1)
+        stale = first.submit({"n": 0}, result={"ran": 0})
+        first._update(stale["id"], finished_at=stale["finished_at"] - 3600)
+        queued = first.submit({"n": 1})
+        first._db.close()
+
+        second = JobQueue(runner, db_path=db_path, workers=1, keep_finished=2, finished_ttl_s=60)
+        await second.start()
+        gone = second.get(stale["id"])  # Pruned by age on start()
+        await second.wait(queued["id"], timeout=5)
+        jobs = [queued] + [second.submit({"n": n}, result={"ran": n}) for n in (2, 3)]
+        kept = [second.get(job["id"]) for job in jobs]
+        await second.stop()
+        return gone, kept
+
+    gone, kept = asyncio.run(main())
+    assert gone is None
+    assert kept[0] is None  # Beyond the newest keep_finished
+    assert [job["result"] for job in kept[1:]] == [{"ran": 2}, {"ran": 3}]
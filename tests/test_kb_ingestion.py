@@ -0,0 +1,33 @@
+import json
+
+from utils.kb_ingestion import parse_notebook, iter_parsed_files
+
+
+def write_notebook(path, cells):
+    path.write_text(json.dumps({"cells": [
+        {"cell_type": kind, "metadata": {}, "source": source} for kind, source in cells
+    ]}))
+    return str(path)
+
+
+def test_chunks_with_a_prepended_heading_stay_within_max_chars(tmp_path):
+    paragraph = "Surface codes trade qubit count for logical error rates. "
+    full_path = write_notebook(tmp_path / "nb.ipynb", [
+        ("markdown", "# Error correction in superconducting devices"),
+        ("markdown", "\n\n".join([paragraph * 3] * 12)),
+        ("code", "\n".join(f"print({i})" for i in range(200))),
+    ])
+    chunks = parse_notebook(full_path, "nb.ipynb", max_chars=300)
+    assert len(chunks) > 3
+    assert all(len(chunk["text"]) <= 300 for chunk in chunks)
+    assert all(chunk["text"].startswith("# Error correction") for chunk in chunks)
+
+
+def test_files_are_yielded_in_submission_order(tmp_path):
+    files = {}
+    for i in range(6):
+        name = f"nb{i}.ipynb"
+        files[name] = write_notebook(tmp_path / name, [("markdown", f"# Part {i}\n\ntext {i}")])
+    results = list(iter_parsed_files(files, max_workers=2))
+    assert [source for source, _, _ in results] == list(files)
+    assert all(error is None for _, _, error in results)
@@ -0,0 +1,48 @@
+from utils.llm_cache import CompletionCache
+
+
+def test_key_covers_model_prompt_tools_and_params():
+    key = CompletionCache.make_key("llama3", "prompt", [{"name": "search"}], {"temperature": 0})
+    assert key == CompletionCache.make_key("llama3", "prompt", [{"name": "search"}], {"temperature": 0})
+    assert key != CompletionCache.make_key("mistral", "prompt", [{"name": "search"}], {"temperature": 0})
+    assert key != CompletionCache.make_key("llama3", "prompt.", [{"name": "search"}], {"temperature": 0})
+    assert key != CompletionCache.make_key("llama3", "prompt", None, {"temperature": 0})
+    assert key != CompletionCache.make_key("llama3", "prompt", [{"name": "search"}], {"temperature": 0.7})
+
+
+def test_memory_then_disk_tiers(tmp_path):
+    db_path = str(tmp_path / "llm.sqlite3")
+    cache = CompletionCache(db_path=db_path)
+    key = CompletionCache.make_key("llama3", "What is a qubit?")
+    assert cache.get(key) is None
+    cache.put(key, {"text": "A two-level system."}, model="llama3")
+    assert cache.get(key) == {"text": "A two-level system."}
+    assert cache.get(key, bypass=True) is None
+
+    reopened = CompletionCache(db_path=db_path)
+    assert reopened.get(key) == {"text": "A two-level system."}  # From disk, then promoted
+    assert reopened.get(key) == {"text": "A two-level system."}
+    stats = reopened.stats()
+    assert (stats["hits_disk"], stats["hits_memory"], stats["disk_size"]) == (1, 1, 1)
+    assert cache.stats()["bypassed"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    db_path = str(tmp_path / "llm.sqlite3")
+    cache = CompletionCache(db_path=db_path, memory_size=1, max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert CompletionCache(db_path=db_path).get("a") == 1  # Bumps a's last hit
+    cache.put("c", 3)
+    reopened = CompletionCache(db_path=db_path)
+    assert reopened.get("b") is None
+    assert (reopened.get("a"), reopened.get("c")) == (1, 3)
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_only_cache():
+    cache = CompletionCache(db_path=None, memory_size=2)
+    cache.put("a", "x")
+    assert cache.get("a") == "x"
+    assert cache.get("b") is None
+    assert cache.stats()["disk_size"] is None
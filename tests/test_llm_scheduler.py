@@ -0,0 +1,141 @@
+import os
+import sys
+import time
+import asyncio
+import threading
+import subprocess
+
+import pytest
+
+from bench.stubs import StubServer, fake_ollama_app
+from utils.llm_scheduler import LLMScheduler, SharedSlots, TokenBudgetExceeded
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def queue_in_background(scheduler, order, name, **kwargs):
+    def run():
+        job = scheduler.acquire(**kwargs)
+        order.append(name)
+        scheduler.release(job)
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    time.sleep(0.05)  # Let it reach the queue before the next one
+    return thread
+
+
+def test_priority_classes_are_served_in_order():
+    scheduler = LLMScheduler(max_in_flight=1)
+    held = scheduler.acquire(job="holder")
+    order = []
+    threads = [queue_in_background(scheduler, order, name, job=name, priority=name)
+               for name in ("background", "planning", "interactive")]
+    scheduler.release(held)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == ["interactive", "planning", "background"]
+
+
+def test_jobs_take_turns_within_a_class():
+    scheduler = LLMScheduler(max_in_flight=1)
+    held = scheduler.acquire(job="holder")
+    order = []
+    threads = [queue_in_background(scheduler, order, name, job=name[0])
+               for name in ("a1", "a2", "a3", "b1")]
+    scheduler.release(held)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order.index("b1") < order.index("a2")
+
+
+def test_token_budget_rejects_further_requests():
+    scheduler = LLMScheduler(max_in_flight=2)
+    scheduler.set_budget("job", 100)
+    with scheduler.slot(job="job") as usage:
+        usage["tokens"] = 150
+    assert scheduler.usage("job")["tokens"] == 150
+    with pytest.raises(TokenBudgetExceeded):
+        scheduler.acquire(job="job")
+
+
+def test_shared_pool_serves_the_better_request_of_another_process(tmp_path):
+    # Two schedulers with their own SharedSlots behave like two processes.
+    path = str(tmp_path / "slots.sqlite3")
+    crews = LLMScheduler(max_in_flight=1, shared=SharedSlots(path))
+    backend = LLMScheduler(max_in_flight=1, shared=SharedSlots(path))
+    held = crews.acquire(job="crew", priority="background")
+
+    order = []
+    threads = [queue_in_background(crews, order, "crew", job="crew2", priority="background"),
+               queue_in_background(backend, order, "writer", job="writer", priority="interactive")]
+    assert backend.stats()["in_flight"] == 0  # The pool is full across both
+    crews.release(held)
+    for thread in threads:
+        thread.join(timeout=5)
+    assert order == ["writer", "crew"]
+
+
+def test_cancelled_waiters_leave_the_queue_and_the_shared_pool(tmp_path):
+    path = str(tmp_path / "slots.sqlite3")
+    crews = LLMScheduler(max_in_flight=1, shared=SharedSlots(path))
+    backend = LLMScheduler(max_in_flight=1, shared=SharedSlots(path))
+
+    def heads():
+        return backend.shared._db.execute("SELECT COUNT(*) FROM heads").fetchone()[0]
+
+    async def wait_then_cancel():
+        task = asyncio.create_task(backend.aacquire(job="writer", priority="interactive"))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    held = crews.acquire(job="crew", priority="background")
+    asyncio.run(wait_then_cancel())  # Published as the best waiter while the pool was full
+    assert heads() == 0
+    crews.release(held)
+
+    held = backend.acquire(job="writer")
+    asyncio.run(wait_then_cancel())  # Queued behind the local limit
+    assert backend._heap == [] and heads() == 0
+    backend.release(held)
+    assert crews.shared.in_flight() == 0
+
+
+CLIENT = """
+import sys, threading
+from utils.llm_scheduler import load_ollama
+llm = load_ollama("stub")
+threads = [threading.Thread(target=llm.invoke, args=(f"prompt {i}",)) for i in range(4)]
+for thread in threads: thread.start()
+for thread in threads: thread.join()
+"""
+
+
+def run_clients(ollama_url: str, slot_db: str, processes: int = 2):
+    env = {**os.environ, "PYTHONPATH": ROOT, "OLLAMA_BASE_URL": ollama_url,
+           "OLLAMA_MAX_IN_FLIGHT": "2", "OLLAMA_SLOT_DB": slot_db, "METRICS_ENABLED": "off"}
+    clients = [subprocess.Popen([sys.executable, "-c", CLIENT], env=env, cwd=ROOT) for _ in range(processes)]
+    assert [client.wait(timeout=60) for client in clients] == [0] * processes
+
+
+@pytest.fixture
+def ollama():
+    app = fake_ollama_app(token_latency_s=0.01, tokens=10, first_token_s=0.05)
+    server = StubServer(app).start()
+    yield app, server.url
+    server.stop()
+
+
+def test_in_flight_limit_holds_across_processes(ollama, tmp_path):
+    app, url = ollama
+    run_clients(url, str(tmp_path / "slots.sqlite3"))
+    assert app.state.requests == 8
+    assert app.state.peak_in_flight == 2
+
+
+def test_without_the_shared_pool_each_process_has_its_own_limit(ollama):
+    app, url = ollama
+    run_clients(url, "off")
+    assert app.state.requests == 8
+    assert app.state.peak_in_flight > 2
@@ -0,0 +1,99 @@
+import asyncio
+
+import httpx
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+
+from utils.metrics import HTTP_SERVER_SECONDS, install_metrics
+
+
+def series(service: str, route: str, status: str):
+    """(sum, count) of the server histogram for one label set."""
+    values = HTTP_SERVER_SECONDS._series.get((service, "GET", route, status))
+    return (values[-2], values[-1]) if values else (0.0, 0)
+
+
+def timed_app(service: str) -> FastAPI:
+    app = FastAPI()
+    install_metrics(app, service)
+
+    @app.get("/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                await asyncio.sleep(0.15)
+                yield f"data: {i}\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        if item_id == 0:
+            raise HTTPException(status_code=404, detail="no such item")
+        return {"id": item_id}
+
+    return app
+
+
+def get(app: FastAPI, path: str) -> httpx.Response:
+    async def run():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path)
+    return asyncio.run(run())
+
+
+def test_streamed_responses_are_timed_to_the_end_of_the_stream():
+    app = timed_app("metrics_test_stream")
+    assert get(app, "/stream").text.count("data:") == 3
+    total, count = series("metrics_test_stream", "/stream", "200")
+    assert count == 1 and total >= 0.4
+
+
+def test_routes_are_labelled_by_template_and_status():
+    app = timed_app("metrics_test_routes")
+    get(app, "/items/1")
+    get(app, "/items/2")
+    get(app, "/items/0")
+    assert series("metrics_test_routes", "/items/{item_id}", "200")[1] == 2
+    assert series("metrics_test_routes", "/items/{item_id}", "404")[1] == 1
+    assert get(app, "/metrics").text.count('service="metrics_test_routes"') > 0
+    assert series("metrics_test_routes", "/metrics", "200")[1] == 0
+
+
+def test_client_disconnect_reaches_the_streaming_generator():
+    app = FastAPI()
+    install_metrics(app, "metrics_test_disconnect")
+    closed = asyncio.Event()
+
+    @app.get("/forever")
+    async def forever():
+        async def chunks():
+            try:
+                while True:
+                    await asyncio.sleep(0.05)
+                    yield "data: ping\n\n"
+            finally:
+                closed.set()
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    async def run():
+        requested = False
+
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            await asyncio.sleep(0.3)
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            pass
+
+        scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+                 "scheme": "http", "path": "/forever", "raw_path": b"/forever", "query_string": b"",
+                 "root_path": "", "headers": [], "client": ("127.0.0.1", 1), "server": ("test", 80)}
+        await asyncio.wait_for(app(scope, receive, send), 5)
+        await asyncio.wait_for(closed.wait(), 1)
+
+    asyncio.run(run())
+    assert series("metrics_test_disconnect", "/forever", "200")[1] == 1
@@ -0,0 +1,163 @@
+import time
+import asyncio
+import threading
+
+from utils.quantum_jobs import JobTracker
+
+
+class FakeProvider:
+    """poll(job_id) steps each job through its scripted statuses; unknown ids raise like qBraid does."""
+
+    def __init__(self, scripts: dict):
+        self.scripts = {job_id: list(statuses) for job_id, statuses in scripts.items()}
+        self.polls = []  # (job_id, monotonic time)
+
+    def __call__(self, job_id: str) -> dict:
+        self.polls.append((job_id, time.monotonic()))
+        if job_id not in self.scripts:
+            raise ValueError(f"job {job_id} not found")
+        statuses = self.scripts[job_id]
+        status = statuses.pop(0) if len(statuses) > 1 else statuses[0]
+        return {"status": status, "results": {"00": 512, "11": 512}} if status == "COMPLETED" else {"status": status}
+
+    def count(self, job_id: str) -> int:
+        return sum(1 for polled, _ in self.polls if polled == job_id)
+
+
+def run_with_tracker(provider, db_path, body, **kwargs):
+    async def main():
+        tracker = JobTracker(provider, db_path=str(db_path), **{"min_interval_s": 0.05, "max_interval_s": 0.4, **kwargs})
+        await tracker.start()
+        try:
+            return await body(tracker)
+        finally:
+            await tracker.stop()
+    return asyncio.run(main())
+
+
+def test_unchanged_jobs_are_polled_less_and_less_often(tmp_path):
+    provider = FakeProvider({"job-1": ["RUNNING"]})
+
+    async def body(tracker):
+        tracker.track("job-1", "device", "QUEUED")
+        await asyncio.sleep(2.0)
+
+    run_with_tracker(provider, tmp_path / "jobs.sqlite3", body)
+    times = [at for _, at in provider.polls]
+    gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+    assert 4 <= len(times) <= 12  # Polling every 0.05s throughout would be ~40
+    assert gaps[-1] > 3 * gaps[0]
+    assert max(gaps) < 0.6
+
+
+def test_wait_returns_as_soon_as_the_status_changes(tmp_path):
+    provider = FakeProvider({"job-1": ["QUEUED", "QUEUED", "RUNNING", "COMPLETED"]})
+
+    async def body(tracker):
+        tracker.track("job-1", "device", "QUEUED")
+        started = time.monotonic()
+        job = await tracker.wait("job-1", timeout=10)
+        return job, time.monotonic() - started
+
+    job, waited = run_with_tracker(provider, tmp_path / "jobs.sqlite3", body)
+    assert job["status"] == "RUNNING"
+    assert waited < 2.0
+
+
+def test_finished_results_survive_a_restart_without_polling(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    provider = FakeProvider({"job-1": ["RUNNING", "COMPLETED"]})
+
+    async def finish(tracker):
+        tracker.track("job-1", "device", "QUEUED")
+        while not (await tracker.wait("job-1", timeout=5))["done"]:
+            pass
+
+    run_with_tracker(provider, db_path, finish)
+    polls = len(provider.polls)
+
+    async def ask(tracker):
+        await asyncio.sleep(0.3)
+        return await tracker.wait("job-1", timeout=5), tracker.stats()
+
+    job, stats = run_with_tracker(provider, db_path, ask)
+    assert job["status"] == "COMPLETED" and job["results"] == {"00": 512, "11": 512}
+    assert len(provider.polls) == polls
+    assert stats["cache_hits"] == 1 and stats["tracking"] == 0
+
+
+def test_unfinished_jobs_resume_after_a_restart(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+
+    async def submit(tracker):
+        tracker.track("job-1", "device", "QUEUED")
+
+    run_with_tracker(FakeProvider({}), db_path, submit, min_interval_s=10.0)
+    provider = FakeProvider({"job-1": ["COMPLETED"]})
+
+    async def restart(tracker):
+        return await tracker.wait("job-1", timeout=5)
+
+    assert run_with_tracker(provider, db_path, restart)["status"] == "COMPLETED"
+
+
+def test_unknown_ids_are_given_up_on_and_not_resumed(tmp_path):
+    db_path = tmp_path / "jobs.sqlite3"
+    provider = FakeProvider({})
+
+    async def ask_for_typo(tracker):
+        job = await tracker.wait("typo", timeout=0.5)
+        assert job["status"] is None and "not found" in job["last_poll_error"]
+        await asyncio.sleep(1.5)
+        return tracker.get("typo"), tracker.stats()
+
+    job, stats = run_with_tracker(provider, db_path, ask_for_typo, max_poll_errors=3)
+    assert job["status"] == "UNKNOWN" and job["done"]
+    assert "gave up after 3 failed status checks" in job["error"]
+    assert provider.count("typo") == 3
+    assert stats["gave_up"] == 1 and stats["tracking"] == 0
+
+    async def idle(tracker):
+        await asyncio.sleep(0.5)
+
+    run_with_tracker(provider, db_path, idle, max_poll_errors=3)
+    assert provider.count("typo") == 3
+
+
+def test_asking_again_retries_a_job_that_was_given_up_on(tmp_path):
+    provider = FakeProvider({})
+
+    async def body(tracker):
+        tracker.track("job-1", "device", "QUEUED")
+        await asyncio.sleep(0.5)
+        assert tracker.get("job-1")["status"] == "UNKNOWN"
+        provider.scripts["job-1"] = ["COMPLETED"]  # The provider is back
+        return await tracker.wait("job-1", timeout=5)
+
+    job = run_with_tracker(provider, tmp_path / "jobs.sqlite3", body, max_poll_errors=2)
+    assert job["status"] == "COMPLETED" and job["poll_errors"] == 0
+
+
+def test_a_hung_status_check_does_not_stall_other_jobs(tmp_path):
+    release = threading.Event()
+    provider = FakeProvider({"fast": ["QUEUED", "RUNNING"]})
+
+    def poll(job_id):
+        if job_id == "hung":
+            release.wait(10)
+            raise RuntimeError("released")
+        return provider(job_id)
+
+    async def body(tracker):
+        tracker.track("hung", "device", "QUEUED")
+        tracker.track("fast", "device", "QUEUED")
+        started = time.monotonic()
+        fast = await tracker.wait("fast", timeout=5)
+        waited = time.monotonic() - started
+        await asyncio.sleep(0.6)
+        release.set()  # Let the stuck thread end before the loop shuts down
+        return fast, waited, tracker.get("hung")
+
+    fast, waited, hung = run_with_tracker(poll, tmp_path / "jobs.sqlite3", body, poll_timeout_s=0.5)
+    assert fast["status"] == "RUNNING" and waited < 1.0
+    assert hung["poll_errors"] >= 1 and hung["last_poll_error"].startswith("TimeoutError")
@@ -0,0 +1,59 @@
+import time
+
+from utils.research_cache import ResearchCache
+
+
+def topic_vector(text: str) -> list:
+    """A stand-in embedding: one axis per subject."""
+    return [float("qubit" in text), float("neutrino" in text), 0.1]
+
+
+def test_exact_hits_ignore_case_whitespace_and_trailing_punctuation(tmp_path):
+    cache = ResearchCache(db_path=str(tmp_path / "research.sqlite3"))
+    cache.put("Quantum  Error Correction", "survey", {"report": "..."})
+    hit = cache.get("quantum error correction?", "Survey.")
+    assert hit["match"] == "exact" and hit["result"] == {"report": "..."}
+    assert cache.get("quantum error correction", "tutorial") is None
+    assert cache.get("Quantum Error Correction", "survey", bypass=True) is None
+    stats = cache.stats()
+    assert (stats["hits_exact"], stats["misses"], stats["bypassed"]) == (1, 1, 1)
+
+
+def test_near_duplicate_topics_hit_above_the_threshold(tmp_path):
+    cache = ResearchCache(db_path=str(tmp_path / "research.sqlite3"), embed_fn=topic_vector, similarity_threshold=0.9)
+    cache.put("How do superconducting qubits work", "survey", "qubit report")
+    hit = cache.get("Superconducting qubit basics", "survey")
+    assert hit["match"] == "semantic" and hit["result"] == "qubit report"
+    assert hit["cached_topic"] == "How do superconducting qubits work"
+    assert cache.get("Neutrino oscillations", "survey") is None
+
+
+def test_entries_and_vectors_persist_across_instances(tmp_path):
+    db_path = str(tmp_path / "research.sqlite3")
+    ResearchCache(db_path=db_path, embed_fn=topic_vector).put("qubit topology", "plan", [1, 2, 3])
+    reopened = ResearchCache(db_path=db_path, embed_fn=topic_vector)
+    assert reopened.get("qubit topology", "plan")["result"] == [1, 2, 3]
+    assert reopened.get("topology of a qubit", "plan")["match"] == "semantic"
+
+
+def test_entries_expire_after_the_ttl(tmp_path):
+    cache = ResearchCache(db_path=str(tmp_path / "research.sqlite3"), ttl_s=0.2)
+    cache.put("topic", "plan", "result")
+    assert cache.get("topic", "plan") is not None
+    time.sleep(0.3)
+    assert cache.get("topic", "plan") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_hit_entry_is_evicted(tmp_path):
+    cache = ResearchCache(db_path=str(tmp_path / "research.sqlite3"), max_entries=2)
+    cache.put("first", "plan", 1)
+    time.sleep(0.01)
+    cache.put("second", "plan", 2)
+    time.sleep(0.01)
+    cache.get("first", "plan")
+    time.sleep(0.01)
+    cache.put("third", "plan", 3)
+    assert cache.get("second", "plan") is None
+    assert cache.get("first", "plan")["result"] == 1 and cache.get("third", "plan")["result"] == 3
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,13 @@
+from bench.run_benchmarks import percentile
+
+
+def test_nearest_rank_percentiles():
+    values = list(range(1, 101))
+    assert [percentile(values, p) for p in (50, 95, 99, 100)] == [50, 95, 99, 100]
+    assert [percentile(list(range(1, 11)), p) for p in (50, 95, 99)] == [5, 10, 10]
+
+
+def test_small_and_empty_samples():
+    assert percentile([], 95) == 0.0
+    assert percentile([7.5], 50) == percentile([7.5], 99) == 7.5
+    assert percentile([1, 2], 0) == 1
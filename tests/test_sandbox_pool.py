@@ -0,0 +1,82 @@
+import time
+import threading
+
+import pytest
+
+from utils.sandbox_pool import SandboxPool
+
+
+@pytest.fixture(scope="module")
+def pool():
+    pool = SandboxPool(size=2, cpu_s=5.0, wall_s=10.0, memory_mb=1024).start()
+    yield pool
+    pool.shutdown()
+
+
+def run_streamed(pool, code: str, **kwargs):
+    chunks = []
+    started = time.monotonic()
+    result = pool.execute(code, on_output=lambda text: chunks.append((time.monotonic() - started, text)), **kwargs)
+    return result, chunks
+
+
+def test_output_is_streamed_before_a_long_pause(pool):
+    result, chunks = run_streamed(pool, "import time\nprint('starting')\ntime.sleep(1.5)\nprint('done')")
+    assert result["status"] == "COMPLETED"
+    assert chunks[0][1] == "starting\n"
+    assert chunks[0][0] < 0.8
+    assert "".join(text for _, text in chunks) == result["output"] == "starting\ndone\n"
+
+
+def test_streamed_chunks_add_up_to_the_truncated_output(pool):
+    result, chunks = run_streamed(pool, "for i in range(5000):\n    print(f'line {i}')", max_output_bytes=2000)
+    assert result["truncated"]
+    assert "".join(text for _, text in chunks) == result["output"]
+    assert result["output"].startswith("line 0\n") and result["output"].endswith("line 4999\n")
+
+
+def test_jobs_run_in_parallel_on_separate_workers(pool):
+    results = []
+    code = "import time\ntime.sleep(0.5)"
+    threads = [threading.Thread(target=lambda: results.append(pool.execute(code))) for _ in range(2)]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert time.monotonic() - started < 0.9
+    assert len({result["worker_pid"] for result in results}) == 2
+
+
+def test_jobs_do_not_share_globals(pool):
+    assert pool.execute("global leaked\nleaked = 1")["status"] == "COMPLETED"
+    for _ in range(2):  # Whichever worker picks it up
+        result = pool.execute("print('leaked' in globals())")
+        assert result["output"] == "False\n"
+
+
+def test_cpu_limit_kills_and_replaces_the_worker(pool):
+    before = pool.stats()["cpu_kills"]
+    result = pool.execute("while True:\n    pass", cpu_s=1.0)
+    assert result["status"] == "FAILED" and "CPU time limit" in result["error"]
+    assert pool.stats()["cpu_kills"] == before + 1
+    assert pool.execute("print('still serving')")["output"] == "still serving\n"
+
+
+def test_wall_clock_limit_kills_a_sleeping_job(pool):
+    result = pool.execute("import time\ntime.sleep(30)", wall_s=1.0)
+    assert result["status"] == "FAILED" and "wall-clock limit" in result["error"]
+    assert result["seconds"] < 3
+
+
+def test_memory_limit_fails_the_job_not_the_pool(pool):
+    result = pool.execute("blob = bytearray(4 * 1024 ** 3)")
+    assert result["status"] == "FAILED" and "MemoryError" in result["error"]
+    assert pool.execute("print(1)")["status"] == "COMPLETED"
+
+
+def test_output_is_capped_to_its_head_and_tail(pool):
+    result = pool.execute("for i in range(100000):\n    print(i)", max_output_bytes=1000)
+    assert result["truncated"] and len(result["output"]) < 1100
+    assert result["output"].startswith("0\n1\n") and result["output"].endswith("99999\n")
+    assert "bytes of output omitted" in result["output"]
@@ -0,0 +1,141 @@
+import time
+import threading
+
+import pytest
+
+from utils.sandbox_pool import SandboxPool, SessionManager, SessionLimitReached, SessionStartFailed
+
+
+@pytest.fixture
+def sessions():
+    manager = SessionManager(max_sessions=2, idle_s=60.0, cpu_s=5.0, wall_s=10.0).start()
+    yield manager
+    manager.shutdown()
+
+
+def test_state_carries_over_between_cells(sessions):
+    session_id = sessions.create()["session_id"]
+    assert sessions.execute(session_id, "import math\nradius = 2")["status"] == "COMPLETED"
+    result = sessions.execute(session_id, "print(round(math.pi * radius ** 2, 2))")
+    assert result["output"] == "12.57\n"
+    assert sessions.stats()["sessions"][0]["cells"] == 2
+
+
+def test_session_cells_run_at_module_level_and_pool_jobs_as_a_function():
+    pool = SandboxPool(size=1, cpu_s=5.0, wall_s=10.0).start()
+    manager = SessionManager(max_sessions=1)
+    try:
+        assert pool.execute("print('hi')\nreturn\nprint('unreachable')")["output"] == "hi\n"
+        assert pool.execute("    print('indented')")["output"] == "indented\n"
+        session_id = manager.create()["session_id"]
+        result = manager.execute(session_id, "return 1")
+        assert result["status"] == "FAILED" and "SyntaxError" in result["error"]
+    finally:
+        pool.shutdown()
+        manager.shutdown()
+
+
+def test_concurrent_creates_never_exceed_the_cap(sessions):
+    results, errors = [], []
+
+    def create():
+        try:
+            results.append(sessions.create())
+        except SessionLimitReached as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=create) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=60)
+    stats = sessions.stats()
+    assert stats["live"] <= 2 and stats["starting"] == 0
+    assert len(results) + len(errors) == 5
+    assert stats["created"] == len(results) == stats["live"] + stats["evicted_lru"]
+    live = {session["session_id"] for session in stats["sessions"]}
+    for info in results:
+        if info["session_id"] not in live:
+            with pytest.raises(KeyError):
+                sessions.execute(info["session_id"], "x = 1")
+
+
+def test_least_recently_used_idle_session_is_evicted(sessions):
+    first = sessions.create()["session_id"]
+    second = sessions.create()["session_id"]
+    sessions.execute(first, "x = 1")
+    third = sessions.create()["session_id"]
+    live = {session["session_id"] for session in sessions.stats()["sessions"]}
+    assert live == {first, third}
+    with pytest.raises(KeyError):
+        sessions.execute(second, "x = 1")
+
+
+def test_busy_sessions_are_not_evicted():
+    manager = SessionManager(max_sessions=1, wall_s=10.0)
+    try:
+        session_id = manager.create()["session_id"]
+        cell = threading.Thread(target=manager.execute, args=(session_id, "import time\ntime.sleep(1)"))
+        cell.start()
+        time.sleep(0.3)
+        with pytest.raises(SessionLimitReached):
+            manager.create()
+        cell.join(timeout=10)
+        assert manager.stats()["sessions"][0]["cells"] == 1
+    finally:
+        manager.shutdown()
+
+
+def test_idle_sessions_are_closed():
+    manager = SessionManager(max_sessions=2, idle_s=0.3).start()
+    try:
+        session_id = manager.create()["session_id"]
+        deadline = time.monotonic() + 5
+        while manager.stats()["live"] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert manager.stats()["evicted_idle"] == 1
+        with pytest.raises(KeyError):
+            manager.execute(session_id, "x = 1")
+    finally:
+        manager.shutdown()
+
+
+def test_string_literals_reach_the_code_unchanged():
+    pool = SandboxPool(size=1, cpu_s=5.0, wall_s=10.0).start()
+    try:
+        assert pool.execute('x = """\nabc\n"""\nprint(repr(x))')["output"] == "'\\nabc\\n'\n"
+        # Already indented (here by two spaces): the text goes under the def as is
+        assert pool.execute('  x = """\n  abc\n  """\n  print(repr(x))')["output"] == "'\\n  abc\\n  '\n"
+        assert pool.execute("\tprint('tabs')")["output"] == "tabs\n"
+    finally:
+        pool.shutdown()
+
+
+def test_a_worker_that_fails_to_start_is_reported_not_raised(tmp_path, monkeypatch):
+    import code_executor_server
+    from utils import sandbox_pool
+
+    broken = tmp_path / "broken_worker.py"
+    broken.write_text("import sys\nsys.exit(3)\n")
+    monkeypatch.setattr(sandbox_pool, "WORKER_SCRIPT", str(broken))
+    manager = SessionManager(max_sessions=1)
+    monkeypatch.setattr(code_executor_server, "sessions", manager)
+
+    with pytest.raises(SessionStartFailed):
+        manager.create()
+    request = code_executor_server.CodeExecutionRequest(code="print(1)", permission=True, session_id="new")
+    response = code_executor_server.run_request(request)
+    assert response["status"] == "FAILED" and "failed to start" in response["error"]
+    assert manager.stats()["starting"] == 0 and manager.stats()["live"] == 0
+
+
+def test_a_running_cell_is_not_reaped_as_idle():
+    manager = SessionManager(max_sessions=1, idle_s=0.2).start()
+    try:
+        session_id = manager.create()["session_id"]
+        # last_used is older than idle_s for most of the cell, but the cell holds the session
+        result = manager.execute(session_id, "import time\ntime.sleep(0.8)\nprint('done')")
+        assert result["status"] == "COMPLETED" and not result.get("session_lost")
+        assert manager.stats()["evicted_idle"] == 0
+    finally:
+        manager.shutdown()
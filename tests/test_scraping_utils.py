@@ -0,0 +1,98 @@
+import gzip
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Response
+
+from bench.stubs import StubServer
+from utils import scraping_utils
+from utils.scraping_utils import ScrapeEngine, ascrape_website
+
+PAGE = """<html><head><title>Fixture</title><style>.x { color: red }</style>
+<script>var tracking = "should not appear";</script></head>
+<body><h1>Café crème</h1><p>Quantum error correction keeps logical qubits alive.</p></body></html>"""
+
+
+def fixture_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/plain")
+    def plain():
+        return Response(PAGE.encode("utf-8"), media_type="text/html; charset=utf-8")
+
+    @app.get("/gz")
+    def gz():
+        return Response(gzip.compress(PAGE.encode("utf-8")), media_type="text/html; charset=utf-8",
+                        headers={"Content-Encoding": "gzip"})
+
+    @app.get("/latin1")
+    def latin1():
+        return Response(PAGE.encode("iso-8859-1"), media_type="text/html; charset=iso-8859-1")
+
+    @app.get("/long")
+    def long():
+        return Response(("<p>" + "word " * 5000 + "</p>").encode(), media_type="text/html")
+
+    @app.get("/missing")
+    def missing():
+        return Response("nope", status_code=404)
+
+    return app
+
+
+@pytest.fixture(scope="module")
+def site():
+    server = StubServer(fixture_app()).start()
+    yield server.url
+    server.stop()
+
+
+def scrape(url: str) -> str:
+    return asyncio.run(ascrape_website(url))
+
+
+@pytest.mark.parametrize("path", ["/plain", "/gz", "/latin1"])
+def test_page_text_is_decoded(site, response_cache, path):
+    text = scrape(site + path)
+    assert text.startswith("Fixture Café crème Quantum error correction")
+    assert "tracking" not in text and "color" not in text
+
+
+def test_cache_stores_decoded_text(site, response_cache):
+    scrape(site + "/gz")
+    key = response_cache.make_key("web", site + "/gz", scraping_utils.MAX_WORDS)
+    assert response_cache.lookup(key)["value"].startswith("Fixture Café")
+
+
+def test_words_are_capped(site, response_cache):
+    assert len(scrape(site + "/long").split()) == scraping_utils.MAX_WORDS
+
+
+def test_error_status_is_reported_and_not_cached(site, response_cache):
+    assert scrape(site + "/missing") == f"Error: Failed to retrieve content from {site}/missing"
+    assert response_cache.lookup(response_cache.make_key("web", site + "/missing", scraping_utils.MAX_WORDS)) is None
+
+
+def test_body_is_cut_at_the_byte_cap(site):
+    async def fetch():
+        engine = ScrapeEngine(max_bytes=1000)
+        try:
+            return await engine.fetch(site + "/long")
+        finally:
+            await engine.aclose()
+
+    response, text = asyncio.run(fetch())
+    assert response.status_code == 200
+    assert len(text.encode()) == 1000
+
+
+def test_engine_is_closed_with_its_event_loop(site):
+    async def fetch():
+        engine = scraping_utils.get_engine()
+        assert scraping_utils.get_engine() is engine
+        await engine.fetch(site + "/plain")
+        return engine
+
+    engine = asyncio.run(fetch())
+    assert engine.client.is_closed
+    assert not scraping_utils._engines
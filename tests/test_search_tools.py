@@ -0,0 +1,78 @@
+import time
+import asyncio
+
+import pytest
+
+from tools import search_tools
+from tools.search_tools import afederated_search, federated_search
+
+
+def arxiv_results(query, top_k):
+    return [
+        {"title": "Surface codes for quantum error correction", "url": "https://arxiv.org/abs/1208.0928",
+         "snippet": "Surface codes."},
+        {"title": "A survey of variational algorithms", "url": "https://arxiv.org/abs/2012.09265", "snippet": ""},
+    ][:top_k]
+
+
+async def github_results(query, top_k):
+    return [
+        {"title": "qiskit/qiskit", "url": "https://www.github.com/Qiskit/qiskit/", "snippet": "SDK"},
+        # Same paper as arXiv's first result, under another URL but the same title
+        {"title": "Surface Codes for Quantum Error-Correction", "url": "https://example.org/surface-codes",
+         "snippet": "Surface codes: towards practical large-scale quantum computation, a longer abstract."},
+    ]
+
+
+def hf_results(query, top_k):
+    return [{"title": "Qiskit", "url": "https://github.com/qiskit/qiskit", "snippet": ""}]
+
+
+async def slow_results(query, top_k):
+    await asyncio.sleep(5)
+    return [{"title": "late", "url": "https://late.example", "snippet": ""}]
+
+
+def failing_results(query, top_k):
+    raise ConnectionError("source unreachable")
+
+
+@pytest.fixture(autouse=True)
+def fake_sources(monkeypatch):
+    monkeypatch.setattr(search_tools, "SOURCES", {
+        "arxiv": (f"{__name__}:arxiv_results", False),
+        "github": (f"{__name__}:github_results", True),
+        "hf_models": (f"{__name__}:hf_results", False),
+        "slow": (f"{__name__}:slow_results", True),
+        "broken": (f"{__name__}:failing_results", False),
+    })
+
+
+def test_results_are_merged_deduplicated_and_fused():
+    merged, report = asyncio.run(afederated_search("qec", ["arxiv", "github", "hf_models"], top_k=5))
+    # qiskit is first in two lists, the surface-code paper first and second
+    assert [item["title"] for item in merged] == [
+        "qiskit/qiskit", "Surface codes for quantum error correction", "A survey of variational algorithms"]
+    assert merged[0]["sources"] == ["github", "hf_models"]  # Same repo; the URL differs in case, www and slash
+    assert merged[1]["sources"] == ["arxiv", "github"]  # Same title, different URL
+    assert merged[1]["snippet"].startswith("Surface codes: towards")  # The longer snippet wins
+    assert merged[0]["score"] > merged[1]["score"] > merged[2]["score"]
+    assert {name: status["results"] for name, status in report.items()} == {"arxiv": 2, "github": 2, "hf_models": 1}
+
+
+def test_slow_and_failing_sources_do_not_hold_up_the_rest():
+    started = time.monotonic()
+    merged, report = asyncio.run(afederated_search("qec", ["arxiv", "slow", "broken"], deadline_s=0.5))
+    assert time.monotonic() - started < 1.5
+    assert report["slow"]["status"] == "timeout"
+    assert report["broken"] == {"status": "error", "seconds": report["broken"]["seconds"], "error": "source unreachable"}
+    assert report["arxiv"]["status"] == "ok" and len(merged) == 2
+
+
+def test_tool_output_is_bounded_and_reports_each_source(monkeypatch):
+    monkeypatch.setattr(search_tools, "FEDERATED_SEARCH_DEADLINE_S", 0.5)
+    text = federated_search.invoke({"query": "qec", "sources": "arxiv,github,broken", "max_results": 1})
+    assert "1. Surface codes for quantum error correction" in text and "2." not in text
+    assert "Showing 1 of 3 merged results" in text
+    assert "- broken: error after" in text
+    assert federated_search.invoke({"query": "qec", "sources": "arxiv,nope"}).startswith("Error: unknown sources nope")
@@ -1,30 +1,46 @@
-import requests
+import os
+import httpx
 from langchain_core.tools import tool
+from utils.metrics import timed_tool
+from utils.service_client import get_service_client, async_tool
 
 CODE_EXECUTOR_URL = "http://localhost:9090"
+# Longer output is cut to its head and tail, to keep prompts small
+CODE_OUTPUT_MAX_BYTES = int(os.environ.get("CODE_OUTPUT_MAX_BYTES", 8000))
+# Covers the sandbox's queue wait plus its wall-clock limit
+CODE_EXECUTOR_TIMEOUT_S = float(os.environ.get("CODE_EXECUTOR_TIMEOUT_S", 120.0))
 
+@async_tool
 @tool("Execute Python Code Tool")
-def execute_python_code(code: str, permission: bool = False) -> str:
+@timed_tool("execute_python_code")
+async def execute_python_code(code: str, permission: bool = False, session_id: str = None) -> str:
     """
     Executes a block of safe, controlled Python code within an isolated sandbox.
     Requires 'permission=True' flag for human vetting/safety guardrails.
-    Returns the execution status and output.
+    For multi-step work, pass session_id='new' on the first call and the
+    returned session id on later calls: imports and variables are kept
+    between calls in a session. Code without a session runs as the body of
+    a function, so a top-level 'return' ends it; session code runs at
+    module level, where 'return' is a SyntaxError, so print results instead.
+    Returns the execution status and output (long output keeps only its
+    beginning and end).
     """
-    print(f"Tool: execute_python_code (Code Length: {len(code)}, Permission: {permission})")
+    print(f"Tool: execute_python_code (Code Length: {len(code)}, Permission: {permission}, Session: {session_id})")
     
     # Send the request to the new microservice
     try:
-        payload = {"code": code, "permission": permission}
-        response = requests.post(f"{CODE_EXECUTOR_URL}/execute", json=payload)
-        response.raise_for_status()
-        
-        result = response.json()
+        payload = {"code": code, "permission": permission, "session_id": session_id,
+                   "max_output_bytes": CODE_OUTPUT_MAX_BYTES}
+        result = await get_service_client(CODE_EXECUTOR_URL, CODE_EXECUTOR_TIMEOUT_S).post_json("/execute", payload)
         if result['status'] == "DENIED":
             # This simulates the HITL step: the agent must re-issue the command 
             # with the permission flag set after human review.
             return f"CODE EXECUTION DENIED. You must request execution with 'permission=True' after human review. Error: {result['error']}"
         
-        return f"Code Execution Result (Status: {result['status']}):\n{result.get('output', result.get('error'))}"
+        # A failed run can have printed something before its error
+        text = "\n".join(part for part in (result.get("output"), result.get("error")) if part)
+        session = f" (Session: {result['session_id']})" if result.get("session_id") else ""
+        return f"Code Execution Result (Status: {result['status']}){session}:\n{text}"
         
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         return f"Error communicating with Executor Server: {e}. Check if Code Executor (Port 9090) is running."
@@ -1,6 +1,11 @@
+import os
+import time
 import asyncio
 import httpx
 from langchain_core.tools import tool
+from utils.metrics import timed_tool
+from langchain_core.callbacks.manager import adispatch_custom_event
+from utils.llm_scheduler import current_job
 
 # Define all 6 service URLs
 SERVICE_URLS = {
@@ -12,16 +17,170 @@ SERVICE_URLS = {
     "why_crew": "http://localhost:8006/run_why",
 }
 
+# Set CREW_HOST_URL (e.g. http://localhost:8001) to send every crew to one
+# crew_host_service.py port via its /run/{crew} route instead.
+CREW_HOST_URL = os.environ.get("CREW_HOST_URL")
+if CREW_HOST_URL:
+    SERVICE_URLS = {name: f"{CREW_HOST_URL.rstrip('/')}/run/{name[:-len('_crew')]}" for name in SERVICE_URLS}
+
+# --- FAN-OUT POLICY ---
+# Each crew gets its own timeout, retry budget and hedge delay (after which a
+# second, identical request races the first). The whole fan-out is capped by
+# DELEGATION_DEADLINE_S: whatever has landed by then is returned, marked partial.
+DEFAULT_CREW_POLICY = {"timeout": 30.0, "retries": 1, "hedge_after": 10.0}
+CREW_POLICIES = {
+    # e.g. "how_crew": {"timeout": 45.0, "retries": 0, "hedge_after": None},
+}
+DELEGATION_DEADLINE_S = float(os.environ.get("DELEGATION_DEADLINE_S", 45.0))
+RETRY_BACKOFF_S = 0.5
+
+try:
+    import h2  # noqa: F401  (httpx only speaks HTTP/2 when h2 is installed)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client = None
+_client_loop = None
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Returns the module-level pooled client (keep-alive, HTTP/2 where the
+    server supports it). A new one is made if the event loop changed.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(max_connections=64, max_keepalive_connections=24, keepalive_expiry=30.0),
+            timeout=httpx.Timeout(DEFAULT_CREW_POLICY["timeout"], connect=5.0),
+        )
+        _client_loop = loop
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+
+def crew_policy(name: str) -> dict:
+    return {**DEFAULT_CREW_POLICY, **CREW_POLICIES.get(name, {})}
+
+async def _post_once(client, url, payload, timeout):
+    # Lets the crew host queue this job's LLM calls fairly against other jobs
+    headers = {"X-Research-Job": current_job.get()} if current_job.get() else None
+    response = await client.post(url, json=payload, timeout=timeout, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+async def _hedged_post(client, url, payload, timeout, hedge_after):
+    """
+    Sends the request and, if it hasn't answered within hedge_after seconds,
+    races an identical second request. The first success wins; the loser is cancelled.
+    """
+    first = asyncio.create_task(_post_once(client, url, payload, timeout))
+    if not hedge_after or hedge_after >= timeout:
+        return await first
+    done, _ = await asyncio.wait({first}, timeout=hedge_after)
+    if done:
+        return first.result()
+    second = asyncio.create_task(_post_once(client, url, payload, timeout - hedge_after))
+    pending = {first, second}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+        raise first.exception() or second.exception()
+    finally:
+        for task in pending:
+            task.cancel()
+
 async def call_service(client, name, url, payload):
-    """Helper function to make a single async POST request."""
+    """Calls one crew with its timeout, hedging and retry budget. Never raises."""
+    policy = crew_policy(name)
+    last_error = None
+    for attempt in range(policy["retries"] + 1):
+        if attempt:
+            await asyncio.sleep(RETRY_BACKOFF_S * 2 ** (attempt - 1))
+        try:
+            return name, await _hedged_post(client, url, payload, policy["timeout"], policy["hedge_after"])
+        except httpx.HTTPStatusError as e:
+            last_error = f"HTTP {e.response.status_code} from {name}"
+            if e.response.status_code < 500:
+                break  # A 4xx won't get better on retry
+        except (httpx.RequestError, asyncio.TimeoutError, ValueError) as e:
+            last_error = f"{type(e).__name__}: {e}"
+    return name, {"error": f"Failed to call {name}: {last_error}"}
+
+async def report_crew_result(name, result):
+    """
+    Publishes one crew's result on the graph's event stream as a
+    'crew_result' custom event, so streaming clients see it as it lands.
+    A no-op when the tool runs outside a LangChain run.
+    """
     try:
-        response = await client.post(url, json=payload, timeout=60.0)
-        response.raise_for_status()
-        return name, response.json()
-    except httpx.RequestError as e:
-        return name, {"error": f"Failed to call {name}: {str(e)}"}
+        await adispatch_custom_event("crew_result", {"crew": name, "result": result})
+    except RuntimeError:
+        pass
+
+async def iter_crew_results(topic: str, plan: str, deadline_s: float = None):
+    """
+    Fans out to all 6 crews and yields (name, result, elapsed_s) as each one
+    answers, until every crew did or the deadline hit. Each result is also
+    reported on the graph's event stream.
+    """
+    deadline_s = DELEGATION_DEADLINE_S if deadline_s is None else deadline_s
+    payload = {"topic": topic, "plan": plan}
+    client = get_client()
+    started = time.monotonic()
+
+    # Create a list of tasks to run concurrently
+    tasks = []
+    for name, url in SERVICE_URLS.items():
+        tasks.append(asyncio.create_task(call_service(client, name, url, payload)))
+
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=deadline_s):
+            name, result = await next_done
+            await report_crew_result(name, result)
+            yield name, result, round(time.monotonic() - started, 3)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+
+def compile_crew_results(results: dict, timings: dict, elapsed_s: float) -> dict:
+    """
+    Orders results like SERVICE_URLS, fills in crews that missed the
+    deadline and adds a _meta block (partial, missing, failed, timings).
+    """
+    missing = [name for name in SERVICE_URLS if name not in results]
+    failed = [name for name in SERVICE_URLS if isinstance(results.get(name), dict) and results[name].get("error")]
+    compiled_results = {
+        name: results.get(name, {"error": f"{name} did not answer within the {DELEGATION_DEADLINE_S}s deadline."})
+        for name in SERVICE_URLS
+    }
+    compiled_results["_meta"] = {
+        "partial": bool(missing),
+        "missing": missing,
+        "failed": failed,
+        "elapsed_s": round(elapsed_s, 3),
+        "timings_s": timings,
+    }
+    return compiled_results
+
+def fanout_complete(research_context: dict) -> bool:
+    """True when every crew answered within the deadline and none with an error."""
+    meta = (research_context or {}).get("_meta")
+    return bool(meta) and not meta["partial"] and not meta.get("failed")
 
 @tool("Delegate to 5W1H Crews")
+@timed_tool("delegate_to_5w1h_crews")
 async def delegate_to_5w1h_crews(topic: str, plan: str) -> dict:
     """
     Delegates research to all 6 specialized (Who, What, When, Where, How, Why)
@@ -29,19 +188,20 @@ async def delegate_to_5w1h_crews(topic: str, plan: str) -> dict:
     Returns a JSON object of all results.
     """
     print(f"--- 🛠️ Tool: Fanning out to 6 parallel microservices... ---")
-    payload = {"topic": topic, "plan": plan}
-    
-    async with httpx.AsyncClient() as client:
-        # Create a list of tasks to run concurrently
-        tasks = []
-        for name, url in SERVICE_URLS.items():
-            tasks.append(call_service(client, name, url, payload))
-            
-        # Run all tasks in parallel
-        results = await asyncio.gather(*tasks)
-        
-    # Convert the list of (name, result) tuples into a dictionary
-    compiled_results = {name: result for name, result in results}
-    
-    print(f"--- ✅ Tool: Received all 6 parallel responses. ---")
+    started = time.monotonic()
+
+    # Run all crews in parallel, collecting each result as it lands,
+    # until every crew answered or the overall deadline hit
+    results, timings = {}, {}
+    async for name, result, elapsed in iter_crew_results(topic, plan):
+        results[name] = result
+        timings[name] = elapsed
+
+    compiled_results = compile_crew_results(results, timings, time.monotonic() - started)
+    missing = compiled_results["_meta"]["missing"]
+
+    if missing:
+        print(f"--- ⚠️ Tool: Deadline hit. Returning {len(results)}/6 responses (missing: {', '.join(missing)}). ---")
+    else:
+        print(f"--- ✅ Tool: Received all 6 parallel responses. ---")
     return compiled_results
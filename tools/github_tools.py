@@ -1,43 +1,55 @@
 import os
+import httpx
 from langchain_core.tools import tool
-from github import Github, GithubException
+from utils.metrics import timed_tool
+from utils.github_client import get_github_client, RateLimitExceeded
+from utils.scraping_utils import run_sync
+from utils.service_client import async_tool
 
-# Initialize the Github object using the token from our .env file
-try:
-    github_client = Github(os.environ.get("GITHUB_TOKEN"))
-except Exception as e:
-    print(f"Warning: Could not initialize GitHub client. {e}")
-    github_client = None
+# Every call goes through utils/github_client.py: one GraphQL query per
+# search when GITHUB_TOKEN is set, conditional cached REST calls otherwise,
+# and requests paced by the X-RateLimit-* headers.
+README_EXCERPT_CHARS = int(os.environ.get("GITHUB_README_EXCERPT_CHARS", 500))
 
+async def agithub_repo_results(query: str, top_k: int = 5, include_readme: bool = False) -> list:
+    """[{"title", "url", "snippet", "stars", ...}] for the top_k repositories by stars."""
+    return await get_github_client().search_repositories(query, top_k, README_EXCERPT_CHARS if include_readme else 0)
+
+def github_repo_results(query: str, top_k: int = 5, include_readme: bool = False) -> list:
+    return run_sync(agithub_repo_results(query, top_k, include_readme))
+
+@async_tool
 @tool("GitHub Repository Search Tool")
-def search_github_repositories(query: str, top_k: int = 5) -> str:
+@timed_tool("search_github_repositories")
+async def search_github_repositories(query: str, top_k: int = 5, include_readme: bool = False) -> str:
     """
     Searches GitHub for repositories matching a query.
     Returns the top_k results with their name, description, and URL.
+    Set include_readme=True to add an excerpt of each README.
     """
     print(f"Tool: search_github_repositories (Query: {query})")
-    if github_client is None:
-        return "Error: GitHub client not initialized. Check GITHUB_TOKEN."
-    
     try:
-        repositories = github_client.search_repositories(query, sort="stars", order="desc")
-        
         output = []
-        for i, repo in enumerate(repositories):
-            if i >= top_k:
-                break
-            output.append(
-                f"- Repo: {repo.full_name}\n"
-                f"  URL: {repo.html_url}\n"
-                f"  Stars: {repo.stargazers_count}\n"
-                f"  Description: {repo.description}\n"
+        for repo in await agithub_repo_results(query, top_k, include_readme):
+            entry = (
+                f"- Repo: {repo['title']}\n"
+                f"  URL: {repo['url']}\n"
+                f"  Stars: {repo['stars']}\n"
+                f"  Description: {repo['snippet'] or None}\n"
             )
-        
+            if repo.get("language"):
+                entry += f"  Language: {repo['language']}\n"
+            if repo.get("readme"):
+                entry += f"  README: {repo['readme']}\n"
+            output.append(entry)
+
         if not output:
             return f"No GitHub repositories found for: {query}"
-            
+
         return "\n".join(output)
-    except GithubException as e:
-        return f"Error searching GitHub: {e.payload}"
+    except RateLimitExceeded as e:
+        return f"Error searching GitHub: {e}"
+    except httpx.HTTPStatusError as e:
+        return f"Error searching GitHub: {e.response.status_code} {e.response.text[:300]}"
     except Exception as e:
         return f"An unexpected error occurred: {e}"
@@ -1,68 +1,88 @@
-import requests
 from bs4 import BeautifulSoup
 from langchain_core.tools import tool
+from utils.metrics import timed_tool
 
 # --- THIS IS THE REFACTOR ---
-# We now import our robust, reusable helper function
-from utils.scraping_utils import scrape_website
+# We now import our robust, reusable helpers: the search pages and the
+# result pages all go through the pooled, rate-limited scraping engine and
+# the shared response cache.
+from utils.scraping_utils import acached_page, ascrape_many
+from utils.service_client import async_tool
 # --------------------------
 
+async def _search_links(search_url: str, selector: str) -> list:
+    """[title, href] for each result link on a search page (cached as source "librarian")."""
+    def parse(html):
+        return [[a.get_text(strip=True), a['href']] for a in BeautifulSoup(html, 'html.parser').select(selector)]
+    return await acached_page("librarian", search_url, parse) or []
+
+# --- STRUCTURED RESULTS: [{"title", "url", "snippet"}], also used by federated search ---
+
+async def oreilly_results(query: str, top_k: int = 3) -> list:
+    search_url = f"httpsfs://www.oreilly.com/search/?query={query}"
+    results = await _search_links(search_url, 'a[href][data-testid="search-result-title-link"]')
+    top = [(title, f"https"f"://www.oreilly.com{href}") for title, href in results[:top_k]]
+    # --- ALL THE RESULT PAGES ARE SCRAPED AT ONCE ---
+    snippets = await ascrape_many([url for _, url in top])
+    return [{"title": title, "url": url, "snippet": snippet} for (title, url), snippet in zip(top, snippets)]
+
+async def coursera_results(query: str, top_k: int = 3) -> list:
+    search_url = f"httpsfs://www.coursera.org/search?query={query}"
+    results = await _search_links(search_url, 'main ul > li a[data-e2e="search-card-listing-title-link"]')
+    return [{"title": title, "url": f"https://www.coursera.org{href}", "snippet": ""} for title, href in results[:top_k]]
+
+async def deeplearning_ai_results(query: str, top_k: int = 3) -> list:
+    search_url = f"httpsfs://www.deeplearning.ai/search/?s={query}"
+    results = await _search_links(search_url, 'h3.search-card__title a')
+    return [{"title": title, "url": href, "snippet": ""} for title, href in results[:top_k]]
+
+@async_tool
 @tool("O'Reilly Search Tool")
-def search_oreilly(query: str) -> str:
+@timed_tool("search_oreilly")
+async def search_oreilly(query: str) -> str:
     """
     Searches the O'Reilly learning platform for books and courses
     related to the query. Scrapes the top 3 results.
     """
     print(f"Tool: search_oreilly (Query: {query})")
-    search_url = f"httpsfs://www.oreilly.com/search/?query={query}"
     try:
-        response = requests.get(search_url, headers={'User-Agent': 'Mozilla/5.0'})
-        soup = BeautifulSoup(response.content, 'html.parser')
-        results = soup.find_all('a', href=True, attrs={'data-testid': 'search-result-title-link'})
+        results = await oreilly_results(query)
         if not results: return f"No O'Reilly results found for: {query}"
-        output = []
-        for res in results[:3]:
-            title = res.get_text(strip=True)
-            url = f"https"f"://www.oreilly.com{res['href']}"
-            # --- SEE HOW CLEAN THIS IS? ---
-            snippet = scrape_website(url) 
-            output.append(f"- Title: {title}\n  URL: {url}\n  Snippet: {snippet}\n")
+        output = [f"- Title: {r['title']}\n  URL: {r['url']}\n  Snippet: {r['snippet']}\n" for r in results]
         return "\n".join(output)
     except Exception as e:
         return f"Error searching O'Reilly: {e}"
 
+@async_tool
 @tool("Coursera Search Tool")
-def search_coursera(query: str) -> str:
+@timed_tool("search_coursera")
+async def search_coursera(query: str) -> str:
     """
     Searches Coursera for courses related to the query.
     Returns the top 3 results.
     """
     print(f"Tool: search_coursera (Query: {query})")
-    search_url = f"httpsfs://www.coursera.org/search?query={query}"
     try:
-        response = requests.get(search_url, headers={'User-Agent': 'Mozilla/5.0'})
-        soup = BeautifulSoup(response.content, 'html.parser')
-        results = soup.select('main ul > li a[data-e2e="search-card-listing-title-link"]')
+        results = await coursera_results(query)
         if not results: return f"No Coursera results found for: {query}"
-        output = [f"- Title: {r.get_text(strip=True)}\n  URL: https://www.coursera.org{r['href']}\n" for r in results[:3]]
+        output = [f"- Title: {r['title']}\n  URL: {r['url']}\n" for r in results]
         return "\n".join(output)
     except Exception as e:
         return f"Error searching Coursera: {e}"
 
+@async_tool
 @tool("DeepLearning.AI Search Tool")
-def search_deeplearning_ai(query: str) -> str:
+@timed_tool("search_deeplearning_ai")
+async def search_deeplearning_ai(query: str) -> str:
     """
     Searches DeepLearning.AI for courses and content
     related to the query. Returns the top 3 results.
     """
     print(f"Tool: search_deeplearning_ai (Query: {query})")
-    search_url = f"httpsfs://www.deeplearning.ai/search/?s={query}"
     try:
-        response = requests.get(search_url, headers={'User-Agent': 'Mozilla/5.0'})
-        soup = BeautifulSoup(response.content, 'html.parser')
-        results = soup.select('h3.search-card__title a')
+        results = await deeplearning_ai_results(query)
         if not results: return f"No DeepLearning.AI results found for: {query}"
-        output = [f"- Title: {r.get_text(strip=True)}\n  URL: {r['href']}\n" for r in results[:3]]
+        output = [f"- Title: {r['title']}\n  URL: {r['url']}\n" for r in results]
         return "\n".join(output)
     except Exception as e:
         return f"Error searching DeepLearning.AI: {e}"
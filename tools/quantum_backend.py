@@ -23,29 +23,48 @@ def list_quantum_devices() -> str:
     except Exception as e:
         return f"Error fetching Qbraid devices: {e}"
 
+def submit_quantum_circuit(qasm_circuit: str, device_id: str, shots: int = 1024) -> tuple:
+    """Submits the circuit and returns (job_id, status). Raises on failure."""
+    device = provider.get_device(device_id)
+    if not device: raise ValueError(f"Device ID '{device_id}' not found.")
+    jobs = device.run([qasm_circuit], shots=shots)
+    job = jobs[0]
+    status = job.status()
+    return job.id, getattr(status, "name", str(status))
+
 def run_quantum_circuit(qasm_circuit: str, device_id: str, shots: int = 1024) -> str:
     print(f"QuantumBackend: run_quantum_circuit (Device: {device_id})")
     if provider is None: return "Error: QbraidProvider failed to initialize."
     try:
-        device = provider.get_device(device_id)
-        if not device: return f"Error: Device ID '{device_id}' not found."
-        jobs = device.run([qasm_circuit], shots=shots)
-        job = jobs[0]
-        return f"Job ID: {job.id}, Status: {job.status()}"
+        job_id, status = submit_quantum_circuit(qasm_circuit, device_id, shots)
+        return f"Job ID: {job_id}, Status: {status}"
+    except ValueError as e:
+        return f"Error: {e}"
     except Exception as e:
         return f"Error submitting quantum job: {e}"
 
+def poll_quantum_job(job_id: str) -> dict:
+    """One remote status check: {"status", "results"? (counts), "error"?}. Raises on failure."""
+    job = QbraidJob(job_id)
+    status = job.status()
+    state = {"status": getattr(status, "name", str(status))}
+    if state["status"] == "COMPLETED":
+        state["results"] = {str(k): v for k, v in job.result().data.get_counts().items()}
+    elif state["status"] == "FAILED":
+        state["error"] = job.error_message()
+    return state
+
+def format_job_status(state: dict) -> str:
+    if state["status"] == "COMPLETED":
+        return f"Job Status: COMPLETED, Results: {state['results']}"
+    elif state["status"] == "FAILED":
+        return f"Job Status: FAILED, Error: {state.get('error')}"
+    else:
+        return f"Job Status: {state['status']}"
+
 def check_quantum_job_status(job_id: str) -> str:
     print(f"QuantumBackend: check_quantum_job_status (Job ID: {job_id})")
     try:
-        job = QbraidJob(job_id)
-        status = job.status()
-        if status == "COMPLETED":
-            results = job.result()
-            return f"Job Status: COMPLETED, Results: {results.data.get_counts()}"
-        elif status == "FAILED":
-            return f"Job Status: FAILED, Error: {job.error_message()}"
-        else:
-            return f"Job Status: {status}"
+        return format_job_status(poll_quantum_job(job_id))
     except Exception as e:
         return f"Error checking quantum job status: {e}"
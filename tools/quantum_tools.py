@@ -1,24 +1,34 @@
-import requests
+import os
 from langchain_core.tools import tool
+from utils.metrics import timed_tool
+from utils.service_client import get_service_client, async_tool
 
 QUANTUM_SERVER_URL = "http://localhost:9000"
+QUANTUM_TIMEOUT_S = float(os.environ.get("QUANTUM_TIMEOUT_S", 30.0))
 
+# The tools are async (a pooled, keep-alive client per event loop);
+# async_tool() keeps them callable synchronously too.
+def quantum_server():
+    return get_service_client(QUANTUM_SERVER_URL, QUANTUM_TIMEOUT_S)
+
+@async_tool
 @tool("List Quantum Devices Tool")
-def list_quantum_devices() -> str:
+@timed_tool("list_quantum_devices")
+async def list_quantum_devices() -> str:
     """
     Fetches a list of all available quantum devices (computers and
     simulators) from the Quantum Server.
     """
     print("Tool: list_quantum_devices (calling Quantum Server at /devices)")
     try:
-        response = requests.get(f"{QUANTUM_SERVER_URL}/devices")
-        response.raise_for_status() 
-        return response.json().get("devices", "Error: No devices key")
+        return (await quantum_server().get_json("/devices")).get("devices", "Error: No devices key")
     except Exception as e:
         return f"Error connecting to Quantum Server: {e}"
 
+@async_tool
 @tool("Run Quantum Circuit Tool")
-def run_quantum_circuit(qasm_circuit: str, device_id: str, shots: int = 1024) -> str:
+@timed_tool("run_quantum_circuit")
+async def run_quantum_circuit(qasm_circuit: str, device_id: str, shots: int = 1024) -> str:
     """
     Submits a quantum circuit (in QASM format) to the Quantum Server
     to be run on a specified 'device_id'.
@@ -26,23 +36,25 @@ def run_quantum_circuit(qasm_circuit: str, device_id: str, shots: int = 1024) ->
     print(f"Tool: run_quantum_circuit (calling Quantum Server at /run)")
     try:
         payload = {"qasm_circuit": qasm_circuit, "device_id": device_id, "shots": shots}
-        response = requests.post(f"{QUANTUM_SERVER_URL}/run", json=payload)
-        response.raise_for_status()
-        return response.json().get("status", "Error: No status key")
+        return (await quantum_server().post_json("/run", payload)).get("status", "Error: No status key")
     except Exception as e:
         return f"Error connecting to Quantum Server: {e}"
 
+@async_tool
 @tool("Check Quantum Job Status Tool")
-def check_quantum_job_status(job_id: str) -> str:
+@timed_tool("check_quantum_job_status")
+async def check_quantum_job_status(job_id: str, wait_seconds: int = 30) -> str:
     """
     Checks the status of a previously submitted quantum job by
-    asking the Quantum Server.
+    asking the Quantum Server. Waits up to wait_seconds for the job's
+    status to change (or for it to finish) before answering, so there is
+    no need to call this tool again in a tight loop.
     """
     print(f"Tool: check_quantum_job_status (calling Quantum Server at /status)")
     try:
         payload = {"job_id": job_id}
-        response = requests.post(f"{QUANTUM_SERVER_URL}/status", json=payload)
-        response.raise_for_status()
-        return response.json().get("status", "Error: No status key")
+        result = await quantum_server().post_json("/status", payload, idempotent=True, params={"wait": wait_seconds},
+                                                  timeout=QUANTUM_TIMEOUT_S + wait_seconds)
+        return result.get("status", "Error: No status key")
     except Exception as e:
         return f"Error connecting to Quantum Server: {e}"
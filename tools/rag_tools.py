@@ -1,10 +1,19 @@
 import os
+import json
+import hashlib
+import time
+import threading
+from typing import List
 import chromadb
+from langchain_core.documents import Document
 from langchain_community.vectorstores import Chroma
 # --- THIS IS THE FIX ---
 from langchain_huggingface import HuggingFaceEmbeddings
 # --- (Old line was: from langchain_community.embeddings import SentenceTransformerEmbeddings) ---
-from langchain_community.document_loaders import NotebookLoader
+from utils.cache_utils import LRUCache
+from utils.kb_ingestion import discover_files, iter_parsed_files, batched
+from utils.hybrid_search import BM25Index, NumpyVectorIndex, reciprocal_rank_fusion
+from utils.metrics import timed_tool
 
 # --- v0.4.24 COMPATIBLE VERSION ---
 
@@ -18,73 +27,459 @@ embedding_function = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
 # Define the path to the knowledge base
 knowledge_base_path = "./mcp-research-crew/knowledge_base"
 
-def load_and_embed_notebooks():
+# Default collection name used by langchain's Chroma wrapper
+collection_name = "langchain"
+
+# --- INCREMENTAL INDEXING ---
+# The manifest records a content hash per knowledge base file and the ids of
+# the chunks it produced. Chunk ids are themselves content hashes, so only
+# new, changed or deleted chunks ever touch the Chroma collection.
+manifest_path = os.path.join(persist_directory, "kb_manifest.json")
+MANIFEST_VERSION = 4  # v4: records whether Chroma is in sync with the other indexes
+EMBED_BATCH_SIZE = int(os.environ.get("RAG_EMBED_BATCH_SIZE", 64))
+
+# --- HYBRID RETRIEVAL ---
+# A BM25 index and an exact NumPy vector index are kept next to the Chroma
+# collection. RAG_BACKEND picks the vector leg: "chroma" (default) or
+# "numpy", which serves queries from the memory-mapped matrix and never
+# starts Chroma. Vector and BM25 hits are merged with reciprocal rank fusion.
+# A numpy-backend sync leaves Chroma behind and marks it so in the manifest
+# ("chroma_synced"); the next chroma-backend sync catches it up from the
+# NumPy index, diffing chunk ids and embedding only what Chroma is missing.
+bm25_path = os.path.join(persist_directory, "bm25_index.json")
+RAG_BACKEND = os.environ.get("RAG_BACKEND", "chroma").lower()
+HYBRID_CANDIDATES = int(os.environ.get("RAG_HYBRID_CANDIDATES", 20))
+RRF_K = int(os.environ.get("RAG_RRF_K", 60))
+
+_index_lock = threading.Lock()
+index_ready = threading.Event()
+index_generation = 0  # Bumped every time the collection changes
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _chunk_id(source: str, content: str) -> str:
+    return hashlib.sha256(f"{source}\0{content}".encode("utf-8")).hexdigest()
+
+
+def _load_manifest() -> dict:
+    if not os.path.exists(manifest_path):
+        return None
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"--- Manifest unreadable ({e}). Rebuilding index. ---")
+        return None
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def _save_manifest(manifest: dict):
+    os.makedirs(persist_directory, exist_ok=True)
+    tmp_path = f"{manifest_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, manifest_path)
+
+
+def _embed_and_upsert(batch: list, collection, bm25: BM25Index, numpy_upserts: list):
     """
-    Loads .ipynb notebooks, splits them, and embeds them into a Chroma vector store.
-    This version is compatible with chromadb v0.4.x.
+    Embeds one fixed-size batch of (chunk_id, text, metadata) and writes it
+    to Chroma (when enabled), the BM25 index and the pending NumPy rows.
     """
-    print("--- Starting DLAI Knowledge Base Setup (v0.4.x compatible) ---")
-    
-    if os.path.exists(persist_directory):
-        print(f"--- Found old DB. Exorcising '{persist_directory}'... ---")
-        import shutil
-        shutil.rmtree(persist_directory)
-        print("--- Old DB successfully deleted. ---")
-
-    notebook_files = [f for f in os.listdir(knowledge_base_path) if f.endswith('.ipynb')]
-    
-    if not notebook_files:
-        print("--- No notebooks found to load. Skipping RAG setup. ---")
-        return
-
-    print(f"--- Found {len(notebook_files)} notebooks. Loading... ---")
-    
-    docs = []
-    for notebook_file in notebook_files:
-        loader = NotebookLoader(
-            os.path.join(knowledge_base_path, notebook_file),
-            include_outputs=False,
-            remove_code_prompts=True,
-            remove_hidden_cells=True
+    texts = [text for _, text, _ in batch]
+    embeddings = embedding_function.embed_documents(texts)
+    if collection is not None:
+        collection.upsert(
+            ids=[chunk_id for chunk_id, _, _ in batch],
+            embeddings=embeddings,
+            documents=texts,
+            metadatas=[metadata for _, _, metadata in batch]
         )
-        docs.extend(loader.load())
+    for (chunk_id, text, metadata), embedding in zip(batch, embeddings):
+        bm25.add(chunk_id, text, metadata.get("source", ""))
+        numpy_upserts.append((chunk_id, embedding, text, metadata))
 
-    if not docs:
-        print("--- Notebooks were empty or failed to load. Skipping RAG setup. ---")
-        return
 
-    print(f"--- Notebooks loaded. Embedding {len(docs)} documents... ---")
-
-    vector_store = Chroma.from_documents(
-        documents=docs, 
-        embedding=embedding_function,
+def _open_vector_store() -> Chroma:
+    return Chroma(
+        collection_name=collection_name,
+        embedding_function=embedding_function,
         persist_directory=persist_directory
     )
-    
-    print("--- ✅ DLAI Knowledge Base Embedded Successfully. ---")
-    return vector_store.as_retriever()
 
-def search_dlai_knowledge_base(query: str) -> str:
+
+def _reconcile_chroma(collection, numpy_index: NumpyVectorIndex):
+    """Makes the Chroma collection hold exactly the chunks in the NumPy index."""
+    in_chroma = set(collection.get(include=[])["ids"])
+    rows = {chunk_id: row for row, chunk_id in enumerate(numpy_index.ids)}
+    extra = sorted(in_chroma - set(rows))
+    if extra:
+        collection.delete(ids=extra)
+    missing = [chunk_id for chunk_id in rows if chunk_id not in in_chroma]
+    for batch in batched(missing, EMBED_BATCH_SIZE):
+        texts = [numpy_index.texts[rows[chunk_id]] for chunk_id in batch]
+        collection.upsert(
+            ids=batch,
+            embeddings=embedding_function.embed_documents(texts),
+            documents=texts,
+            metadatas=[numpy_index.metadatas[rows[chunk_id]] for chunk_id in batch]
+        )
+    print(f"--- Caught Chroma up with the knowledge base (+{len(missing)} / -{len(extra)} chunks). ---")
+
+
+def load_and_embed_notebooks():
     """
-    Searches the DeepLearning.AI knowledge base for a given query.
+    Brings the Chroma vector store in line with the knowledge base on disk.
+    Changed files are parsed across a process pool into cell/heading-aware
+    chunks, which stream into the embedder in EMBED_BATCH_SIZE batches.
+    Only new chunks are embedded and only stale ones are removed; an
+    unchanged knowledge base is a hash check per file and nothing else.
+    This version is compatible with chromadb v0.4.x.
     """
-    print(f"--- 🧠 RAG Tool: Searching DLAI KB for: {query} ---")
-    
-    client = chromadb.PersistentClient(path=persist_directory)
-    # --- THIS IS THE FIX ---
-    embedding_func = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-    # --- (Old line was: SentenceTransformerEmbeddings(model_name="all-MiniLM-L6-v2")) ---
-    
-    vector_store = Chroma(
-        client=client,
-        embedding_function=embedding_func,
-        collection_name="langchain" # Default collection name
-    )
-    
-    results = vector_store.similarity_search(query, k=3)
-    
+    global index_generation
+    print("--- Starting DLAI Knowledge Base Sync (v0.4.x compatible) ---")
+
+    with _index_lock:
+        manifest = _load_manifest()
+        vector_store = _open_vector_store() if RAG_BACKEND != "numpy" else None
+
+        if manifest is None:
+            # An old DB without a manifest has chunk ids we can't diff against.
+            if vector_store is not None and vector_store._collection.count():
+                print(f"--- Found DB without a current manifest. Clearing collection in '{persist_directory}'... ---")
+                vector_store.delete_collection()
+                vector_store = _open_vector_store()
+            manifest = {"version": MANIFEST_VERSION, "files": {}, "chroma_synced": True}
+            bm25 = BM25Index()
+            numpy_index = NumpyVectorIndex(persist_directory)
+        else:
+            bm25 = BM25Index.load(bm25_path)
+            numpy_index = NumpyVectorIndex.load(persist_directory, mmap=False)
+
+        known_files = manifest["files"]
+        current_files = discover_files(knowledge_base_path)
+        stale_ids = []
+        changed = False
+
+        for rel_path in sorted(set(known_files) - set(current_files)):
+            removed = known_files.pop(rel_path)["chunks"]
+            stale_ids.extend(removed)
+            print(f"--- Removing '{rel_path}' ({len(removed)} chunks) from the index. ---")
+            changed = True
+
+        file_hashes, changed_files = {}, {}
+        for rel_path, full_path in sorted(current_files.items()):
+            file_hashes[rel_path] = _file_sha256(full_path)
+            entry = known_files.get(rel_path)
+            if not entry or entry["sha256"] != file_hashes[rel_path]:
+                changed_files[rel_path] = full_path
+
+        def new_chunks():
+            """Yields (chunk_id, text, metadata) for chunks not already in the collection."""
+            nonlocal changed
+            for rel_path, chunks, error in iter_parsed_files(changed_files):
+                if error:
+                    print(f"--- Failed to parse '{rel_path}': {error}. Keeping previous version. ---")
+                    continue
+                chunk_ids = {}
+                for chunk in chunks:
+                    chunk_ids.setdefault(_chunk_id(rel_path, chunk["text"]), chunk)
+                entry = known_files.get(rel_path)
+                old_ids = set(entry["chunks"]) if entry else set()
+                added = [chunk_id for chunk_id in chunk_ids if chunk_id not in old_ids]
+                removed = sorted(old_ids - set(chunk_ids))
+                # Stale chunks are deleted after every new batch lands, so a file
+                # never disappears from search mid-update.
+                stale_ids.extend(removed)
+                known_files[rel_path] = {"sha256": file_hashes[rel_path], "chunks": sorted(chunk_ids)}
+                print(f"--- Parsed '{rel_path}': +{len(added)} / -{len(removed)} chunks. ---")
+                changed = True
+                for chunk_id in added:
+                    yield chunk_id, chunk_ids[chunk_id]["text"], chunk_ids[chunk_id]["metadata"]
+
+        embedded, numpy_upserts = 0, []
+        collection = vector_store._collection if vector_store is not None else None
+        for batch in batched(new_chunks(), EMBED_BATCH_SIZE):
+            _embed_and_upsert(batch, collection, bm25, numpy_upserts)
+            embedded += len(batch)
+            print(f"--- Embedded {embedded} chunks so far... ---")
+
+        if stale_ids:
+            if vector_store is not None:
+                vector_store.delete(ids=stale_ids)
+            for chunk_id in stale_ids:
+                bm25.remove(chunk_id)
+
+        if changed:
+            numpy_index.apply(numpy_upserts, stale_ids)
+        if vector_store is None:
+            if changed:
+                manifest["chroma_synced"] = False
+        elif not manifest["chroma_synced"]:
+            _reconcile_chroma(collection, numpy_index)
+            manifest["chroma_synced"] = True
+            changed = True
+
+        if changed:
+            numpy_index.save()
+            bm25.save(bm25_path)
+            _save_manifest(manifest)
+            index_generation += 1
+            print(f"--- ✅ DLAI Knowledge Base Updated Successfully (+{embedded} / -{len(stale_ids)} chunks). ---")
+        else:
+            if not os.path.exists(manifest_path):
+                _save_manifest(manifest)
+            print("--- ✅ DLAI Knowledge Base is up to date. Nothing to embed. ---")
+
+    index_ready.set()
+    return vector_store.as_retriever() if vector_store is not None else None
+
+
+def start_background_indexing() -> threading.Thread:
+    """
+    Runs load_and_embed_notebooks() on a daemon thread so the caller can
+    serve traffic against the last good index while the sync runs.
+    """
+    def _run():
+        try:
+            load_and_embed_notebooks()
+        except Exception as e:
+            print(f"--- CRITICAL: Background DLAI indexing failed: {e} ---")
+
+    thread = threading.Thread(target=_run, name="dlai-indexer", daemon=True)
+    thread.start()
+    return thread
+
+
+class DLAIRetriever:
+    """
+    A long-lived hybrid retriever over the DLAI knowledge base. It holds one
+    vector backend handle, the BM25 index, and bounded LRU caches of query
+    embeddings and results. Result caches are dropped whenever the index
+    generation moves.
+    """
+
+    def __init__(self, embedding_cache_size: int = 1024, result_cache_size: int = 256, backend: str = None):
+        self.backend = (backend or RAG_BACKEND).lower()
+        self._lock = threading.Lock()
+        self._vector_store = None
+        self._numpy_index = None
+        self._numpy_rows = {}
+        self._bm25 = None
+        self._generation = None
+        self.embedding_cache = LRUCache(embedding_cache_size)
+        self.result_cache = LRUCache(result_cache_size)
+
+    def _refresh(self):
+        """Drops every handle and cached result if the index changed under us."""
+        with self._lock:
+            if self._generation != index_generation:
+                self.result_cache.clear()
+                self._vector_store = None
+                self._numpy_index = None
+                self._bm25 = None
+                self._generation = index_generation
+
+    def _chroma(self) -> Chroma:
+        with self._lock:
+            if self._vector_store is None:
+                self._vector_store = Chroma(
+                    client=chromadb.PersistentClient(path=persist_directory),
+                    embedding_function=embedding_function,
+                    collection_name=collection_name
+                )
+            return self._vector_store
+
+    def _numpy(self) -> NumpyVectorIndex:
+        with self._lock:
+            if self._numpy_index is None:
+                self._numpy_index = NumpyVectorIndex.load(persist_directory)
+                self._numpy_rows = {chunk_id: row for row, chunk_id in enumerate(self._numpy_index.ids)}
+            return self._numpy_index
+
+    def _bm25_index(self) -> BM25Index:
+        with self._lock:
+            if self._bm25 is None:
+                self._bm25 = BM25Index.load(bm25_path)
+            return self._bm25
+
+    def invalidate(self):
+        """Forgets cached results and backend handles. Query embeddings stay valid."""
+        with self._lock:
+            self.result_cache.clear()
+            self._vector_store = None
+            self._numpy_index = None
+            self._bm25 = None
+
+    def embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """Embeds queries, running every cache miss through the model in one batch."""
+        vectors = {q: self.embedding_cache.get(q) for q in dict.fromkeys(queries)}
+        missing = [q for q, vector in vectors.items() if vector is None]
+        if missing:
+            for query, vector in zip(missing, embedding_function.embed_documents(missing)):
+                self.embedding_cache.put(query, vector)
+                vectors[query] = vector
+        return [vectors[q] for q in queries]
+
+    def vector_search(self, vector, n: int, sources: List[str] = None, backend: str = None) -> list:
+        """Returns [(chunk_id, Document)] from the chosen vector backend, best first."""
+        if (backend or self.backend) == "numpy":
+            index = self._numpy()
+            return [
+                (index.ids[row], Document(page_content=index.texts[row], metadata=index.metadatas[row]))
+                for row, _ in index.search(vector, k=n, sources=sources)
+            ]
+        where = None
+        if sources:
+            where = {"source": sources[0]} if len(sources) == 1 else {"source": {"$in": list(sources)}}
+        collection = self._chroma()._collection
+        n = min(n, collection.count())
+        if n <= 0:
+            return []
+        found = collection.query(query_embeddings=[vector], n_results=n, where=where, include=["documents", "metadatas"])
+        return [
+            (chunk_id, Document(page_content=text, metadata=metadata or {}))
+            for chunk_id, text, metadata in zip(found["ids"][0], found["documents"][0], found["metadatas"][0])
+        ]
+
+    def _fetch_documents(self, chunk_ids: List[str]) -> dict:
+        if not chunk_ids:
+            return {}
+        if self.backend == "numpy":
+            index = self._numpy()
+            rows = [(chunk_id, self._numpy_rows.get(chunk_id)) for chunk_id in chunk_ids]
+            return {
+                chunk_id: Document(page_content=index.texts[row], metadata=index.metadatas[row])
+                for chunk_id, row in rows if row is not None
+            }
+        found = self._chroma()._collection.get(ids=list(chunk_ids), include=["documents", "metadatas"])
+        return {
+            chunk_id: Document(page_content=text, metadata=metadata or {})
+            for chunk_id, text, metadata in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+
+    def search(self, query: str, k: int = 3, sources: List[str] = None, mode: str = "hybrid") -> List[Document]:
+        return self.search_many([query], k=k, sources=sources, mode=mode)[0]
+
+    def search_many(self, queries: List[str], k: int = 3, sources: List[str] = None,
+                    mode: str = "hybrid") -> List[List[Document]]:
+        """
+        Runs several searches, embedding all uncached queries in a single
+        forward pass. mode is "hybrid" (vector + BM25 fused with RRF),
+        "vector" or "bm25"; sources restricts hits to those knowledge base files.
+        """
+        self._refresh()
+        source_key = tuple(sorted(sources)) if sources else None
+        results = {q: self.result_cache.get((q, k, source_key, mode)) for q in dict.fromkeys(queries)}
+        missing = [q for q, hits in results.items() if hits is None]
+        if not missing:
+            return [results[q] for q in queries]
+
+        depth = max(k, HYBRID_CANDIDATES)
+        vectors = self.embed_queries(missing) if mode != "bm25" else [None] * len(missing)
+        for query, vector in zip(missing, vectors):
+            documents, rankings = {}, []
+            if mode != "bm25":
+                vector_hits = self.vector_search(vector, n=depth, sources=sources)
+                documents.update(vector_hits)
+                rankings.append([chunk_id for chunk_id, _ in vector_hits])
+            if mode != "vector":
+                rankings.append([chunk_id for chunk_id, _ in self._bm25_index().search(query, k=depth, sources=sources)])
+            top_ids = [chunk_id for chunk_id, _ in reciprocal_rank_fusion(rankings, k=RRF_K)[:k]]
+            documents.update(self._fetch_documents([i for i in top_ids if i not in documents]))
+            hits = [documents[chunk_id] for chunk_id in top_ids if chunk_id in documents]
+            self.result_cache.put((query, k, source_key, mode), hits)
+            results[query] = hits
+        return [results[q] for q in queries]
+
+    def stats(self) -> dict:
+        return {
+            "index_generation": index_generation,
+            "backend": self.backend,
+            "embedding_cache": self.embedding_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+        }
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> DLAIRetriever:
+    """Returns the process-wide DLAIRetriever, creating it on first use."""
+    global _retriever
+    if _retriever is None:
+        with _retriever_lock:
+            if _retriever is None:
+                _retriever = DLAIRetriever(
+                    embedding_cache_size=int(os.environ.get("RAG_EMBEDDING_CACHE_SIZE", 1024)),
+                    result_cache_size=int(os.environ.get("RAG_RESULT_CACHE_SIZE", 256))
+                )
+    return _retriever
+
+
+def _format_results(results: List[Document]) -> str:
     if not results:
         return "No relevant information found in the DLAI knowledge base."
-    
     context = "\n\n---\n\n".join([doc.page_content for doc in results])
     return f"Found relevant context in DLAI knowledge base:\n\n{context}"
+
+
+@timed_tool("search_dlai_knowledge_base")
+def search_dlai_knowledge_base(query: str, k: int = 3, sources: List[str] = None) -> str:
+    """
+    Searches the DeepLearning.AI knowledge base for a given query.
+    Combines semantic and keyword (BM25) matching, so exact identifiers
+    like function names or 'C1M2' are found too.
+    """
+    print(f"--- 🧠 RAG Tool: Searching DLAI KB for: {query} ---")
+    return _format_results(get_retriever().search(query, k=k, sources=sources))
+
+
+@timed_tool("search_dlai_knowledge_base_batch")
+def search_dlai_knowledge_base_batch(queries: List[str], k: int = 3, sources: List[str] = None) -> List[str]:
+    """
+    Searches the DeepLearning.AI knowledge base for several queries at once.
+    Returns one formatted result per query, in input order.
+    """
+    print(f"--- 🧠 RAG Tool: Batch searching DLAI KB for {len(queries)} queries ---")
+    return [_format_results(hits) for hits in get_retriever().search_many(queries, k=k, sources=sources)]
+
+
+def benchmark_vector_backends(queries: List[str], k: int = 3, repeats: int = 5) -> dict:
+    """
+    Times the Chroma and NumPy vector legs on the same (pre-embedded)
+    queries and reports how often they agree on the top k.
+    """
+    retriever = get_retriever()
+    retriever._refresh()
+    vectors = retriever.embed_queries(queries)
+    report, top_ids = {}, {}
+    for backend in ("chroma", "numpy"):
+        timings = []
+        for _ in range(repeats):
+            for vector in vectors:
+                start = time.perf_counter()
+                retriever.vector_search(vector, n=k, backend=backend)
+                timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        top_ids[backend] = [[i for i, _ in retriever.vector_search(v, n=k, backend=backend)] for v in vectors]
+        report[backend] = {
+            "mean_ms": round(sum(timings) / len(timings), 3),
+            "p95_ms": round(timings[int(0.95 * (len(timings) - 1))], 3),
+        }
+    overlaps = [
+        len(set(a) & set(b)) / max(len(set(a) | set(b)), 1)
+        for a, b in zip(top_ids["chroma"], top_ids["numpy"])
+    ]
+    report["overlap_at_k"] = round(sum(overlaps) / len(overlaps), 4) if overlaps else None
+    return report
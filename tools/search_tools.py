@@ -0,0 +1,161 @@
+import os
+import re
+import time
+import asyncio
+import importlib
+from urllib.parse import urlsplit
+from langchain_core.tools import tool
+from utils.metrics import timed_tool
+from utils.hybrid_search import reciprocal_rank_fusion
+from utils.service_client import async_tool
+
+# --- FEDERATED SEARCH ---
+# One tool call that queries several research sources at once under a
+# single deadline, instead of one LLM round-trip per source. Results are
+# merged, deduplicated by URL and by title, ranked with reciprocal rank
+# fusion (an item several sources agree on rises) and cut to a size bound.
+# Each source's module is imported on first use, so a missing SDK only
+# turns that source into an error line.
+
+FEDERATED_SEARCH_DEADLINE_S = float(os.environ.get("FEDERATED_SEARCH_DEADLINE_S", 20.0))
+FEDERATED_SEARCH_MAX_CHARS = int(os.environ.get("FEDERATED_SEARCH_MAX_CHARS", 6000))
+SNIPPET_CHARS = 300
+
+# name -> (module:function, async?). Every function takes (query, top_k)
+# and returns [{"title", "url", "snippet"}].
+SOURCES = {
+    "arxiv": ("tools.web_tools:arxiv_results", False),
+    "hf_papers": ("tools.web_tools:hf_paper_results", False),
+    "hf_models": ("tools.web_tools:hf_model_results", False),
+    "github": ("tools.github_tools:agithub_repo_results", True),
+    "oreilly": ("tools.librarian_tools:oreilly_results", True),
+    "coursera": ("tools.librarian_tools:coursera_results", True),
+    "deeplearning_ai": ("tools.librarian_tools:deeplearning_ai_results", True),
+}
+DEFAULT_SOURCES = "arxiv,hf_papers,github,oreilly,coursera,deeplearning_ai"
+
+
+def _url_key(url: str) -> str:
+    parts = urlsplit((url or "").strip().lower())
+    host = parts.netloc[4:] if parts.netloc.startswith("www.") else parts.netloc
+    return f"{host}{parts.path.rstrip('/')}" + (f"?{parts.query}" if parts.query else "")
+
+
+def _title_key(title: str) -> str:
+    return re.sub(r"[^a-z0-9]+", " ", (title or "").lower()).strip()
+
+
+async def _query_source(name: str, query: str, top_k: int) -> list:
+    target, is_async = SOURCES[name]
+    module_name, attribute = target.split(":")
+    fetch = getattr(await asyncio.to_thread(importlib.import_module, module_name), attribute)
+    if is_async:
+        return await fetch(query, top_k)
+    # Sync SDK calls run in threads; one still running at the deadline
+    # finishes in the background and fills the response cache.
+    return await asyncio.to_thread(fetch, query, top_k)
+
+
+async def afederated_search(query: str, sources: list, top_k: int = 5,
+                            deadline_s: float = FEDERATED_SEARCH_DEADLINE_S) -> tuple:
+    """
+    Queries sources concurrently and returns (merged, report). merged is a
+    list of {"title", "url", "snippet", "sources", "score"}, best first;
+    report maps each source to {"status", "seconds", "results"/"error"}.
+    """
+    started = time.perf_counter()
+    report, finished_at = {}, {}
+
+    async def run(name):
+        try:
+            return await _query_source(name, query, top_k)
+        finally:
+            finished_at[name] = time.perf_counter() - started
+
+    tasks = {asyncio.create_task(run(name)): name for name in sources}
+    done, pending = await asyncio.wait(tasks, timeout=deadline_s)
+    for task in pending:
+        task.cancel()
+
+    rankings, items, alias = [], {}, {}
+    for task, name in tasks.items():
+        if task in pending:
+            report[name] = {"status": "timeout", "seconds": round(deadline_s, 3)}
+            continue
+        seconds = round(finished_at.get(name, deadline_s), 3)
+        if task.exception() is not None:
+            report[name] = {"status": "error", "seconds": seconds, "error": str(task.exception()) or type(task.exception()).__name__}
+            continue
+        results = task.result() or []
+        report[name] = {"status": "ok", "seconds": seconds, "results": len(results)}
+        ranking = []
+        for result in results:
+            keys = [k for k in (_url_key(result.get("url")), _title_key(result.get("title"))) if k]
+            item_id = next((alias[k] for k in keys if k in alias), None)
+            if item_id is None:
+                item_id = len(items)
+                items[item_id] = {"title": result.get("title"), "url": result.get("url"),
+                                  "snippet": result.get("snippet") or "", "sources": []}
+            item = items[item_id]
+            for k in keys:
+                alias.setdefault(k, item_id)
+            if name not in item["sources"]:
+                item["sources"].append(name)
+            if len(result.get("snippet") or "") > len(item["snippet"]):
+                item["snippet"] = result["snippet"]
+            if item_id not in ranking:
+                ranking.append(item_id)
+        rankings.append(ranking)
+
+    merged = [{**items[item_id], "score": round(score, 5)} for item_id, score in reciprocal_rank_fusion(rankings)]
+    return merged, report
+
+
+def format_results(query: str, merged: list, report: dict, max_results: int, max_chars: int) -> str:
+    lines = [f"Federated search for: {query}"]
+    used = len(lines[0])
+    shown = 0
+    for item in merged[:max_results]:
+        snippet = " ".join(item["snippet"].split())
+        if len(snippet) > SNIPPET_CHARS:
+            snippet = snippet[:SNIPPET_CHARS].rsplit(" ", 1)[0] + " ..."
+        entry = (f"{shown + 1}. {item['title']}\n   URL: {item['url']}\n   Sources: {', '.join(item['sources'])}"
+                 + (f"\n   {snippet}" if snippet else ""))
+        if shown and used + len(entry) > max_chars:
+            break
+        lines.append(entry)
+        used += len(entry)
+        shown += 1
+    if not shown:
+        lines.append("No results found.")
+    lines.append(f"Showing {shown} of {len(merged)} merged results. Sources:")
+    for name, status in report.items():
+        if status["status"] == "ok":
+            lines.append(f"- {name}: {status['results']} results in {status['seconds']}s")
+        elif status["status"] == "timeout":
+            lines.append(f"- {name}: timed out after {status['seconds']}s")
+        else:
+            lines.append(f"- {name}: error after {status['seconds']}s: {status['error']}")
+    return "\n".join(lines)
+
+
+@async_tool
+@tool("Federated Search Tool")
+@timed_tool("federated_search")
+async def federated_search(query: str, sources: str = DEFAULT_SOURCES, max_results: int = 15) -> str:
+    """
+    Searches several sources at once and returns one merged, deduplicated,
+    ranked list. sources is a comma-separated subset of: arxiv, hf_papers,
+    hf_models, github, oreilly, coursera, deeplearning_ai. Use this instead
+    of calling the individual search tools one by one.
+    """
+    print(f"Tool: federated_search (Query: {query}, Sources: {sources})")
+    names = [s.strip() for s in (sources or DEFAULT_SOURCES).split(",") if s.strip()]
+    unknown = [name for name in names if name not in SOURCES]
+    if unknown:
+        return f"Error: unknown sources {', '.join(unknown)}. Choose from: {', '.join(SOURCES)}"
+    try:
+        merged, report = await afederated_search(query, list(dict.fromkeys(names)))
+        return format_results(query, merged, report, max_results, FEDERATED_SEARCH_MAX_CHARS)
+    except Exception as e:
+        return f"Error running federated search: {e}"
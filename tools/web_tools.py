@@ -1,31 +1,163 @@
 import os
+import re
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from firecrawl import FirecrawlApp
 from langchain_core.tools import tool
+from utils.metrics import timed_tool
+from utils.http_cache import cached_call
 from huggingface_hub import HfApi
 from arxiv import Search, SortCriterion
 
+# Every remote call below goes through the shared response cache
+# (utils/http_cache.py), one source per API, so repeat queries from other
+# crews don't count against the Firecrawl / HF rate limits.
+
+# --- FIRECRAWL ---
+# The top FIRECRAWL_TOP_N search results are scraped concurrently with one
+# shared client. The tool returns once FIRECRAWL_TARGET_CHARS of content
+# have arrived or FIRECRAWL_DEADLINE_S has passed, whichever comes first.
+# Pages still in flight finish in the background and land in the cache.
+# Each page is trimmed (image/link-only lines and paragraphs already seen
+# on an earlier page dropped) to FIRECRAWL_PAGE_CHARS, and the whole
+# output to FIRECRAWL_MAX_CHARS.
+FIRECRAWL_TOP_N = int(os.environ.get("FIRECRAWL_TOP_N", 3))
+FIRECRAWL_DEADLINE_S = float(os.environ.get("FIRECRAWL_DEADLINE_S", 25.0))
+FIRECRAWL_TARGET_CHARS = int(os.environ.get("FIRECRAWL_TARGET_CHARS", 6000))
+FIRECRAWL_PAGE_CHARS = int(os.environ.get("FIRECRAWL_PAGE_CHARS", 4000))
+FIRECRAWL_MAX_CHARS = int(os.environ.get("FIRECRAWL_MAX_CHARS", 10000))
+
+_firecrawl_app = None
+_firecrawl_lock = threading.Lock()
+_firecrawl_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="firecrawl")
+
+def get_firecrawl_app() -> FirecrawlApp:
+    global _firecrawl_app
+    with _firecrawl_lock:
+        if _firecrawl_app is None:
+            _firecrawl_app = FirecrawlApp(api_key=os.environ["FIRE_API_KEY"])
+        return _firecrawl_app
+
+def _firecrawl_search(query: str, top_n: int) -> list:
+    return cached_call("firecrawl", ("search", query, top_n), lambda: [
+        {"url": r["url"], "title": r.get("title") or (r.get("metadata") or {}).get("title") or r["url"]}
+        for r in (get_firecrawl_app().search(query, page_options={'page': 1, 'per_page': top_n}) or [])[:top_n]
+    ], should_cache=bool)
+
+def _firecrawl_scrape(url: str) -> str:
+    # An empty page is usually a failed scrape; don't keep it for a day
+    return cached_call("firecrawl", ("scrape", url), lambda: get_firecrawl_app().scrape_url(
+        url, {'pageOptions': {'format': 'markdown'}}).get('markdown') or "", should_cache=bool)
+
+_NOISE_LINE = re.compile(r"^\s*(!\[[^\]]*\]\([^)]*\)|\[[^\]]*\]\([^)]*\)|[-*|#>\s]*)\s*$")
+
+def trim_markdown(markdown: str, max_chars: int, seen: set) -> str:
+    """
+    Drops image/link-only lines and paragraphs whose hash is in seen (and
+    adds the kept ones), then cuts to max_chars at a paragraph boundary.
+    """
+    kept, used = [], 0
+    for paragraph in re.split(r"\n\s*\n", markdown or ""):
+        lines = [line.rstrip() for line in paragraph.splitlines() if not _NOISE_LINE.match(line)]
+        paragraph = "\n".join(lines).strip()
+        if not paragraph:
+            continue
+        digest = hashlib.sha1(" ".join(paragraph.lower().split()).encode("utf-8")).hexdigest()
+        if digest in seen:
+            continue
+        if used + len(paragraph) > max_chars:
+            if not kept:
+                kept.append(paragraph[:max_chars].rsplit(" ", 1)[0] + " ...")
+            break
+        seen.add(digest)
+        kept.append(paragraph)
+        used += len(paragraph) + 2
+    return "\n\n".join(kept)
+
+def firecrawl_pages(query: str, top_n: int = FIRECRAWL_TOP_N, deadline_s: float = FIRECRAWL_DEADLINE_S,
+                    target_chars: int = FIRECRAWL_TARGET_CHARS, results: list = None) -> list:
+    """
+    [{"title", "url", "markdown"}] for the search results scraped by the
+    deadline, in search-rank order; stops early once target_chars arrive.
+    Pass results when the caller already ran the search, so it isn't paid
+    for twice.
+    """
+    started = time.monotonic()
+    if results is None:
+        results = _firecrawl_search(query, top_n)
+    futures = {_firecrawl_pool.submit(_firecrawl_scrape, r["url"]): i for i, r in enumerate(results)}
+    pages, collected, pending = {}, 0, set(futures)
+    while pending and collected < target_chars:
+        remaining = deadline_s - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None and future.result():
+                pages[futures[future]] = future.result()
+                collected += len(future.result())
+            elif future.exception() is not None:
+                print(f"--- ⚠️ Firecrawl: scraping {results[futures[future]]['url']} failed: {future.exception()} ---")
+    for future in pending:
+        future.cancel()  # Only stops pages that haven't started
+    return [{**results[i], "markdown": pages[i]} for i in sorted(pages)]
+
+# --- STRUCTURED RESULTS ---
+# [{"title", "url", "snippet"}] per source, shared by the tools below and
+# the federated search tool (tools/search_tools.py).
+
+def hf_model_results(task: str, top_k: int = 3) -> list:
+    api = HfApi(token=os.environ.get("HUGGINGFACE_TOKEN"))
+    return cached_call("huggingface", ("models", task, top_k), lambda: [
+        {"title": m.modelId, "url": f"https://huggingface.co/{m.modelId}", "snippet": f"Downloads: {m.downloads}"}
+        for m in api.list_models(filter=task, sort="downloads", direction=-1, limit=top_k)
+    ])
+
+def hf_paper_results(query: str = None, top_k: int = 5) -> list:
+    api = HfApi(token=os.environ.get("HUGGINGFACE_TOKEN"))
+    return cached_call("huggingface", ("papers", query, top_k), lambda: [
+        {"title": p.modelId, "url": f"https://huggingface.co/datasets/{p.modelId}", "snippet": ""}
+        for p in api.list_models(model_type="dataset", search=query, tags="arxiv", sort="lastModified", direction=-1, limit=top_k)
+    ])
+
+def arxiv_results(query: str, max_results: int = 5) -> list:
+    search = Search(query=query, max_results=max_results, sort_by=SortCriterion.Relevance)
+    return cached_call("arxiv", ("papers", query, max_results), lambda: [
+        {"title": r.title, "url": r.entry_id, "snippet": r.summary.strip()} for r in search.results()
+    ])
+
 @tool("Firecrawl Web Search & Scrape Tool")
+@timed_tool("firecrawl_search_and_scrape")
 def firecrawl_search_and_scrape(query: str) -> str:
     """
     Performs a web search for a given query using Firecrawl and
-    then scrapes the content of the top result, returning it as
+    then scrapes the content of the top results, returning it as
     clean, readable markdown. This is your primary tool for
     general web research.
     """
     print(f"Tool: firecrawl_search_and_scrape (Query: {query})")
     try:
-        api_key = os.environ["FIRE_API_KEY"]
-        app = FirecrawlApp(api_key=api_key)
-        search_results = app.search(query, page_options={'page': 1, 'per_page': 3})
-        if not search_results:
+        results = _firecrawl_search(query, FIRECRAWL_TOP_N)
+        if not results:
             return f"No search results found for query: {query}"
-        top_url = search_results[0]['url']
-        scraped_data = app.scrape_url(top_url, {'pageOptions': {'format': 'markdown'}})
-        return scraped_data['markdown']
+        pages = firecrawl_pages(query, results=results)
+        seen, sections, used = set(), [], 0
+        for page in pages:
+            budget = min(FIRECRAWL_PAGE_CHARS, FIRECRAWL_MAX_CHARS - used)
+            if budget <= 0:
+                break
+            markdown = trim_markdown(page["markdown"], budget, seen)
+            if markdown:
+                sections.append(f"## {page['title']}\nSource: {page['url']}\n\n{markdown}")
+                used += len(markdown)
+        return "\n\n---\n\n".join(sections) or f"No result for '{query}' could be scraped in {FIRECRAWL_DEADLINE_S}s"
     except Exception as e:
         return f"Error running Firecrawl tool: {e}"
 
 @tool("Hugging Face Model Search Tool")
+@timed_tool("search_hf_models")
 def search_hf_models(task: str, top_k: int = 3) -> str:
     """
     Searches the Hugging Face Hub for models related to a specific
@@ -33,15 +165,15 @@ def search_hf_models(task: str, top_k: int = 3) -> str:
     """
     print(f"Tool: search_hf_models (Task: {task})")
     try:
-        api = HfApi(token=os.environ.get("HUGGINGFACE_TOKEN"))
-        models = api.list_models(filter=task, sort="downloads", direction=-1, limit=top_k)
+        models = hf_model_results(task, top_k)
         if not models: return f"No models found for task: {task}"
-        results = [f"- Model ID: {m.modelId}, Downloads: {m.downloads}" for m in models]
+        results = [f"- Model ID: {m['title']}, {m['snippet']}" for m in models]
         return "\n".join(results)
     except Exception as e:
         return f"Error searching Hugging Face models: {e}"
 
 @tool("Hugging Face Daily Papers Tool")
+@timed_tool("get_hf_daily_papers")
 def get_hf_daily_papers(query: str = None, top_k: int = 5) -> str:
     """
     Fetches the top_k most recent papers from the Hugging Face
@@ -49,23 +181,22 @@ def get_hf_daily_papers(query: str = None, top_k: int = 5) -> str:
     """
     print(f"Tool: get_hf_daily_papers (Query: {query})")
     try:
-        api = HfApi(token=os.environ.get("HUGGINGFACE_TOKEN")) 
-        papers = api.list_models(model_type="dataset", search=query, tags="arxiv", sort="lastModified", direction=-1, limit=top_k)
+        papers = hf_paper_results(query, top_k)
         if not papers: return "No recent papers found on Hugging Face."
-        results = [f"- Paper: {p.modelId}, URL: https://huggingface.co/datasets/{p.modelId}" for p in papers]
+        results = [f"- Paper: {p['title']}, URL: {p['url']}" for p in papers]
         return "\n".join(results)
     except Exception as e:
         return f"Error fetching Hugging Face papers: {e}"
 
 @tool("ArXiv Academic Paper Search Tool")
+@timed_tool("search_arxiv")
 def search_arxiv(query: str, max_results: int = 5) -> str:
     """
     Searches ArXiv for academic papers related to a query.
     """
     print(f"Tool: search_arxiv (Query: {query})")
     try:
-        search = Search(query=query, max_results=max_results, sort_by=SortCriterion.Relevance)
-        results = [f"- Title: {r.title}\n  URL: {r.entry_id}\n  Summary: {r.summary.strip()}" for r in search.results()]
+        results = [f"- Title: {r['title']}\n  URL: {r['url']}\n  Summary: {r['snippet']}" for r in arxiv_results(query, max_results)]
         return "\n---\n".join(results) if results else f"No ArXiv papers found for query: {query}"
     except Exception as e:
         return f"Error searching ArXiv: {e}"
@@ -0,0 +1,168 @@
+import re
+import json
+import hashlib
+import numpy as np
+from utils.hybrid_search import tokenize
+
+# --- RESEARCH CONTEXT COMPACTION ---
+# Shrinks the 5W1H crews' results before they reach the Writer's prompt:
+# splits them into passages, drops exact and near-duplicate passages across
+# crews, ranks the rest by relevance to the topic and plan, and packs them
+# into a token budget. Each crew is guaranteed a minimum share of the
+# budget, so one verbose crew can't crowd out the others.
+# Relevance and near-duplicates use an embedding function when given (the
+# RAG tool's MiniLM), and fall back to word overlap otherwise.
+# This is not an agent tool.
+
+PASSAGE_MAX_CHARS = 800
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token, the same estimate the LLM scheduler uses."""
+    return (len(text) + 3) // 4
+
+
+def crew_text(result) -> str:
+    """The text of one crew's result (its 'result' field, its error, or the JSON)."""
+    if isinstance(result, str):
+        return result
+    if isinstance(result, dict):
+        if isinstance(result.get("result"), str):
+            return result["result"]
+        if result.get("error"):
+            return f"Error: {result['error']}"
+    return json.dumps(result, default=str)
+
+
+def split_passages(text: str, max_chars: int = PASSAGE_MAX_CHARS) -> list:
+    """Paragraphs, with long ones split on sentence boundaries."""
+    passages = []
+    for paragraph in re.split(r"\n\s*\n", text or ""):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            passages.append(paragraph)
+            continue
+        current = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            if current and len(current) + len(sentence) + 1 > max_chars:
+                passages.append(current)
+                current = ""
+            current = f"{current} {sentence}".strip()
+            while len(current) > max_chars:
+                passages.append(current[:max_chars])
+                current = current[max_chars:]
+        if current:
+            passages.append(current)
+    return passages
+
+
+def _normalise(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _lexical_scores(query: str, passages: list) -> np.ndarray:
+    query_terms = set(tokenize(query))
+    if not query_terms:
+        return np.zeros(len(passages), dtype=np.float32)
+    return np.array([len(query_terms & set(tokenize(p))) / len(query_terms) for p in passages], dtype=np.float32)
+
+
+def _jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def compact_research_context(context: dict, query: str, budget_tokens: int = 3000, min_crew_share: float = 0.5,
+                             dedupe_threshold: float = 0.92, embed_fn=None) -> tuple:
+    """
+    Returns (compacted, report). compacted maps each crew to its kept
+    passages (in original order) joined by blank lines; keys starting with
+    '_' (e.g. _meta) are passed through untouched. min_crew_share is the
+    fraction of an equal split of the budget each crew is guaranteed
+    (0 = pure relevance ranking, 1 = equal split). embed_fn maps a list of
+    strings to vectors (e.g. embed_documents).
+    """
+    crews = [name for name in context if not name.startswith("_")]
+    passages = []  # (crew, position, text)
+    tokens_before = 0
+    for crew in crews:
+        text = crew_text(context[crew])
+        tokens_before += estimate_tokens(text)
+        for position, passage in enumerate(split_passages(text)):
+            passages.append((crew, position, passage))
+
+    # 1. Exact duplicates (after normalising case and whitespace)
+    seen, unique = set(), []
+    for item in passages:
+        digest = hashlib.sha1(item[2].lower().encode("utf-8")).hexdigest()
+        if digest not in seen:
+            seen.add(digest)
+            unique.append(item)
+    exact_dropped = len(passages) - len(unique)
+
+    # 2. Relevance, and near-duplicates (the lower-ranked copy is dropped)
+    texts = [item[2] for item in unique]
+    vectors = None
+    if embed_fn is not None and texts:
+        matrix = _normalise(embed_fn([query] + texts))
+        query_vector, vectors = matrix[0], matrix[1:]
+        scores = vectors @ query_vector
+    else:
+        scores = _lexical_scores(query, texts)
+
+    order = sorted(range(len(unique)), key=lambda i: float(scores[i]), reverse=True)
+    kept, kept_terms, near_dropped = [], [], 0
+    for i in order:
+        if vectors is not None:
+            duplicate = bool(kept) and float(np.max(vectors[kept] @ vectors[i])) >= dedupe_threshold
+        else:
+            terms = set(tokenize(texts[i]))
+            duplicate = any(_jaccard(terms, other) >= dedupe_threshold for other in kept_terms)
+            if not duplicate:
+                kept_terms.append(terms)
+        if duplicate:
+            near_dropped += 1
+            continue
+        kept.append(i)
+
+    # 3. Pack: each crew's best passages up to its guaranteed share, then the
+    #    best remaining passages overall until the budget is spent.
+    guaranteed = int(budget_tokens * min_crew_share / len(crews)) if crews else 0
+    used_by_crew = {crew: 0 for crew in crews}
+    selected, total = set(), 0
+    for i in kept:
+        crew = unique[i][0]
+        cost = estimate_tokens(texts[i])
+        if used_by_crew[crew] + cost <= guaranteed and total + cost <= budget_tokens:
+            selected.add(i)
+            used_by_crew[crew] += cost
+            total += cost
+    for i in kept:
+        cost = estimate_tokens(texts[i])
+        if i not in selected and total + cost <= budget_tokens:
+            selected.add(i)
+            used_by_crew[unique[i][0]] += cost
+            total += cost
+
+    compacted = {name: value for name, value in context.items() if name.startswith("_")}
+    for crew in crews:
+        chosen = sorted((unique[i][1], texts[i]) for i in selected if unique[i][0] == crew)
+        compacted[crew] = "\n\n".join(text for _, text in chosen)
+
+    tokens_after = sum(estimate_tokens(compacted[crew]) for crew in crews)
+    report = {
+        "budget_tokens": budget_tokens,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": max(0, tokens_before - tokens_after),
+        "passages_in": len(passages),
+        "passages_kept": len(selected),
+        "duplicates_dropped": exact_dropped + near_dropped,
+        "tokens_by_crew": used_by_crew,
+        "ranking": "embeddings" if vectors is not None else "lexical",
+    }
+    return compacted, report
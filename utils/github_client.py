@@ -0,0 +1,209 @@
+import os
+import re
+import time
+import asyncio
+import threading
+import httpx
+from utils.http_cache import aconditional
+from utils.scraping_utils import loop_local
+
+# --- GITHUB CLIENT ---
+# Repository search in as few API calls as possible. With a token, one
+# GraphQL query returns the top repositories with their metadata and,
+# optionally, their READMEs. Without one (GraphQL needs auth), a single
+# REST search call is made, plus one README call per repository, sent
+# concurrently.
+# REST calls are conditional (If-None-Match), so a cache refresh that comes
+# back 304 doesn't count against the rate limit. Every call tracks the
+# X-RateLimit-* headers per resource (core / search / graphql). When a
+# resource is nearly spent, requests wait for its reset instead of
+# failing, up to GITHUB_MAX_RATE_WAIT_S.
+# This is not an agent tool.
+
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip("/")
+GITHUB_RATE_RESERVE = int(os.environ.get("GITHUB_RATE_RESERVE", 1))
+GITHUB_MAX_RATE_WAIT_S = float(os.environ.get("GITHUB_MAX_RATE_WAIT_S", 60.0))
+GITHUB_TIMEOUT_S = float(os.environ.get("GITHUB_TIMEOUT_S", 20.0))
+
+REPO_FIELDS = """
+        nameWithOwner url description stargazerCount updatedAt
+        primaryLanguage { name }
+        repositoryTopics(first: 5) { nodes { topic { name } } }"""
+README_FIELDS = """
+        readmeMd: object(expression: "HEAD:README.md") { ... on Blob { text } }
+        readmeRst: object(expression: "HEAD:README.rst") { ... on Blob { text } }
+        readme: object(expression: "HEAD:README") { ... on Blob { text } }"""
+SEARCH_QUERY = """
+query($q: String!, $n: Int!) {
+  search(query: $q, type: REPOSITORY, first: $n) {
+    nodes { ... on Repository {%s
+    } }
+  }
+}"""
+
+
+class RateLimitExceeded(Exception):
+    """The rate limit resets further away than GITHUB_MAX_RATE_WAIT_S."""
+
+
+class RateLimits:
+    """Last seen X-RateLimit-Remaining / -Reset per resource."""
+
+    def __init__(self, reserve: int = GITHUB_RATE_RESERVE, max_wait_s: float = GITHUB_MAX_RATE_WAIT_S):
+        self.reserve = reserve
+        self.max_wait_s = max_wait_s
+        self.state = {}  # resource -> {"remaining", "limit", "reset"}
+
+    def update(self, resource: str, headers):
+        if "x-ratelimit-remaining" not in headers:
+            return
+        resource = headers.get("x-ratelimit-resource", resource)
+        self.state[resource] = {
+            "remaining": int(headers["x-ratelimit-remaining"]),
+            "limit": int(headers.get("x-ratelimit-limit", 0)),
+            "reset": float(headers.get("x-ratelimit-reset", 0)),
+        }
+
+    def delay(self, resource: str) -> float:
+        """Seconds to wait before the next call on resource (0 if it has budget left)."""
+        state = self.state.get(resource)
+        if state is None or state["remaining"] > self.reserve:
+            return 0.0
+        wait = state["reset"] - time.time()
+        if wait <= 0:
+            del self.state[resource]
+            return 0.0
+        return wait + 1.0
+
+    async def wait_turn(self, resource: str):
+        wait = self.delay(resource)
+        if wait > self.max_wait_s:
+            raise RateLimitExceeded(f"GitHub {resource} rate limit spent; resets in {wait:.0f}s")
+        if wait:
+            print(f"--- ⏳ [GitHub] {resource} rate limit nearly spent; waiting {wait:.0f}s for the reset ---")
+            await asyncio.sleep(wait)
+
+
+def readme_excerpt(text: str, max_chars: int) -> str:
+    """The README's prose: badge/image/HTML lines dropped, whitespace collapsed, cut to max_chars."""
+    lines = [line for line in (text or "").splitlines()
+             if not re.match(r"^\s*(\[?!\[|<)", line)]
+    prose = " ".join(" ".join(lines).split())
+    return prose if len(prose) <= max_chars else prose[:max_chars].rsplit(" ", 1)[0] + " ..."
+
+
+class GitHubClient:
+
+    def __init__(self, token: str = None, base_url: str = GITHUB_API_URL):
+        self.token = token
+        self.base_url = base_url
+        self.limits = RateLimits()
+        headers = {"Accept": "application/vnd.github+json", "X-GitHub-Api-Version": "2022-11-28"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        self.client = httpx.AsyncClient(
+            base_url=base_url, headers=headers, timeout=httpx.Timeout(GITHUB_TIMEOUT_S, connect=5.0),
+            limits=httpx.Limits(max_connections=16, max_keepalive_connections=8, keepalive_expiry=30.0),
+        )
+
+    async def _request(self, method: str, path: str, resource: str, **kwargs) -> httpx.Response:
+        """Sends under the resource's rate limit; a rate-limited answer is retried once after its reset."""
+        for attempt in range(2):
+            await self.limits.wait_turn(resource)
+            response = await self.client.request(method, path, **kwargs)
+            self.limits.update(resource, response.headers)
+            limited = response.status_code == 429 or (
+                response.status_code == 403 and
+                (response.headers.get("x-ratelimit-remaining") == "0" or "retry-after" in response.headers))
+            if not limited or attempt:
+                return response
+            wait = float(response.headers.get("retry-after", 0)) or self.limits.delay(resource)
+            if wait > self.limits.max_wait_s:
+                raise RateLimitExceeded(f"GitHub {resource} rate limit spent; resets in {wait:.0f}s")
+            await asyncio.sleep(wait)
+        return response
+
+    async def get(self, path: str, params: dict = None, resource: str = "core", accept: str = None, parse=None):
+        """A conditional, cached REST GET (source "github"); parse(response) defaults to .json()."""
+        async def fetch(headers):
+            if accept:
+                headers = {**headers, "Accept": accept}
+            response = await self._request("GET", path, resource, params=params, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+            value = None if response.status_code == 304 else (parse or httpx.Response.json)(response)
+            return response.status_code, value, {"etag": response.headers.get("etag"),
+                                                 "last_modified": response.headers.get("last-modified")}
+        return await aconditional("github", (self.base_url, path, params, accept), fetch)
+
+    async def graphql(self, query: str, variables: dict) -> dict:
+        """A cached GraphQL query (POSTs have no validators, so TTL only)."""
+        async def fetch(headers):
+            response = await self._request("POST", "/graphql", "graphql", json={"query": query, "variables": variables})
+            response.raise_for_status()
+            body = response.json()
+            if body.get("errors"):
+                raise RuntimeError("; ".join(error.get("message", str(error)) for error in body["errors"]))
+            return response.status_code, body["data"], {}
+        return await aconditional("github", (self.base_url, "graphql", query, variables), fetch)
+
+    async def readme(self, full_name: str) -> str:
+        try:
+            return await self.get(f"/repos/{full_name}/readme", accept="application/vnd.github.raw",
+                                  parse=lambda response: response.text)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 404:
+                return ""
+            raise
+
+    async def search_repositories(self, query: str, top_k: int = 5, readme_chars: int = 0) -> list:
+        """
+        [{"title", "url", "snippet", "stars", "language", "topics", "updated_at"
+        (, "readme")}] for the top_k repositories by stars.
+        """
+        if self.token:
+            fields = REPO_FIELDS + (README_FIELDS if readme_chars else "")
+            data = await self.graphql(SEARCH_QUERY % fields, {"q": f"{query} sort:stars-desc", "n": top_k})
+            repos = []
+            for node in data["search"]["nodes"]:
+                if not node:
+                    continue
+                repo = {
+                    "title": node["nameWithOwner"], "url": node["url"], "snippet": node.get("description") or "",
+                    "stars": node["stargazerCount"], "language": (node.get("primaryLanguage") or {}).get("name"),
+                    "topics": [t["topic"]["name"] for t in (node.get("repositoryTopics") or {}).get("nodes", [])],
+                    "updated_at": node.get("updatedAt"),
+                }
+                if readme_chars:
+                    blob = node.get("readmeMd") or node.get("readmeRst") or node.get("readme") or {}
+                    repo["readme"] = readme_excerpt(blob.get("text"), readme_chars)
+                repos.append(repo)
+            return repos
+
+        data = await self.get("/search/repositories", {"q": query, "sort": "stars", "order": "desc", "per_page": top_k},
+                              resource="search")
+        repos = [{
+            "title": item["full_name"], "url": item["html_url"], "snippet": item.get("description") or "",
+            "stars": item["stargazers_count"], "language": item.get("language"),
+            "topics": item.get("topics", [])[:5], "updated_at": item.get("updated_at"),
+        } for item in data.get("items", [])[:top_k]]
+        if readme_chars:
+            readmes = await asyncio.gather(*(self.readme(repo["title"]) for repo in repos), return_exceptions=True)
+            for repo, text in zip(repos, readmes):
+                repo["readme"] = "" if isinstance(text, Exception) else readme_excerpt(text, readme_chars)
+        return repos
+
+    def stats(self) -> dict:
+        return {"authenticated": bool(self.token), "rate_limits": dict(self.limits.state)}
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_github_client() -> GitHubClient:
+    """The GitHubClient (GITHUB_TOKEN, GITHUB_API_URL) for the running event loop (closed with the loop)."""
+    return loop_local(_clients, _clients_lock, lambda: GitHubClient(os.environ.get("GITHUB_TOKEN")))
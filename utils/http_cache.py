@@ -0,0 +1,333 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from utils.cache_utils import LRUCache
+
+# --- EXTERNAL RESPONSE CACHE ---
+# One cache in front of every external research source (scraped pages,
+# librarian search pages, Firecrawl, Hugging Face, arXiv, GitHub), so a
+# query another crew made a minute ago doesn't cost another API call or
+# count against a rate limit. Entries are keyed on a hash of (source,
+# request) and stored in a memory LRU in front of a SQLite file, capped in
+# bytes with least-recently-used eviction.
+#   - fresh (younger than the source's TTL): served as is
+#   - stale (within HTTP_CACHE_STALE_S past the TTL): served at once while
+#     one background refresh runs
+#   - expired: fetched again. HTTP sources send If-None-Match /
+#     If-Modified-Since, and a 304 just renews the entry.
+# Only successful fetches are stored; errors propagate uncached, and SDK
+# callers can pass should_cache to skip empty or unusable answers.
+# Hits bump recency in memory; the disk tier's last_access is written in
+# batches (TOUCH_BATCH hits, or before a store evicts), off the hot path.
+# This is not an agent tool.
+
+HTTP_CACHE_ENABLED = os.environ.get("HTTP_CACHE", "on").lower() not in ("off", "0", "false")
+
+# Seconds an entry stays fresh, per source. Override with HTTP_CACHE_TTL_<SOURCE>.
+DEFAULT_TTLS = {
+    "web": 6 * 3600,
+    "librarian": 3600,
+    "firecrawl": 24 * 3600,
+    "huggingface": 6 * 3600,
+    "arxiv": 12 * 3600,
+    "github": 3600,
+}
+DEFAULT_TTL_S = 3600
+TOUCH_BATCH = 256
+
+
+class ResponseCache:
+
+    def __init__(self, db_path: str = "http_cache.sqlite3", max_bytes: int = 256 * 1024 * 1024,
+                 memory_size: int = 512, ttls: dict = None, stale_s: float = 24 * 3600):
+        """
+        db_path=None keeps the memory tier only. max_bytes bounds the SQLite
+        tier by stored value size. stale_s is how long past its TTL an entry
+        may still be served while it is refreshed in the background.
+        """
+        self.memory = LRUCache(memory_size)
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stale_s = stale_s
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._tasks = set()
+        self._touched = {}  # key -> last access not yet written to the disk tier
+        self._db = None
+        if db_path:
+            # Several crew host workers share the file.
+            self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    size INTEGER NOT NULL
+                )"""
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+            self._db.commit()
+        self.counters = {"fresh_hits": 0, "stale_hits": 0, "revalidated": 0, "misses": 0,
+                         "stores": 0, "evictions": 0, "refresh_errors": 0}
+
+    @staticmethod
+    def make_key(source: str, *parts) -> str:
+        material = json.dumps([source, *parts], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def ttl(self, source: str) -> float:
+        return self.ttls.get(source, DEFAULT_TTL_S)
+
+    def _count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] += amount
+
+    # --- storage ---
+
+    def lookup(self, key: str):
+        """The stored entry ({source, value, etag, last_modified, stored_at}) or None."""
+        entry = self.memory.get(key)
+        if entry is None and self._db is not None:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT source, value, etag, last_modified, stored_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None:
+                entry = {"source": row[0], "value": json.loads(row[1]), "etag": row[2],
+                         "last_modified": row[3], "stored_at": row[4]}
+                self.memory.put(key, entry)  # Promote to the memory tier
+        if entry is not None and self._db is not None:
+            with self._lock:
+                self._touched[key] = time.time()
+                if len(self._touched) >= TOUCH_BATCH:
+                    self._flush_touched()
+                    self._db.commit()
+        return entry
+
+    def _flush_touched(self):
+        """Writes the batched last_access updates (caller holds the lock and commits)."""
+        if self._touched:
+            self._db.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                 [(at, key) for key, at in self._touched.items()])
+            self._touched.clear()
+
+    def store(self, key: str, source: str, value, etag: str = None, last_modified: str = None) -> dict:
+        entry = {"source": source, "value": value, "etag": etag, "last_modified": last_modified,
+                 "stored_at": time.time()}
+        self.memory.put(key, entry)
+        self._count("stores")
+        if self._db is None:
+            return entry
+        text = json.dumps(value)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, source, value, etag, last_modified, stored_at, last_access, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, source, text, etag, last_modified, entry["stored_at"], entry["stored_at"], len(text))
+            )
+            self._touched.pop(key, None)
+            self._flush_touched()  # So eviction sees current recency
+            self._evict()
+            self._db.commit()
+        return entry
+
+    def renew(self, key: str, entry: dict) -> dict:
+        """Marks an entry fresh again (the origin answered 304 Not Modified)."""
+        entry = {**entry, "stored_at": time.time()}
+        self.memory.put(key, entry)
+        self._count("revalidated")
+        if self._db is not None:
+            with self._lock:
+                self._db.execute("UPDATE responses SET stored_at = ? WHERE key = ?", (entry["stored_at"], key))
+                self._db.commit()
+        return entry
+
+    def _evict(self):
+        (total,) = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access ASC"):
+            if total <= self.max_bytes:
+                break
+            evicted.append(key)
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", [(k,) for k in evicted])
+        for key in evicted:
+            self.memory.pop(key)
+        self.counters["evictions"] += len(evicted)
+
+    def age_state(self, entry: dict) -> str:
+        """'fresh', 'stale' (servable while refreshing) or 'expired'."""
+        age = time.time() - entry["stored_at"]
+        ttl = self.ttl(entry["source"])
+        if age <= ttl:
+            return "fresh"
+        return "stale" if age <= ttl + self.stale_s else "expired"
+
+    # --- read-through helpers ---
+
+    def _claim_refresh(self, key: str) -> bool:
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def _release_refresh(self, key: str):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def cached_call(self, source: str, parts: tuple, fetch, should_cache=None):
+        """
+        Sync read-through for SDK calls (no validators): returns fetch()'s
+        value, cached under (source, parts) unless should_cache(value) is false.
+        """
+        key = self.make_key(source, *parts)
+        entry = self.lookup(key)
+        if entry is not None:
+            state = self.age_state(entry)
+            if state == "fresh":
+                self._count("fresh_hits")
+                return entry["value"]
+            if state == "stale":
+                self._count("stale_hits")
+                if self._claim_refresh(key):
+                    threading.Thread(target=self._refresh_sync, args=(key, source, fetch, should_cache),
+                                     daemon=True).start()
+                return entry["value"]
+        self._count("misses")
+        value = fetch()
+        if should_cache is None or should_cache(value):
+            self.store(key, source, value)
+        return value
+
+    def _refresh_sync(self, key: str, source: str, fetch, should_cache=None):
+        try:
+            value = fetch()
+            if should_cache is None or should_cache(value):
+                self.store(key, source, value)
+        except Exception as e:
+            self._count("refresh_errors")
+            print(f"--- ⚠️ [HttpCache] Background refresh for {source} failed: {e} ---")
+        finally:
+            self._release_refresh(key)
+
+    async def aconditional(self, source: str, parts: tuple, fetch):
+        """
+        Async read-through for HTTP sources. fetch(headers) is awaited with
+        any If-None-Match / If-Modified-Since headers and returns
+        (status, value, validators) where validators is {"etag", "last_modified"}.
+        A 304 renews the cached entry; only a 200 is stored.
+        """
+        key = self.make_key(source, *parts)
+        entry = await asyncio.to_thread(self.lookup, key)
+        if entry is not None:
+            state = self.age_state(entry)
+            if state == "fresh":
+                self._count("fresh_hits")
+                return entry["value"]
+            if state == "stale":
+                self._count("stale_hits")
+                if self._claim_refresh(key):
+                    task = asyncio.create_task(self._refresh_async(key, source, fetch, entry))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._tasks.discard)
+                return entry["value"]
+        else:
+            self._count("misses")
+        return await self._revalidate(key, source, fetch, entry)
+
+    async def _revalidate(self, key: str, source: str, fetch, entry: dict):
+        headers = {}
+        if entry is not None and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry is not None and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        status, value, validators = await fetch(headers)
+        if status == 304 and entry is not None:
+            return (await asyncio.to_thread(self.renew, key, entry))["value"]
+        if status == 200:
+            await asyncio.to_thread(self.store, key, source, value,
+                                    validators.get("etag"), validators.get("last_modified"))
+        return value
+
+    async def _refresh_async(self, key: str, source: str, fetch, entry: dict):
+        try:
+            await self._revalidate(key, source, fetch, entry)
+        except Exception as e:
+            self._count("refresh_errors")
+            print(f"--- ⚠️ [HttpCache] Background refresh for {source} failed: {e} ---")
+        finally:
+            self._release_refresh(key)
+
+    def clear(self):
+        self.memory.clear()
+        if self._db is not None:
+            with self._lock:
+                self._touched.clear()
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            disk = None
+            if self._db is not None:
+                rows = self._db.execute("SELECT source, COUNT(*), SUM(size) FROM responses GROUP BY source").fetchall()
+                disk = {source: {"entries": count, "bytes": size} for source, count, size in rows}
+        hits = counters["fresh_hits"] + counters["stale_hits"] + counters["revalidated"]
+        lookups = hits + counters["misses"]
+        return {
+            "memory": self.memory.stats(),
+            "disk": disk,
+            "max_bytes": self.max_bytes,
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """The process-wide ResponseCache from the HTTP_CACHE_* env vars, or None when HTTP_CACHE=off."""
+    global _cache
+    if not HTTP_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            ttls = {source: float(os.environ[f"HTTP_CACHE_TTL_{source.upper()}"])
+                    for source in DEFAULT_TTLS if f"HTTP_CACHE_TTL_{source.upper()}" in os.environ}
+            _cache = ResponseCache(
+                db_path=os.environ.get("HTTP_CACHE_DB", "http_cache.sqlite3"),
+                max_bytes=int(float(os.environ.get("HTTP_CACHE_MAX_MB", 256)) * 1024 * 1024),
+                memory_size=int(os.environ.get("HTTP_CACHE_MEMORY_SIZE", 512)),
+                ttls=ttls,
+                stale_s=float(os.environ.get("HTTP_CACHE_STALE_S", 24 * 3600)),
+            )
+        return _cache
+
+
+def cached_call(source: str, parts: tuple, fetch, should_cache=None):
+    """get_response_cache().cached_call(...), or just fetch() when the cache is off."""
+    cache = get_response_cache()
+    return cache.cached_call(source, parts, fetch, should_cache) if cache is not None else fetch()
+
+
+async def aconditional(source: str, parts: tuple, fetch):
+    """get_response_cache().aconditional(...), or an unconditional fetch when the cache is off."""
+    cache = get_response_cache()
+    if cache is None:
+        return (await fetch({}))[1]
+    return await cache.aconditional(source, parts, fetch)
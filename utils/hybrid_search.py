@@ -0,0 +1,200 @@
+import os
+import re
+import json
+import math
+from collections import Counter
+import numpy as np
+
+# --- HYBRID RETRIEVAL HELPERS ---
+# A persisted BM25 inverted index, reciprocal rank fusion, and an exact
+# cosine-search backend over a memory-mapped embedding matrix.
+# None of these need Chroma. This is not an agent tool.
+
+_TOKEN_RE = re.compile(r"[A-Za-z0-9_]+")
+
+
+def tokenize(text: str) -> list:
+    """
+    Lower-cased word tokens. Identifiers such as 'search_dlai_kb' are kept
+    whole and also split into their parts, so both spellings match.
+    """
+    tokens = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if "_" in token:
+            tokens.extend(part for part in token.split("_") if part)
+    return tokens
+
+
+class BM25Index:
+    """An Okapi BM25 inverted index keyed by chunk id, persisted as JSON."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.docs = {}      # chunk_id -> {"len": int, "source": str, "tf": {term: count}}
+        self.postings = {}  # term -> {chunk_id: count}
+        self.total_len = 0
+
+    def __len__(self):
+        return len(self.docs)
+
+    def add(self, chunk_id: str, text: str, source: str = ""):
+        if chunk_id in self.docs:
+            self.remove(chunk_id)
+        tf = Counter(tokenize(text))
+        length = sum(tf.values())
+        self.docs[chunk_id] = {"len": length, "source": source, "tf": dict(tf)}
+        self.total_len += length
+        for term, count in tf.items():
+            self.postings.setdefault(term, {})[chunk_id] = count
+
+    def remove(self, chunk_id: str):
+        doc = self.docs.pop(chunk_id, None)
+        if doc is None:
+            return
+        self.total_len -= doc["len"]
+        for term in doc["tf"]:
+            posting = self.postings.get(term)
+            if posting is not None:
+                posting.pop(chunk_id, None)
+                if not posting:
+                    del self.postings[term]
+
+    def search(self, query: str, k: int = 10, sources: list = None) -> list:
+        """Returns [(chunk_id, score)] for the top k chunks, best first."""
+        if not self.docs:
+            return []
+        n_docs = len(self.docs)
+        avg_len = self.total_len / n_docs or 1.0
+        allowed = set(sources) if sources else None
+        scores = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = math.log(1 + (n_docs - len(posting) + 0.5) / (len(posting) + 0.5))
+            for chunk_id, count in posting.items():
+                doc = self.docs[chunk_id]
+                if allowed is not None and doc["source"] not in allowed:
+                    continue
+                norm = count + self.k1 * (1 - self.b + self.b * doc["len"] / avg_len)
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * count * (self.k1 + 1) / norm
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def save(self, path: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"k1": self.k1, "b": self.b, "docs": self.docs}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        index = cls()
+        if not os.path.exists(path):
+            return index
+        with open(path, "r") as f:
+            data = json.load(f)
+        index.k1, index.b = data.get("k1", index.k1), data.get("b", index.b)
+        # Postings are derived, so only the per-doc term counts are stored.
+        for chunk_id, doc in data["docs"].items():
+            index.docs[chunk_id] = doc
+            index.total_len += doc["len"]
+            for term, count in doc["tf"].items():
+                index.postings.setdefault(term, {})[chunk_id] = count
+        return index
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> list:
+    """
+    Fuses several best-first lists of ids with RRF: score = sum(1 / (k + rank)).
+    Returns [(id, score)], best first.
+    """
+    scores = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class NumpyVectorIndex:
+    """
+    Exact cosine search over an L2-normalised float32 matrix stored as
+    embeddings.npy (opened with mmap) plus a JSON sidecar of ids, texts and
+    metadata. Good for small and medium collections; no server, no Chroma.
+    """
+
+    MATRIX_FILE = "embeddings.npy"
+    META_FILE = "embeddings_meta.json"
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.ids = []
+        self.texts = []
+        self.metadatas = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _normalise(vectors) -> np.ndarray:
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "NumpyVectorIndex":
+        index = cls(directory)
+        matrix_path = os.path.join(directory, cls.MATRIX_FILE)
+        meta_path = os.path.join(directory, cls.META_FILE)
+        if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+            return index
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        index.ids, index.texts, index.metadatas = meta["ids"], meta["texts"], meta["metadatas"]
+        index.matrix = np.load(matrix_path, mmap_mode="r" if mmap else None)
+        return index
+
+    def apply(self, upserts: list, deletes: list):
+        """
+        Applies (chunk_id, embedding, text, metadata) upserts and id deletes
+        in one pass, keeping the surviving rows of the current matrix.
+        """
+        drop = set(deletes) | {chunk_id for chunk_id, _, _, _ in upserts}
+        keep = [i for i, chunk_id in enumerate(self.ids) if chunk_id not in drop]
+        rows = [np.asarray(self.matrix[keep])] if keep else []
+        if upserts:
+            rows.append(self._normalise([embedding for _, embedding, _, _ in upserts]))
+        self.matrix = np.vstack(rows) if rows else np.zeros((0, 0), dtype=np.float32)
+        self.ids = [self.ids[i] for i in keep] + [u[0] for u in upserts]
+        self.texts = [self.texts[i] for i in keep] + [u[2] for u in upserts]
+        self.metadatas = [self.metadatas[i] for i in keep] + [u[3] for u in upserts]
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        matrix_path = os.path.join(self.directory, self.MATRIX_FILE)
+        meta_path = os.path.join(self.directory, self.META_FILE)
+        with open(f"{matrix_path}.tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self.matrix, dtype=np.float32))
+        with open(f"{meta_path}.tmp", "w") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas}, f)
+        os.replace(f"{matrix_path}.tmp", matrix_path)
+        os.replace(f"{meta_path}.tmp", meta_path)
+
+    def search(self, vector, k: int = 10, sources: list = None) -> list:
+        """Returns [(row, score)] for the k most similar rows, best first."""
+        if not self.ids:
+            return []
+        scores = self.matrix @ self._normalise(vector)[0]
+        if sources:
+            allowed = set(sources)
+            mask = np.fromiter((m.get("source") in allowed for m in self.metadatas), dtype=bool, count=len(self.ids))
+            scores = np.where(mask, scores, -np.inf)
+        k = min(k, len(self.ids))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top if np.isfinite(scores[row])]
@@ -0,0 +1,214 @@
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+from contextvars import ContextVar
+
+# --- RESEARCH JOB QUEUE ---
+# A bounded, in-process job queue drained by a fixed number of async workers.
+# Every job is mirrored to a small SQLite file, so queued (and interrupted)
+# jobs are picked up again after a restart. Finished jobs are pruned by age
+# and count, so the file stays small.
+# This is not an agent tool.
+
+TERMINAL_STATUSES = ("completed", "failed", "cancelled")
+
+# The id of the job a runner is executing (set for the runner's task).
+current_job_id = ContextVar("current_job_id", default=None)
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when the queue is at capacity."""
+
+
+class JobQueue:
+
+    def __init__(self, runner, db_path: str = "research_jobs.sqlite3", max_queued: int = 20, workers: int = 2,
+                 keep_finished: int = 1000, finished_ttl_s: float = 7 * 24 * 3600):
+        """
+        runner is an async callable taking the job payload (a dict) and
+        returning a JSON-serialisable result. Finished jobs are kept for
+        finished_ttl_s, and only the newest keep_finished of them.
+        """
+        self.runner = runner
+        self.db_path = db_path
+        self.max_queued = max_queued
+        self.num_workers = workers
+        self.keep_finished = keep_finished
+        self.finished_ttl_s = finished_ttl_s
+        self._queue = asyncio.Queue()
+        self._workers = []
+        self._running = {}       # job_id -> asyncio.Task running the job
+        self._done_events = {}   # job_id -> asyncio.Event set on a terminal status
+        self._db = sqlite3.connect(db_path)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                started_at REAL,
+                finished_at REAL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_finished_at ON jobs (finished_at)")
+        self._db.commit()
+
+    # --- persistence helpers ---
+
+    def _update(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        self._db.commit()
+
+    def _prune(self):
+        """Deletes finished jobs older than finished_ttl_s or beyond the newest keep_finished."""
+        self._db.execute(
+            "DELETE FROM jobs WHERE finished_at < ? OR id IN ("
+            "SELECT id FROM jobs WHERE finished_at IS NOT NULL ORDER BY finished_at DESC LIMIT -1 OFFSET ?)",
+            (time.time() - self.finished_ttl_s, self.keep_finished)
+        )
+        self._db.commit()
+
+    def get(self, job_id: str) -> dict:
+        """Returns the job record with timings, or None if the id is unknown."""
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        now = time.time()
+        started, finished = job["started_at"], job["finished_at"]
+        job["queue_wait_s"] = round((started or now) - job["created_at"], 3)
+        job["run_s"] = round((finished or now) - started, 3) if started else None
+        return job
+
+    # --- lifecycle ---
+
+    async def start(self):
+        """Prunes old jobs, re-queues those left over from a previous run and starts the workers."""
+        self._prune()
+        leftovers = self._db.execute(
+            "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        ).fetchall()
+        for row in leftovers:
+            self._update(row["id"], status="queued", started_at=None)
+            self._done_events[row["id"]] = asyncio.Event()
+            self._queue.put_nowait(row["id"])
+        if leftovers:
+            print(f"--- [JobQueue] Recovered {len(leftovers)} unfinished jobs from {self.db_path} ---")
+        self._workers = [asyncio.create_task(self._worker(i)) for i in range(self.num_workers)]
+        print(f"--- [JobQueue] Started {self.num_workers} workers (max {self.max_queued} queued). ---")
+
+    async def stop(self):
+        """Stops the workers. Jobs still running stay 'running' and are re-queued on the next start()."""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._db.close()
+
+    # --- public API ---
+
+    def submit(self, payload: dict, result=None) -> dict:
+        """
+        Queues a job and returns its record. Raises JobQueueFull when at capacity.
+        If a result is already known (e.g. from a cache), the job is recorded
+        as completed without touching the queue.
+        """
+        if result is not None:
+            job_id, now = uuid.uuid4().hex, time.time()
+            self._db.execute(
+                "INSERT INTO jobs (id, status, payload, result, created_at, started_at, finished_at) "
+                "VALUES (?, 'completed', ?, ?, ?, ?, ?)",
+                (job_id, json.dumps(payload), json.dumps(result), now, now, now)
+            )
+            self._prune()
+            return self.get(job_id)
+        if self._queue.qsize() >= self.max_queued:
+            raise JobQueueFull(f"Research queue is full ({self.max_queued} jobs waiting).")
+        job_id = uuid.uuid4().hex
+        self._db.execute(
+            "INSERT INTO jobs (id, status, payload, created_at) VALUES (?, 'queued', ?, ?)",
+            (job_id, json.dumps(payload), time.time())
+        )
+        self._db.commit()
+        self._done_events[job_id] = asyncio.Event()
+        self._queue.put_nowait(job_id)
+        return self.get(job_id)
+
+    def cancel(self, job_id: str) -> dict:
+        """Cancels a queued or running job. Finished jobs are returned unchanged."""
+        job = self.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return job
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()  # The worker records the cancellation
+        else:
+            self._finish(job_id, status="cancelled")
+        return self.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float = None) -> dict:
+        """Waits until the job reaches a terminal status (or the timeout) and returns it."""
+        event = self._done_events.get(job_id)
+        if event is not None:
+            await asyncio.wait_for(event.wait(), timeout)
+        return self.get(job_id)
+
+    def stats(self) -> dict:
+        counts = dict(self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        return {
+            "workers": self.num_workers,
+            "queue_depth": self._queue.qsize(),
+            "max_queued": self.max_queued,
+            "running": len(self._running),
+            "jobs_by_status": counts,
+        }
+
+    # --- workers ---
+
+    def _finish(self, job_id: str, status: str, result=None, error: str = None):
+        self._update(
+            job_id, status=status, finished_at=time.time(),
+            result=json.dumps(result) if result is not None else None, error=error
+        )
+        self._prune()
+        event = self._done_events.pop(job_id, None)
+        if event is not None:
+            event.set()
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job_id = await self._queue.get()
+            job = self.get(job_id)
+            if job is None or job["status"] != "queued":
+                continue  # Cancelled while it was waiting
+            self._update(job_id, status="running", started_at=time.time())
+            print(f"--- [JobQueue] Worker {worker_id} running job {job_id} ---")
+            token = current_job_id.set(job_id)
+            task = asyncio.create_task(self.runner(job["payload"]))  # Copies the context, job id included
+            current_job_id.reset(token)
+            self._running[job_id] = task
+            try:
+                await asyncio.wait({task})
+            except asyncio.CancelledError:
+                # Shutting down: leave the job 'running' so start() re-queues it.
+                task.cancel()
+                raise
+            finally:
+                self._running.pop(job_id, None)
+
+            if task.cancelled():
+                self._finish(job_id, status="cancelled")
+            elif task.exception() is not None:
+                error = task.exception()
+                print(f"--- [JobQueue] Job {job_id} failed: {error} ---")
+                self._finish(job_id, status="failed", error=f"{type(error).__name__}: {error}")
+            else:
+                self._finish(job_id, status="completed", result=task.result())
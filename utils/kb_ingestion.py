@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import email
+from email import policy
+from concurrent.futures import ProcessPoolExecutor
+
+# --- KNOWLEDGE BASE INGESTION PIPELINE ---
+# Parses notebooks and saved web pages into small, cell- and heading-aware
+# chunks. Everything here returns plain dicts so it can run inside worker
+# processes without importing langchain or the embedding model.
+# This is not an agent tool.
+
+NOTEBOOK_EXTENSIONS = (".ipynb",)
+HTML_EXTENSIONS = (".mhtml", ".mht", ".html", ".htm")
+SUPPORTED_EXTENSIONS = NOTEBOOK_EXTENSIONS + HTML_EXTENSIONS
+
+CHUNK_MAX_CHARS = int(os.environ.get("RAG_CHUNK_MAX_CHARS", 1500))
+
+_HEADING_RE = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$", re.MULTILINE)
+_HTML_BLOCK_TAGS = ["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "pre", "blockquote", "td", "th", "dt", "dd"]
+
+
+def discover_files(root: str) -> dict:
+    """Returns {relative_path: absolute_path} for every supported file under root."""
+    found = {}
+    if not os.path.isdir(root):
+        return found
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                full_path = os.path.join(dirpath, name)
+                found[os.path.relpath(full_path, root)] = full_path
+    return found
+
+
+def _split_long_text(text: str, max_chars: int) -> list:
+    """Splits text on paragraph, then line boundaries so no piece exceeds max_chars."""
+    if len(text) <= max_chars:
+        return [text]
+    pieces, current = [], ""
+    for para in re.split(r"(\n\s*\n)", text):
+        if len(para) > max_chars:
+            lines = para.splitlines(keepends=True)
+        else:
+            lines = [para]
+        for line in lines:
+            while len(line) > max_chars:
+                if current:
+                    pieces.append(current)
+                    current = ""
+                pieces.append(line[:max_chars])
+                line = line[max_chars:]
+            if len(current) + len(line) > max_chars and current:
+                pieces.append(current)
+                current = ""
+            current += line
+    if current:
+        pieces.append(current)
+    return [p.strip() for p in pieces if p.strip()]
+
+
+def _pack_blocks(blocks: list, source: str, max_chars: int) -> list:
+    """
+    Packs consecutive blocks that share a heading into chunks of at most
+    max_chars, counting the heading line prepended to each chunk. Each block
+    is (text, heading, position, kind).
+    """
+    chunks = []
+    buffer, buffer_len = [], 0
+
+    def prefix(heading: str) -> str:
+        # Capped so a very long heading still leaves room for the text.
+        return f"{heading[:max_chars // 2]}\n\n" if heading else ""
+
+    def flush():
+        nonlocal buffer, buffer_len
+        if not buffer:
+            return
+        heading = buffer[0][1]
+        text = "\n\n".join(b[0] for b in buffer)
+        if heading and heading not in text:
+            text = prefix(heading) + text
+        chunks.append({
+            "text": text,
+            "metadata": {
+                "source": source,
+                "heading": heading,
+                "cell_index": buffer[0][2],
+                "cell_end": buffer[-1][2],
+                "cell_type": buffer[0][3] if len({b[3] for b in buffer}) == 1 else "mixed",
+                "chunk_index": len(chunks),
+            },
+        })
+        buffer, buffer_len = [], 0
+
+    for text, heading, position, kind in blocks:
+        budget = max(1, max_chars - len(prefix(heading)))
+        for piece in _split_long_text(text, budget):
+            if buffer and (buffer[0][1] != heading or buffer_len + len(piece) > budget):
+                flush()
+            buffer.append((piece, heading, position, kind))
+            buffer_len += len(piece) + 2
+    flush()
+    return chunks
+
+
+def parse_notebook(full_path: str, source: str, max_chars: int = CHUNK_MAX_CHARS) -> list:
+    """Splits a .ipynb into heading-aware chunks of code and markdown cells (outputs are skipped)."""
+    with open(full_path, "r", encoding="utf-8") as f:
+        notebook = json.load(f)
+    cells = notebook.get("cells")
+    if cells is None:  # nbformat v3
+        cells = [c for ws in notebook.get("worksheets", []) for c in ws.get("cells", [])]
+
+    blocks, heading = [], ""
+    for index, cell in enumerate(cells):
+        metadata = cell.get("metadata") or {}
+        if (metadata.get("jupyter") or {}).get("source_hidden") or metadata.get("hide_input"):
+            continue
+        kind = cell.get("cell_type", "code")
+        if kind not in ("code", "markdown"):
+            continue
+        source_text = cell.get("source", cell.get("input", ""))
+        if isinstance(source_text, list):
+            source_text = "".join(source_text)
+        source_text = source_text.strip()
+        if not source_text:
+            continue
+        if kind == "markdown":
+            headings = _HEADING_RE.findall(source_text)
+            if headings:
+                # A cell with a heading starts a new section.
+                heading = "#" * len(headings[0][0]) + " " + headings[0][1]
+                blocks.append((source_text, heading, index, kind))
+                heading = "#" * len(headings[-1][0]) + " " + headings[-1][1]
+                continue
+        blocks.append((source_text, heading, index, kind))
+    return _pack_blocks(blocks, source, max_chars)
+
+
+def _read_html_parts(full_path: str) -> list:
+    if not full_path.lower().endswith((".mhtml", ".mht")):
+        with open(full_path, "r", encoding="utf-8", errors="replace") as f:
+            return [f.read()]
+    with open(full_path, "rb") as f:
+        message = email.message_from_binary_file(f, policy=policy.default)
+    parts = []
+    for part in message.walk():
+        if part.get_content_type() == "text/html":
+            parts.append(part.get_content())
+    return parts
+
+
+def parse_html(full_path: str, source: str, max_chars: int = CHUNK_MAX_CHARS) -> list:
+    """Splits an HTML or MHTML page into chunks grouped under their nearest heading."""
+    from bs4 import BeautifulSoup
+
+    blocks, heading, position = [], "", 0
+    for html in _read_html_parts(full_path):
+        soup = BeautifulSoup(html, "html.parser")
+        for tag in soup(["script", "style", "noscript", "svg", "nav", "footer"]):
+            tag.decompose()
+        for element in soup.find_all(_HTML_BLOCK_TAGS):
+            # Nested blocks (e.g. <p> inside <li>) are covered by their outermost block.
+            if element.find_parent(_HTML_BLOCK_TAGS):
+                continue
+            text = element.get_text(" " if element.name != "pre" else "", strip=element.name != "pre")
+            text = text.strip()
+            if not text:
+                continue
+            if element.name[0] == "h" and element.name[1:].isdigit():
+                heading = "#" * int(element.name[1:]) + " " + " ".join(text.split())
+                continue
+            kind = "code" if element.name == "pre" else "text"
+            blocks.append((text, heading, position, kind))
+            position += 1
+    return _pack_blocks(blocks, source, max_chars)
+
+
+def parse_file(source: str, full_path: str, max_chars: int = CHUNK_MAX_CHARS) -> list:
+    """Dispatches a knowledge base file to the matching parser."""
+    if full_path.lower().endswith(NOTEBOOK_EXTENSIONS):
+        return parse_notebook(full_path, source, max_chars)
+    if full_path.lower().endswith(HTML_EXTENSIONS):
+        return parse_html(full_path, source, max_chars)
+    raise ValueError(f"Unsupported knowledge base file: {source}")
+
+
+def _parse_file_safe(source: str, full_path: str, max_chars: int):
+    try:
+        return source, parse_file(source, full_path, max_chars), None
+    except Exception as e:
+        return source, None, f"{type(e).__name__}: {e}"
+
+
+def iter_parsed_files(files: dict, max_workers: int = None, max_chars: int = CHUNK_MAX_CHARS):
+    """
+    Parses {source: full_path} across a process pool and yields
+    (source, chunks, error) per file in submission order. At most
+    2x max_workers files are in flight, so parsed chunks never pile up in
+    memory.
+    """
+    if max_workers is None:
+        max_workers = int(os.environ.get("RAG_INGEST_WORKERS", min(4, os.cpu_count() or 1)))
+    items = list(files.items())
+    if max_workers <= 1 or len(items) <= 1:
+        for source, full_path in items:
+            yield _parse_file_safe(source, full_path, max_chars)
+        return
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        pending = []
+        for source, full_path in items:
+            pending.append(pool.submit(_parse_file_safe, source, full_path, max_chars))
+            if len(pending) >= max_workers * 2:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def batched(iterable, size: int):
+    """Yields lists of at most size items."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,113 @@
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from utils.cache_utils import LRUCache
+
+# --- LLM COMPLETION CACHE ---
+# Memoises LLM completions keyed on (model, rendered prompt, tool schema,
+# sampling params), so retries and deterministic re-runs skip the LLM.
+# Two tiers: an in-memory LRU in front of a SQLite file. Values are plain
+# JSON; the caller decides how to (de)serialise its outputs.
+# This is not an agent tool.
+
+
+class CompletionCache:
+
+    def __init__(self, db_path: str = "llm_cache.sqlite3", memory_size: int = 256, max_entries: int = 5000):
+        """
+        db_path=None keeps the memory tier only. max_entries bounds the
+        SQLite tier; the least recently used rows are evicted past it.
+        """
+        self.memory = LRUCache(memory_size)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    model TEXT,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_hit_at REAL NOT NULL,
+                    hits INTEGER NOT NULL DEFAULT 0
+                )"""
+            )
+            self._db.commit()
+        self.counters = {"hits_memory": 0, "hits_disk": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+
+    @staticmethod
+    def make_key(model: str, prompt: str, tool_schema=None, params: dict = None) -> str:
+        material = json.dumps(
+            {"model": model, "prompt": prompt, "tools": tool_schema or [], "params": params or {}},
+            sort_keys=True, default=str
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def get(self, key: str, bypass: bool = False):
+        """Returns the cached value, or None on a miss (or when bypass is set)."""
+        if bypass:
+            with self._lock:
+                self.counters["bypassed"] += 1
+            return None
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.counters["hits_memory"] += 1
+            return value
+        with self._lock:
+            row = None
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM completions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.counters["misses"] += 1
+                return None
+            self._db.execute("UPDATE completions SET last_hit_at = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            self.counters["hits_disk"] += 1
+        value = json.loads(row[0])
+        self.memory.put(key, value)  # Promote to the memory tier
+        return value
+
+    def put(self, key: str, value, model: str = None):
+        self.memory.put(key, value)
+        with self._lock:
+            self.counters["stores"] += 1
+            if self._db is None:
+                return
+            now = time.time()
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, model, value, created_at, last_hit_at, hits) VALUES (?, ?, ?, ?, ?, 0)",
+                (key, model, json.dumps(value), now, now)
+            )
+            (count,) = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()
+            if count > self.max_entries:
+                lru = [k for (k,) in self._db.execute(
+                    "SELECT key FROM completions ORDER BY last_hit_at ASC LIMIT ?", (count - self.max_entries,))]
+                self._db.executemany("DELETE FROM completions WHERE key = ?", [(k,) for k in lru])
+                self.counters["evictions"] += len(lru)
+            self._db.commit()
+
+    def clear(self):
+        self.memory.clear()
+        with self._lock:
+            if self._db is not None:
+                self._db.execute("DELETE FROM completions")
+                self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            size = self._db.execute("SELECT COUNT(*) FROM completions").fetchone()[0] if self._db is not None else None
+        hits = counters["hits_memory"] + counters["hits_disk"]
+        lookups = hits + counters["misses"]
+        return {
+            "memory": self.memory.stats(),
+            "disk_size": size,
+            "max_entries": self.max_entries,
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,474 @@
+import os
+import json
+import time
+import uuid
+import heapq
+import socket
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import itertools
+from collections import OrderedDict, deque
+from contextlib import contextmanager, asynccontextmanager
+from contextvars import ContextVar
+from langchain_community.llms import Ollama
+
+# --- SHARED OLLAMA SCHEDULER ---
+# Every LLM call in a process goes through one LLMScheduler: at most
+# max_in_flight requests reach Ollama at once, waiting requests are served
+# by priority class (interactive Writer ahead of planning, planning ahead
+# of background crews), and within a class jobs take turns (start-time fair
+# queueing), so one big job can't starve the rest. Tokens are accounted per
+# job against an optional budget.
+#
+# The job and priority of a call come from context variables, set with
+# llm_job(...) and llm_priority(...); asyncio tasks and asyncio.to_thread
+# inherit them.
+#
+# The backend and every crew-host worker are separate processes, so the
+# in-flight limit and the priority classes are also enforced across them
+# through SharedSlots, a small SQLite table of held slots and of each
+# process's best waiting request (OLLAMA_SLOT_DB, on by default; "off"
+# limits each process on its own). A process takes a slot only while
+# fewer than max_in_flight are held in total and no other process has a
+# better request waiting, so the backend's Writer goes ahead of the crew
+# host's background crews. Slots of processes that died are reclaimed.
+# Processes share it when they share the file, i.e. on one host (or a
+# shared volume); they should all use the same OLLAMA_MAX_IN_FLIGHT.
+# This is not an agent tool.
+
+PRIORITIES = {"interactive": 0, "planning": 1, "background": 2}
+DEFAULT_PRIORITY = "background"
+OLLAMA_SLOT_DB = os.environ.get("OLLAMA_SLOT_DB", os.path.join(tempfile.gettempdir(), "ollama_slots.sqlite3"))
+OLLAMA_SLOT_LEASE_S = float(os.environ.get("OLLAMA_SLOT_LEASE_S", 900.0))  # For rows from other hosts
+SHARED_POLL_S = 0.05
+HOSTNAME = socket.gethostname()
+
+current_job = ContextVar("llm_job", default=None)
+current_priority = ContextVar("llm_priority", default=None)
+
+
+class TokenBudgetExceeded(Exception):
+    """Raised when a job asks for another completion after using up its token budget."""
+
+
+@contextmanager
+def llm_job(job_id: str):
+    token = current_job.set(job_id)
+    try:
+        yield
+    finally:
+        current_job.reset(token)
+
+
+@contextmanager
+def llm_priority(priority: str):
+    if priority not in PRIORITIES:
+        raise ValueError(f"Unknown priority '{priority}' (expected one of {', '.join(PRIORITIES)})")
+    token = current_priority.set(priority)
+    try:
+        yield
+    finally:
+        current_priority.reset(token)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class SharedSlots:
+    """In-flight slots shared by every process that opens the same SQLite file."""
+
+    def __init__(self, path: str, lease_s: float = OLLAMA_SLOT_LEASE_S):
+        self.path = path
+        self.lease_s = lease_s
+        self.owner = f"{HOSTNAME}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._db = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS holders (
+                token TEXT PRIMARY KEY, owner TEXT NOT NULL, host TEXT NOT NULL, pid INTEGER NOT NULL,
+                priority INTEGER NOT NULL, acquired_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS heads (
+                owner TEXT PRIMARY KEY, host TEXT NOT NULL, pid INTEGER NOT NULL,
+                priority INTEGER NOT NULL, enqueued_at REAL NOT NULL, updated_at REAL NOT NULL
+            )"""
+        )
+        self._head = None  # What this process last published as its best waiter
+
+    def _reap(self, now: float):
+        """Drops rows of dead local processes, and rows from other hosts past their lease."""
+        for table, stamp in (("holders", "acquired_at"), ("heads", "updated_at")):
+            for owner, host, pid, at in self._db.execute(f"SELECT owner, host, pid, {stamp} FROM {table}").fetchall():
+                dead = not _pid_alive(pid) if host == HOSTNAME else now - at > self.lease_s
+                if dead:
+                    self._db.execute(f"DELETE FROM {table} WHERE owner = ?", (owner,))
+
+    def try_acquire(self, max_in_flight: int, priority: int, enqueued_at: float) -> str:
+        """
+        Takes a slot for a request of (priority, enqueued_at) and returns its
+        token, or returns None and publishes the request as this process's
+        best waiter so the others hold back for it.
+        """
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._reap(now)
+            (held,) = self._db.execute("SELECT COUNT(*) FROM holders").fetchone()
+            better = self._db.execute(
+                "SELECT 1 FROM heads WHERE owner != ? AND (priority < ? OR (priority = ? AND enqueued_at < ?)) LIMIT 1",
+                (self.owner, priority, priority, enqueued_at)
+            ).fetchone()
+            if held < max_in_flight and better is None:
+                token = uuid.uuid4().hex
+                self._db.execute("INSERT INTO holders VALUES (?, ?, ?, ?, ?, ?)",
+                                 (token, self.owner, HOSTNAME, os.getpid(), priority, now))
+                self._db.execute("DELETE FROM heads WHERE owner = ?", (self.owner,))
+                self._head = None
+            else:
+                token = None
+                self._db.execute("INSERT OR REPLACE INTO heads VALUES (?, ?, ?, ?, ?, ?)",
+                                 (self.owner, HOSTNAME, os.getpid(), priority, enqueued_at, now))
+                self._head = (priority, enqueued_at)
+            self._db.execute("COMMIT")
+            return token
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def clear_head(self):
+        if self._head is not None:
+            self._db.execute("DELETE FROM heads WHERE owner = ?", (self.owner,))
+            self._head = None
+
+    def move_head(self, priority: int, enqueued_at: float):
+        """Re-publishes this process's best waiter after the published one left the queue."""
+        if self._head is not None and self._head != (priority, enqueued_at):
+            self._db.execute("UPDATE heads SET priority = ?, enqueued_at = ?, updated_at = ? WHERE owner = ?",
+                             (priority, enqueued_at, time.time(), self.owner))
+            self._head = (priority, enqueued_at)
+
+    def release(self, token: str):
+        self._db.execute("DELETE FROM holders WHERE token = ?", (token,))
+
+    def in_flight(self) -> int:
+        return self._db.execute("SELECT COUNT(*) FROM holders").fetchone()[0]
+
+
+class _Waiter:
+    __slots__ = ("key", "job", "priority", "enqueued_at", "enqueued_wall", "wake", "granted", "cancelled")
+
+    def __init__(self, key, job, priority, wake):
+        self.key = key
+        self.job = job
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.enqueued_wall = time.time()  # Comparable across processes
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return self.key < other.key
+
+
+class LLMScheduler:
+
+    def __init__(self, max_in_flight: int = 2, job_token_budget: int = 0, max_tracked_jobs: int = 256,
+                 stats_window: int = 1000, shared: SharedSlots = None):
+        """
+        job_token_budget=0 means unlimited; set_budget() overrides it per job.
+        Waiting callers can be threads or coroutines, on any event loop.
+        With shared, slots are also taken from the cross-process pool.
+        """
+        self.max_in_flight = max_in_flight
+        self.job_token_budget = job_token_budget
+        self.max_tracked_jobs = max_tracked_jobs
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._virtual_time = 0       # Fair-queueing clock: the tag of the last grant
+        self._job_tags = {}          # job -> tag of its last queued request
+        self._jobs = OrderedDict()   # job -> {"tokens", "requests", "budget"}
+        self._waits = deque(maxlen=stats_window)
+        self.counters = {"granted": {p: 0 for p in PRIORITIES}, "rejected_budget": 0, "cancelled": 0}
+        self.shared = shared
+        self._shared_tokens = []
+        if shared is not None:
+            # Other processes can't wake us: retry the queue head while it waits.
+            threading.Thread(target=self._poll_shared, name="llm-slot-poller", daemon=True).start()
+
+    # --- accounting ---
+
+    def _job(self, job: str) -> dict:
+        record = self._jobs.get(job)
+        if record is None:
+            record = self._jobs[job] = {"tokens": 0, "requests": 0, "budget": self.job_token_budget}
+            while len(self._jobs) > self.max_tracked_jobs:
+                old, _ = self._jobs.popitem(last=False)
+                self._job_tags.pop(old, None)
+        self._jobs.move_to_end(job)
+        return record
+
+    def set_budget(self, job: str, tokens: int):
+        with self._lock:
+            self._job(job)["budget"] = tokens
+
+    def charge(self, job: str, tokens: int):
+        with self._lock:
+            self._job(job)["tokens"] += max(0, int(tokens))
+
+    def usage(self, job: str) -> dict:
+        with self._lock:
+            return dict(self._jobs.get(job) or {"tokens": 0, "requests": 0, "budget": self.job_token_budget})
+
+    # --- admission ---
+
+    def _enqueue(self, job: str, priority: str, wake) -> _Waiter:
+        """Either grants a slot right away or queues the caller. Caller holds the lock."""
+        record = self._job(job)
+        if record["budget"] and record["tokens"] >= record["budget"]:
+            self.counters["rejected_budget"] += 1
+            raise TokenBudgetExceeded(f"Job {job} used {record['tokens']} of its {record['budget']} token budget.")
+        record["requests"] += 1
+        tag = max(self._job_tags.get(job, 0), self._virtual_time) + 1
+        self._job_tags[job] = tag
+        waiter = _Waiter((PRIORITIES[priority], tag, next(self._seq)), job, priority, wake)
+        heapq.heappush(self._heap, waiter)
+        self._dispatch()
+        return waiter
+
+    def _take_shared(self, waiter: _Waiter) -> bool:
+        try:
+            token = self.shared.try_acquire(self.max_in_flight, PRIORITIES[waiter.priority], waiter.enqueued_wall)
+        except sqlite3.Error as e:
+            # Never deadlock on the coordination file: fall back to the local limit.
+            print(f"--- ⚠️ [LLMScheduler] shared slot pool unavailable ({e}); using the local limit ---")
+            return True
+        if token is None:
+            return False
+        self._shared_tokens.append(token)
+        return True
+
+    def _dispatch(self):
+        """Grants free slots to the best waiters. Caller holds the lock."""
+        while self._heap and self._heap[0].cancelled:  # Dropped even when no slot is free
+            heapq.heappop(self._heap)
+        while self._heap and self._in_flight < self.max_in_flight:
+            waiter = self._heap[0]
+            if waiter.cancelled:
+                heapq.heappop(self._heap)
+                continue
+            if self.shared is not None and not self._take_shared(waiter):
+                return
+            heapq.heappop(self._heap)
+            waiter.granted = True
+            self._in_flight += 1
+            self._virtual_time = max(self._virtual_time, waiter.key[1])
+            self._waits.append(time.monotonic() - waiter.enqueued_at)
+            self.counters["granted"][waiter.priority] += 1
+            if waiter.wake is not None:
+                waiter.wake()
+        if self.shared is not None:
+            if not self._heap:
+                self.shared.clear_head()
+            else:
+                self.shared.move_head(PRIORITIES[self._heap[0].priority], self._heap[0].enqueued_wall)
+
+    def _poll_shared(self):
+        while True:
+            time.sleep(SHARED_POLL_S)
+            with self._lock:
+                if self._heap and self._in_flight < self.max_in_flight:
+                    try:
+                        self._dispatch()
+                    except Exception as e:
+                        print(f"--- ⚠️ [LLMScheduler] shared slot poll failed: {e} ---")
+
+    def _resolve(self, job, priority):
+        job = job or current_job.get() or "anonymous"
+        priority = priority or current_priority.get() or DEFAULT_PRIORITY
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}'")
+        return job, priority
+
+    def acquire(self, job: str = None, priority: str = None) -> str:
+        """Blocks the calling thread until a slot is free. Returns the job the slot is charged to."""
+        job, priority = self._resolve(job, priority)
+        event = threading.Event()
+        with self._lock:
+            self._enqueue(job, priority, event.set)
+        event.wait()
+        return job
+
+    async def aacquire(self, job: str = None, priority: str = None) -> str:
+        """Waits (without blocking the loop) until a slot is free. Returns the job the slot is charged to."""
+        job, priority = self._resolve(job, priority)
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            waiter = self._enqueue(job, priority, wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                waiter.cancelled = True
+                self.counters["cancelled"] += 1
+                granted = waiter.granted
+                self._dispatch()  # Drops it from the queue head (and the shared pool's view)
+            if granted:
+                self.release(job)
+            raise
+        return job
+
+    def release(self, job: str, tokens: int = 0):
+        with self._lock:
+            self._in_flight -= 1
+            if self._shared_tokens:
+                self.shared.release(self._shared_tokens.pop())
+            if tokens:
+                self._job(job)["tokens"] += max(0, int(tokens))
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, job: str = None, priority: str = None):
+        job = self.acquire(job, priority)
+        usage = {"tokens": 0}
+        try:
+            yield usage
+        finally:
+            self.release(job, usage["tokens"])
+
+    @asynccontextmanager
+    async def aslot(self, job: str = None, priority: str = None):
+        job = await self.aacquire(job, priority)
+        usage = {"tokens": 0}
+        try:
+            yield usage
+        finally:
+            self.release(job, usage["tokens"])
+
+    # --- stats ---
+
+    def stats(self) -> dict:
+        with self._lock:
+            waiting = [w for w in self._heap if not w.cancelled]
+            waits = sorted(self._waits)
+            jobs = {job: dict(record) for job, record in list(self._jobs.items())[-20:]}
+            counters = {"granted": dict(self.counters["granted"]),
+                        "rejected_budget": self.counters["rejected_budget"],
+                        "cancelled": self.counters["cancelled"]}
+            in_flight = self._in_flight
+            shared = {"db": self.shared.path, "in_flight_all_processes": self.shared.in_flight()} if self.shared else None
+
+        def percentile(p):
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 4) if waits else 0.0
+
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": in_flight,
+            "queue_depth": len(waiting),
+            "queue_depth_by_priority": {p: sum(1 for w in waiting if w.priority == p) for p in PRIORITIES},
+            "wait_s": {
+                "count": len(waits),
+                "mean": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p50": percentile(0.50),
+                "p95": percentile(0.95),
+                "max": round(waits[-1], 4) if waits else 0.0,
+            },
+            **counters,
+            "shared": shared,
+            "job_token_budget": self.job_token_budget,
+            "recent_jobs": jobs,
+        }
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> LLMScheduler:
+    """The process-wide scheduler (OLLAMA_MAX_IN_FLIGHT, OLLAMA_JOB_TOKEN_BUDGET, OLLAMA_SLOT_DB)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            shared = None
+            if OLLAMA_SLOT_DB.lower() not in ("", "off", "none"):
+                try:
+                    shared = SharedSlots(OLLAMA_SLOT_DB)
+                except sqlite3.Error as e:
+                    print(f"--- ⚠️ [LLMScheduler] can't open {OLLAMA_SLOT_DB} ({e}); limiting this process only ---")
+            _scheduler = LLMScheduler(
+                max_in_flight=int(os.environ.get("OLLAMA_MAX_IN_FLIGHT", 2)),
+                job_token_budget=int(os.environ.get("OLLAMA_JOB_TOKEN_BUDGET", 0)),
+                shared=shared,
+            )
+        return _scheduler
+
+
+def _response_tokens(last_line: str, prompt_chars: int, text_chars: int) -> int:
+    """Ollama's own token counts from the final stream line, or a chars/4 estimate."""
+    try:
+        final = json.loads(last_line) if last_line else {}
+    except ValueError:
+        final = {}
+    if "eval_count" in final or "prompt_eval_count" in final:
+        return final.get("prompt_eval_count", 0) + final.get("eval_count", 0)
+    return (prompt_chars + text_chars) // 4
+
+
+def _text_of(line: str) -> str:
+    try:
+        item = json.loads(line)
+    except ValueError:
+        return ""
+    return item.get("response") or (item.get("message") or {}).get("content") or ""
+
+
+class ScheduledOllama(Ollama):
+    """
+    Ollama whose every request (generate or chat, sync or async, streamed or
+    not) waits for a slot from get_scheduler() and is charged to the current job.
+    """
+
+    def _create_stream(self, api_url, payload, stop=None, **kwargs):
+        prompt_chars = len(json.dumps(payload.get("prompt") or payload.get("messages") or ""))
+        with get_scheduler().slot() as usage:
+            last_line, text_chars = "", 0
+            for line in super()._create_stream(api_url, payload, stop, **kwargs):
+                if line:
+                    last_line = line
+                    text_chars += len(_text_of(line))
+                yield line
+            usage["tokens"] = _response_tokens(last_line, prompt_chars, text_chars)
+
+    async def _acreate_stream(self, api_url, payload, stop=None, **kwargs):
+        prompt_chars = len(json.dumps(payload.get("prompt") or payload.get("messages") or ""))
+        async with get_scheduler().aslot() as usage:
+            last_line, text_chars = "", 0
+            async for line in super()._acreate_stream(api_url, payload, stop, **kwargs):
+                if line:
+                    last_line = line
+                    text_chars += len(_text_of(line))
+                yield line
+            usage["tokens"] = _response_tokens(last_line, prompt_chars, text_chars)
+
+
+def load_ollama(model: str = "mistral", **kwargs) -> ScheduledOllama:
+    """A scheduled Ollama client for OLLAMA_BASE_URL (default http://localhost:11434)."""
+    return ScheduledOllama(model=model, base_url=os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434"), **kwargs)
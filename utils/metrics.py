@@ -0,0 +1,344 @@
+import os
+import time
+import asyncio
+import inspect
+import functools
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+# --- LATENCY METRICS ---
+# A small, dependency-free Prometheus registry (counters and histograms)
+# plus the hooks the project uses: @timed for graph nodes and tools,
+# install_metrics() for a FastAPI app (route timings + GET /metrics) and
+# instrument_http_clients() for outbound requests/httpx/aiohttp calls.
+# Set METRICS_ENABLED=off to turn every hook into a no-op; decorated
+# functions are then returned unwrapped.
+# This is not an agent tool.
+
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "on").lower() not in ("off", "0", "false")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_text(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+
+    def __init__(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            if "status" in self.labelnames:
+                labels["status"] = status
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    le = 'le="%s"' % bound
+                    lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {cumulative}")
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_label_text(self.labelnames, key, le)} {series[-1]}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, key)} {series[-1]}")
+        return lines
+
+
+class Registry:
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name, help_text, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help_text, labelnames, **kwargs)
+            return metric
+
+    def counter(self, name: str, help_text: str, labelnames: tuple = ()) -> Counter:
+        return self._get_or_create(Counter, name, help_text, labelnames)
+
+    def histogram(self, name: str, help_text: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help_text, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+GRAPH_NODE_SECONDS = REGISTRY.histogram(
+    "research_graph_node_seconds", "Time spent in each ResearchGraph node.", ("node", "status"))
+TOOL_SECONDS = REGISTRY.histogram(
+    "agent_tool_seconds", "Time spent in each agent tool call.", ("tool", "status"))
+HTTP_CLIENT_SECONDS = REGISTRY.histogram(
+    "http_client_request_seconds", "Outbound HTTP request latency.", ("client", "method", "host", "status"))
+HTTP_SERVER_SECONDS = REGISTRY.histogram(
+    "http_server_request_seconds", "Inbound HTTP request latency per route.", ("service", "method", "route", "status"))
+
+
+def timed(histogram: Histogram, **labels):
+    """
+    Times a sync function, coroutine function or async generator into
+    histogram (with a status="ok"/"error" label). No-op when metrics are off.
+    """
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def agen_wrapper(*args, **kwargs):
+                with histogram.time(**labels):
+                    async for item in func(*args, **kwargs):
+                        yield item
+            return agen_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with histogram.time(**labels):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def timed_node(name: str):
+    return timed(GRAPH_NODE_SECONDS, node=name)
+
+
+def timed_tool(name: str):
+    """Put this under @tool(...) so the tool's name, docstring and schema are unchanged."""
+    return timed(TOOL_SECONDS, tool=name)
+
+
+# --- outbound HTTP ---
+
+_instrumented = set()
+_instrument_lock = threading.Lock()
+
+
+def _observe_client(client: str, method: str, url, status, started: float):
+    HTTP_CLIENT_SECONDS.observe(
+        time.perf_counter() - started,
+        client=client, method=method, host=urlsplit(str(url)).netloc or "-", status=str(status)
+    )
+
+
+def instrument_http_clients():
+    """
+    Times every requests, httpx (sync and async) and aiohttp call made in
+    this process, labelled by host. Safe to call more than once.
+    """
+    if not METRICS_ENABLED:
+        return
+    with _instrument_lock:
+        try:
+            import requests
+            if "requests" not in _instrumented:
+                original_send = requests.Session.send
+
+                @functools.wraps(original_send)
+                def send(self, request, **kwargs):
+                    started, status = time.perf_counter(), "error"
+                    try:
+                        response = original_send(self, request, **kwargs)
+                        status = response.status_code
+                        return response
+                    finally:
+                        _observe_client("requests", request.method, request.url, status, started)
+
+                requests.Session.send = send
+                _instrumented.add("requests")
+        except ImportError:
+            pass
+
+        try:
+            import httpx
+            if "httpx" not in _instrumented:
+                original_sync, original_async = httpx.Client.send, httpx.AsyncClient.send
+
+                @functools.wraps(original_sync)
+                def sync_send(self, request, **kwargs):
+                    started, status = time.perf_counter(), "error"
+                    try:
+                        response = original_sync(self, request, **kwargs)
+                        status = response.status_code
+                        return response
+                    finally:
+                        _observe_client("httpx", request.method, request.url, status, started)
+
+                @functools.wraps(original_async)
+                async def async_send(self, request, **kwargs):
+                    started, status = time.perf_counter(), "error"
+                    try:
+                        response = await original_async(self, request, **kwargs)
+                        status = response.status_code
+                        return response
+                    finally:
+                        _observe_client("httpx", request.method, request.url, status, started)
+
+                httpx.Client.send, httpx.AsyncClient.send = sync_send, async_send
+                _instrumented.add("httpx")
+        except ImportError:
+            pass
+
+        try:
+            import aiohttp
+            if "aiohttp" not in _instrumented:
+                original_request = aiohttp.ClientSession._request
+
+                @functools.wraps(original_request)
+                async def request(self, method, url, **kwargs):
+                    started, status = time.perf_counter(), "error"
+                    try:
+                        response = await original_request(self, method, url, **kwargs)
+                        status = response.status
+                        return response
+                    finally:
+                        _observe_client("aiohttp", method, url, status, started)
+
+                aiohttp.ClientSession._request = request
+                _instrumented.add("aiohttp")
+        except ImportError:
+            pass
+
+
+# --- FastAPI ---
+
+class RequestTimer:
+    """
+    Plain ASGI middleware that times each HTTP request until the last body
+    chunk is sent. For a streamed (SSE/NDJSON) response, that is the end of
+    the stream, not the headers. It passes messages through untouched, so
+    client disconnects still reach the streaming generators.
+    """
+
+    def __init__(self, app, service: str):
+        self.app = app
+        self.service = service
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started, status, observed = time.perf_counter(), 500, False
+
+        def observe():
+            nonlocal observed
+            if observed:
+                return
+            observed = True
+            # The route template (e.g. /jobs/{job_id}) keeps label cardinality bounded.
+            path = getattr(scope.get("route"), "path", None) or "unmatched"
+            if path != "/metrics":
+                HTTP_SERVER_SECONDS.observe(
+                    time.perf_counter() - started,
+                    service=self.service, method=scope["method"], route=path, status=str(status)
+                )
+
+        async def timed_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                observe()
+
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            observe()  # An error, or a client that left mid-stream
+
+
+def install_metrics(app, service: str):
+    """
+    Adds per-route timing middleware and a Prometheus GET /metrics endpoint
+    to a FastAPI app, and instruments outbound HTTP clients.
+    """
+    from fastapi.responses import PlainTextResponse
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        if not METRICS_ENABLED:
+            return PlainTextResponse("# metrics disabled (METRICS_ENABLED=off)\n")
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+    if not METRICS_ENABLED:
+        return app
+    instrument_http_clients()
+    app.add_middleware(RequestTimer, service=service)
+    return app
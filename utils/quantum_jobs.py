@@ -0,0 +1,246 @@
+import json
+import time
+import asyncio
+import sqlite3
+
+# --- QUANTUM JOB TRACKER ---
+# quantum_server registers every job it submits (or is asked about) here,
+# and one background task polls the provider for all of them. Each job's
+# interval starts at min_interval_s and grows by BACKOFF_FACTOR per poll
+# that finds no change, up to max_interval_s. A change, or a client
+# waiting on the job, brings it back down. Jobs and their final results
+# live in SQLite, so a finished job is never polled again and unfinished
+# ones resume after a restart. wait() lets /status long-poll until the
+# job's state changes instead of the agent polling in a loop.
+# A job whose polls fail max_poll_errors times in a row (a mistyped id,
+# say) is marked UNKNOWN and no longer polled, here or after a restart;
+# asking for it again gives it another max_poll_errors tries.
+# The provider is a plain callable, poll(job_id) -> {"status", "results"?,
+# "error"?}, run in a thread, so a fake one can stand in for qBraid.
+# This is not an agent tool.
+
+TERMINAL_STATUSES = ("COMPLETED", "FAILED", "CANCELLED", "UNKNOWN")
+GAVE_UP_STATUS = "UNKNOWN"
+BACKOFF_FACTOR = 1.5
+# A status check that takes longer counts as a failed poll
+POLL_TIMEOUT_S = 30.0
+
+
+class JobTracker:
+
+    def __init__(self, poll, db_path: str = "quantum_jobs.sqlite3", min_interval_s: float = 2.0,
+                 max_interval_s: float = 60.0, concurrency: int = 4, max_poll_errors: int = 8,
+                 poll_timeout_s: float = POLL_TIMEOUT_S):
+        self.poll = poll
+        self.db_path = db_path
+        self.min_interval_s = min_interval_s
+        self.max_interval_s = max_interval_s
+        self.concurrency = concurrency
+        self.max_poll_errors = max_poll_errors
+        self.poll_timeout_s = poll_timeout_s
+        self._changed = {}     # job_id -> asyncio.Event set (and replaced) on each state change
+        self._next_poll = {}   # job_id -> (monotonic time of next poll, current interval) for live jobs
+        self._polling = {}     # job_id -> its poll task in flight
+        self._wake = None
+        self._poller = None
+        self.counters = {"polls": 0, "poll_errors": 0, "changes": 0, "cache_hits": 0, "gave_up": 0}
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS quantum_jobs (
+                id TEXT PRIMARY KEY,
+                device_id TEXT,
+                status TEXT,
+                results TEXT,
+                error TEXT,
+                last_poll_error TEXT,
+                polls INTEGER NOT NULL DEFAULT 0,
+                poll_errors INTEGER NOT NULL DEFAULT 0,
+                submitted_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self._db.commit()
+
+    # --- persistence helpers ---
+
+    def _update(self, job_id: str, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._db.execute(f"UPDATE quantum_jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+        self._db.commit()
+
+    def get(self, job_id: str) -> dict:
+        """Returns the tracked job, or None if the id is unknown."""
+        row = self._db.execute("SELECT * FROM quantum_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(row)
+        job["results"] = json.loads(job["results"]) if job["results"] is not None else None
+        job["done"] = job["status"] in TERMINAL_STATUSES
+        return job
+
+    # --- lifecycle ---
+
+    async def start(self):
+        """Resumes polling the unfinished jobs from a previous run and starts the poller."""
+        self._wake = asyncio.Event()
+        rows = self._db.execute(
+            "SELECT id FROM quantum_jobs WHERE status IS NULL OR status NOT IN (?, ?, ?, ?)", TERMINAL_STATUSES
+        ).fetchall()
+        for row in rows:
+            self._schedule(row["id"], 0.0)
+        if rows:
+            print(f"--- [QuantumJobs] Resumed tracking {len(rows)} unfinished jobs from {self.db_path} ---")
+        self._poller = asyncio.create_task(self._poll_loop())
+
+    async def stop(self):
+        if self._poller is not None:
+            self._poller.cancel()
+            await asyncio.gather(self._poller, return_exceptions=True)
+            self._poller = None
+        for task in self._polling.values():
+            task.cancel()
+        await asyncio.gather(*self._polling.values(), return_exceptions=True)
+        self._db.close()
+
+    # --- public API ---
+
+    def track(self, job_id: str, device_id: str = None, status: str = None) -> dict:
+        """Starts tracking a job (a no-op for one already tracked) and returns its record."""
+        now = time.time()
+        inserted = self._db.execute(
+            "INSERT OR IGNORE INTO quantum_jobs (id, device_id, status, submitted_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, device_id, status, now, now)
+        ).rowcount
+        self._db.commit()
+        if inserted and status not in TERMINAL_STATUSES:
+            # A job we only just heard of gets its first poll right away.
+            self._schedule(job_id, 0.0 if status is None else self.min_interval_s)
+        return self.get(job_id)
+
+    async def wait(self, job_id: str, timeout: float) -> dict:
+        """
+        Returns the job once its state differs from what it is now, it is
+        finished, or timeout seconds pass, whichever comes first.
+        """
+        job = self.get(job_id) or self.track(job_id)
+        if job["status"] == GAVE_UP_STATUS:
+            # Asked for again: maybe the provider was down rather than the id wrong
+            self._update(job_id, status=None, poll_errors=0, updated_at=time.time())
+            self._schedule(job_id, 0.0)
+            job = self.get(job_id)
+        if job["done"]:
+            self.counters["cache_hits"] += 1
+            return job
+        if timeout > 0:
+            # Someone is waiting: poll this job at the fastest rate again.
+            next_at, _ = self._next_poll.get(job_id, (float("inf"), None))
+            if job_id not in self._polling and next_at - time.monotonic() > self.min_interval_s:
+                self._schedule(job_id, self.min_interval_s)
+            event = self._changed.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.get(job_id)
+
+    def stats(self) -> dict:
+        counts = dict(self._db.execute("SELECT status, COUNT(*) FROM quantum_jobs GROUP BY status").fetchall())
+        return {"tracking": len(self._next_poll), "jobs_by_status": counts, **self.counters}
+
+    # --- poller ---
+
+    def _schedule(self, job_id: str, delay_s: float, interval_s: float = None):
+        self._next_poll[job_id] = (time.monotonic() + delay_s, interval_s or self.min_interval_s)
+        if self._wake is not None:
+            self._wake.set()
+
+    def _record(self, job_id: str, state: dict):
+        job = self.get(job_id)
+        _, interval = self._next_poll.get(job_id, (0, self.min_interval_s))
+        status = state.get("status")
+        changed = status != job["status"]
+        fields = {"status": status, "polls": job["polls"] + 1, "poll_errors": 0, "last_poll_error": None}
+        if changed:
+            fields["updated_at"] = time.time()
+        if status == "COMPLETED":
+            fields["results"] = json.dumps(state.get("results"))
+        if state.get("error"):
+            fields["error"] = state["error"]
+        self._update(job_id, **fields)
+
+        if status in TERMINAL_STATUSES:
+            self._next_poll.pop(job_id, None)
+        elif changed:
+            self._schedule(job_id, self.min_interval_s)
+        else:
+            interval = min(interval * BACKOFF_FACTOR, self.max_interval_s)
+            self._schedule(job_id, interval, interval)
+        if changed:
+            self.counters["changes"] += 1
+            event = self._changed.pop(job_id, None)
+            if event is not None:
+                event.set()
+
+    async def _poll_one(self, job_id: str, gate: asyncio.Semaphore):
+        try:
+            await self._check(job_id, gate)
+        except Exception as e:
+            # Keep the job polled even if recording its state failed
+            print(f"--- ⚠️ [QuantumJobs] Recording a poll of job {job_id} failed: {e!r} ---")
+            self._schedule(job_id, self.max_interval_s, self.max_interval_s)
+        finally:
+            self._polling.pop(job_id, None)
+            self._wake.set()
+
+    async def _check(self, job_id: str, gate: asyncio.Semaphore):
+        async with gate:
+            self.counters["polls"] += 1
+            try:
+                # The thread of a hung call can't be stopped, but the job stops waiting on it
+                state = await asyncio.wait_for(asyncio.to_thread(self.poll, job_id), self.poll_timeout_s)
+            except Exception as e:
+                self.counters["poll_errors"] += 1
+                job = self.get(job_id)
+                if isinstance(e, asyncio.TimeoutError):
+                    error = f"TimeoutError: no answer to the status check within {self.poll_timeout_s}s"
+                else:
+                    error = f"{type(e).__name__}: {e}"
+                fields = {"polls": job["polls"] + 1, "poll_errors": job["poll_errors"] + 1, "last_poll_error": error}
+                if fields["poll_errors"] >= self.max_poll_errors:
+                    print(f"--- ⚠️ [QuantumJobs] Giving up on job {job_id} after {fields['poll_errors']} failed polls ---")
+                    self.counters["gave_up"] += 1
+                    fields.update(status=GAVE_UP_STATUS, updated_at=time.time(),
+                                  error=f"gave up after {fields['poll_errors']} failed status checks ({error})")
+                    self._next_poll.pop(job_id, None)
+                else:
+                    _, interval = self._next_poll.get(job_id, (0, self.min_interval_s))
+                    interval = min(interval * BACKOFF_FACTOR, self.max_interval_s)
+                    self._schedule(job_id, interval, interval)
+                self._update(job_id, **fields)
+                # Waiters get the error now rather than at their timeout
+                event = self._changed.pop(job_id, None)
+                if event is not None:
+                    event.set()
+                return
+            self._record(job_id, state)
+
+    async def _poll_loop(self):
+        # Each due job's poll is its own task (at most concurrency run at
+        # once), so a slow status check holds up only its own job.
+        gate = asyncio.Semaphore(self.concurrency)
+        while True:
+            self._wake.clear()
+            now = time.monotonic()
+            for job_id in [job_id for job_id, (at, _) in self._next_poll.items()
+                           if at <= now and job_id not in self._polling]:
+                # Parked until its poll finishes and reschedules it
+                self._next_poll[job_id] = (float("inf"), self._next_poll[job_id][1])
+                self._polling[job_id] = asyncio.create_task(self._poll_one(job_id, gate))
+            next_at = min((at for job_id, (at, _) in self._next_poll.items() if job_id not in self._polling),
+                          default=float("inf"))
+            timeout = None if next_at == float("inf") else max(0.0, next_at - now)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
@@ -0,0 +1,155 @@
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+# --- RESEARCH RESULT CACHE ---
+# A persistent cache of finished research runs keyed on the normalised
+# (topic, plan). Exact matches are a primary-key lookup. If an embedding
+# function is given, near-duplicate topics above a cosine similarity
+# threshold are served too. Entries expire after a TTL, and the least
+# recently used ones are evicted past max_entries.
+# This is not an agent tool.
+
+
+def normalise(text: str) -> str:
+    """Lower-cases, collapses whitespace and drops trailing punctuation."""
+    return re.sub(r"\s+", " ", (text or "").lower()).strip().strip(".!?;:,").strip()
+
+
+class ResearchCache:
+
+    def __init__(self, db_path: str = "research_cache.sqlite3", ttl_s: float = 86400,
+                 max_entries: int = 500, similarity_threshold: float = 0.95, embed_fn=None):
+        """
+        embed_fn maps a string to a vector (e.g. MiniLM's embed_query). Leave it
+        None, or set similarity_threshold to 0, for exact-match only.
+        """
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.embed_fn = embed_fn
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS research_cache (
+                key TEXT PRIMARY KEY,
+                topic TEXT NOT NULL,
+                plan TEXT NOT NULL,
+                embedding BLOB,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_hit_at REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self._db.commit()
+        self._vectors = {}  # key -> normalised np.float32 vector, for near-duplicate lookups
+        for key, blob in self._db.execute("SELECT key, embedding FROM research_cache WHERE embedding IS NOT NULL"):
+            self._vectors[key] = np.frombuffer(blob, dtype=np.float32)
+        self.counters = {"hits_exact": 0, "hits_semantic": 0, "misses": 0, "bypassed": 0, "stores": 0, "evictions": 0}
+
+    @property
+    def semantic_enabled(self) -> bool:
+        return self.embed_fn is not None and self.similarity_threshold > 0
+
+    @staticmethod
+    def make_key(topic: str, plan: str) -> str:
+        return hashlib.sha256(f"{normalise(topic)}\0{normalise(plan)}".encode("utf-8")).hexdigest()
+
+    def _embed(self, topic: str, plan: str) -> np.ndarray:
+        vector = np.asarray(self.embed_fn(f"{normalise(topic)}\n{normalise(plan)}"), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _expire(self, now: float):
+        expired = [k for (k,) in self._db.execute(
+            "SELECT key FROM research_cache WHERE created_at < ?", (now - self.ttl_s,))]
+        self._delete(expired)
+
+    def _delete(self, keys: list):
+        if not keys:
+            return
+        self._db.executemany("DELETE FROM research_cache WHERE key = ?", [(k,) for k in keys])
+        self._db.commit()
+        for key in keys:
+            self._vectors.pop(key, None)
+        self.counters["evictions"] += len(keys)
+
+    def _hit(self, key: str, now: float, match: str, similarity: float = 1.0) -> dict:
+        self._db.execute("UPDATE research_cache SET last_hit_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        self._db.commit()
+        row = self._db.execute("SELECT topic, result FROM research_cache WHERE key = ?", (key,)).fetchone()
+        self.counters[f"hits_{match}"] += 1
+        return {"result": json.loads(row[1]), "match": match, "similarity": round(float(similarity), 4), "cached_topic": row[0]}
+
+    def get(self, topic: str, plan: str, bypass: bool = False) -> dict:
+        """
+        Returns {"result", "match", "similarity", "cached_topic"} on a hit,
+        or None on a miss (or when bypass is set).
+        """
+        if bypass:
+            with self._lock:
+                self.counters["bypassed"] += 1
+            return None
+        # Embed outside the lock; it is the only slow part.
+        vector = self._embed(topic, plan) if self.semantic_enabled and self._vectors else None
+        key = self.make_key(topic, plan)
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            if self._db.execute("SELECT 1 FROM research_cache WHERE key = ?", (key,)).fetchone():
+                return self._hit(key, now, "exact")
+            if vector is not None and self._vectors:
+                keys = list(self._vectors)
+                scores = np.stack([self._vectors[k] for k in keys]) @ vector
+                best = int(np.argmax(scores))
+                if scores[best] >= self.similarity_threshold:
+                    return self._hit(keys[best], now, "semantic", scores[best])
+            self.counters["misses"] += 1
+            return None
+
+    def put(self, topic: str, plan: str, result):
+        """Stores (or refreshes) a finished run and evicts down to max_entries."""
+        vector = self._embed(topic, plan) if self.semantic_enabled else None
+        key = self.make_key(topic, plan)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO research_cache (key, topic, plan, embedding, result, created_at, last_hit_at, hits) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (key, topic, plan, vector.tobytes() if vector is not None else None, json.dumps(result), now, now)
+            )
+            self._db.commit()
+            if vector is not None:
+                self._vectors[key] = vector
+            self.counters["stores"] += 1
+            (count,) = self._db.execute("SELECT COUNT(*) FROM research_cache").fetchone()
+            if count > self.max_entries:
+                lru = [k for (k,) in self._db.execute(
+                    "SELECT key FROM research_cache ORDER BY last_hit_at ASC LIMIT ?", (count - self.max_entries,))]
+                self._delete(lru)
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM research_cache")
+            self._db.commit()
+            self._vectors.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            (size,) = self._db.execute("SELECT COUNT(*) FROM research_cache").fetchone()
+            counters = dict(self.counters)
+        hits = counters["hits_exact"] + counters["hits_semantic"]
+        lookups = hits + counters["misses"]
+        return {
+            "size": size,
+            "max_entries": self.max_entries,
+            "ttl_s": self.ttl_s,
+            "similarity_threshold": self.similarity_threshold if self.semantic_enabled else None,
+            **counters,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,410 @@
+import os
+import sys
+import json
+import time
+import uuid
+import queue
+import select
+import signal
+import shutil
+import tempfile
+import threading
+import subprocess
+from utils.sandbox_worker import HEADER
+
+# --- SANDBOX WORKER POOL ---
+# A pool of warm Python subprocesses (utils/sandbox_worker.py) for the code
+# executor. Each job goes to one idle worker over its pipes, so jobs run in
+# parallel across cores and each has its own output buffer. Every job is
+# bounded three ways: CPU time (RLIMIT_CPU, SIGXCPU), address space
+# (RLIMIT_AS) and wall clock (enforced here). A worker that overruns or
+# dies is killed and replaced in the background. Workers are also recycled
+# after SANDBOX_MAX_JOBS jobs. A job's output is capped at
+# SANDBOX_OUTPUT_MAX_BYTES (head and tail kept) inside the worker, and
+# can be streamed to an on_output callback while the job runs.
+# This is not an agent tool.
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+SANDBOX_WORKERS = int(os.environ.get("SANDBOX_WORKERS", os.cpu_count() or 2))
+SANDBOX_CPU_S = float(os.environ.get("SANDBOX_CPU_S", 10.0))
+SANDBOX_WALL_S = float(os.environ.get("SANDBOX_WALL_S", 30.0))
+SANDBOX_MEMORY_MB = int(os.environ.get("SANDBOX_MEMORY_MB", 1024))
+SANDBOX_MAX_JOBS = int(os.environ.get("SANDBOX_MAX_JOBS", 200))
+SANDBOX_PRELOAD = os.environ.get("SANDBOX_PRELOAD", "")  # e.g. "numpy,pandas"
+SANDBOX_QUEUE_TIMEOUT_S = float(os.environ.get("SANDBOX_QUEUE_TIMEOUT_S", 60.0))
+SANDBOX_OUTPUT_MAX_BYTES = int(os.environ.get("SANDBOX_OUTPUT_MAX_BYTES", 256 * 1024))
+
+# --- SESSIONS ---
+# A session is a dedicated worker (outside the pool) whose namespace lives
+# across cells. Each has its own memory cap. Sessions idle longer than
+# SANDBOX_SESSION_IDLE_S are closed, and past SANDBOX_MAX_SESSIONS the
+# least recently used idle session is evicted to make room.
+SANDBOX_MAX_SESSIONS = int(os.environ.get("SANDBOX_MAX_SESSIONS", 8))
+SANDBOX_SESSION_IDLE_S = float(os.environ.get("SANDBOX_SESSION_IDLE_S", 600.0))
+SANDBOX_SESSION_MEMORY_MB = int(os.environ.get("SANDBOX_SESSION_MEMORY_MB", 2048))
+
+
+class WorkerLost(Exception):
+    """The worker exited or timed out mid-job."""
+
+
+class SandboxWorker:
+
+    def __init__(self, memory_mb: int = SANDBOX_MEMORY_MB, preload: str = SANDBOX_PRELOAD):
+        self.workdir = tempfile.mkdtemp(prefix="sandbox_")
+        env = {
+            **os.environ,
+            "SANDBOX_MEMORY_MB": str(memory_mb),
+            "SANDBOX_PRELOAD": preload,
+            # BLAS thread pools reserve address space per thread
+            "OPENBLAS_NUM_THREADS": "1", "OMP_NUM_THREADS": "1", "MKL_NUM_THREADS": "1",
+        }
+        self.process = subprocess.Popen(
+            [sys.executable, "-u", WORKER_SCRIPT], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL, cwd=self.workdir, env=env, start_new_session=True,
+        )
+        self.pid = self.process.pid
+        self.jobs = 0
+        self.ready = None
+
+    def wait_ready(self, timeout: float = 60.0) -> dict:
+        self.ready = self.read_frame(time.monotonic() + timeout)
+        return self.ready
+
+    def send(self, message: dict):
+        data = json.dumps(message).encode("utf-8")
+        try:
+            self.process.stdin.write(HEADER.pack(len(data)) + data)
+            self.process.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            raise WorkerLost(f"worker {self.pid} is gone: {e}")
+
+    def _read_exact(self, size: int, deadline: float) -> bytes:
+        fd = self.process.stdout.fileno()
+        data = b""
+        while len(data) < size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise TimeoutError
+            chunk = os.read(fd, size - len(data))
+            if not chunk:
+                raise WorkerLost(f"worker {self.pid} exited")
+            data += chunk
+        return data
+
+    def read_frame(self, deadline: float) -> dict:
+        (length,) = HEADER.unpack(self._read_exact(HEADER.size, deadline))
+        return json.loads(self._read_exact(length, deadline).decode("utf-8"))
+
+    def alive(self) -> bool:
+        return self.process.poll() is None
+
+    def kill(self):
+        if self.alive():
+            try:
+                os.killpg(self.pid, signal.SIGKILL)  # The job may have started children
+            except ProcessLookupError:
+                pass
+        self.process.wait()
+        for stream in (self.process.stdin, self.process.stdout):
+            try:
+                stream.close()
+            except OSError:
+                pass
+        shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def output_limit(max_output_bytes: int = None) -> int:
+    return min(max_output_bytes or SANDBOX_OUTPUT_MAX_BYTES, SANDBOX_OUTPUT_MAX_BYTES)
+
+
+def run_on_worker(worker: SandboxWorker, job: dict, cpu_s: float, wall_s: float, on_output=None) -> tuple:
+    """
+    Sends job to worker and waits up to wall_s for its result, passing any
+    streamed output to on_output(text) as it arrives. Returns (result,
+    reason): reason is None, or "wall_timeouts" / "cpu_kills" / "crashes"
+    when the worker overran or died and must be replaced.
+    """
+    deadline = time.monotonic() + wall_s
+    try:
+        worker.send({**job, "stream": on_output is not None})
+        while True:
+            frame = worker.read_frame(deadline)
+            if frame.get("status") != "OUTPUT":
+                return frame, None
+            on_output(frame["data"])
+    except TimeoutError:
+        return {"status": "FAILED", "output": "",
+                "error": f"Execution Error: TimeoutError: wall-clock limit of {wall_s}s exceeded"}, "wall_timeouts"
+    except WorkerLost:
+        worker.process.wait()
+        if worker.process.returncode == -signal.SIGXCPU:
+            return {"status": "FAILED", "output": "",
+                    "error": f"Execution Error: TimeoutError: CPU time limit of {cpu_s}s exceeded"}, "cpu_kills"
+        return {"status": "FAILED", "output": "",
+                "error": f"Execution Error: the sandbox worker died (exit code {worker.process.returncode})"}, "crashes"
+
+
+class SandboxPool:
+
+    def __init__(self, size: int = SANDBOX_WORKERS, cpu_s: float = SANDBOX_CPU_S, wall_s: float = SANDBOX_WALL_S,
+                 memory_mb: int = SANDBOX_MEMORY_MB, max_jobs: int = SANDBOX_MAX_JOBS, preload: str = SANDBOX_PRELOAD):
+        self.size = size
+        self.cpu_s = cpu_s
+        self.wall_s = wall_s
+        self.memory_mb = memory_mb
+        self.max_jobs = max_jobs
+        self.preload = preload
+        self._idle = queue.Queue()
+        self._workers = set()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.counters = {"jobs": 0, "completed": 0, "failed": 0, "wall_timeouts": 0, "cpu_kills": 0,
+                         "crashes": 0, "memory_errors": 0, "replaced": 0, "recycled": 0}
+
+    def start(self) -> "SandboxPool":
+        workers = [self._spawn_unready() for _ in range(self.size)]
+        for worker in workers:
+            self._admit(worker)
+        print(f"--- ✅ [SandboxPool] {self.size} workers ready (cpu {self.cpu_s}s, wall {self.wall_s}s, "
+              f"memory {self.memory_mb} MB) ---")
+        return self
+
+    def _spawn_unready(self) -> SandboxWorker:
+        worker = SandboxWorker(self.memory_mb, self.preload)
+        with self._lock:
+            self._workers.add(worker)
+        return worker
+
+    def _admit(self, worker: SandboxWorker):
+        try:
+            ready = worker.wait_ready()
+        except (TimeoutError, WorkerLost) as e:
+            print(f"--- ❌ [SandboxPool] worker {worker.pid} failed to start: {e!r} ---")
+            self._retire(worker)
+            return
+        if ready.get("preload_errors"):
+            print(f"--- ⚠️ [SandboxPool] preload failed in worker {worker.pid}: {ready['preload_errors']} ---")
+        self._idle.put(worker)
+
+    def _retire(self, worker: SandboxWorker):
+        with self._lock:
+            self._workers.discard(worker)
+        worker.kill()
+
+    def _replace(self, worker: SandboxWorker, reason: str):
+        """Kills worker and starts its replacement in the background."""
+        self._retire(worker)
+        with self._lock:
+            if reason == "memory_errors":
+                self.counters["memory_errors"] += 1
+            self.counters["replaced" if reason != "recycled" else "recycled"] += 1
+            if self._closed:
+                return
+        threading.Thread(target=lambda: self._admit(self._spawn_unready()), daemon=True).start()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
+
+    def execute(self, code: str, cpu_s: float = None, wall_s: float = None,
+                max_output_bytes: int = None, on_output=None) -> dict:
+        """
+        Runs code (the body of a function, as /execute has always taken it;
+        the leading indent is optional) on an idle worker. Returns {"status": "COMPLETED"|"FAILED", "output",
+        "output_bytes", "truncated", "error"?, "worker_pid", "seconds"}.
+        """
+        cpu_s = min(cpu_s or self.cpu_s, self.cpu_s)
+        wall_s = min(wall_s or self.wall_s, self.wall_s)
+        try:
+            worker = self._idle.get(timeout=SANDBOX_QUEUE_TIMEOUT_S)
+        except queue.Empty:
+            return {"status": "FAILED", "error": f"Execution Error: no sandbox worker free after {SANDBOX_QUEUE_TIMEOUT_S}s"}
+        self._count("jobs")
+        started = time.monotonic()
+        job = {"code": code, "cpu_s": cpu_s, "max_output_bytes": output_limit(max_output_bytes)}
+        result, reason = run_on_worker(worker, job, cpu_s, wall_s, on_output)
+        if reason is not None:
+            self._count(reason)
+
+        worker.jobs += 1
+        if reason is not None or result.pop("recycle", False):
+            self._replace(worker, reason or "memory_errors")
+        elif worker.jobs >= self.max_jobs:
+            self._replace(worker, "recycled")
+        else:
+            self._idle.put(worker)
+
+        self._count("completed" if result.get("status") == "COMPLETED" else "failed")
+        return {**result, "worker_pid": worker.pid, "seconds": round(time.monotonic() - started, 4)}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "live": len(self._workers), "idle": self._idle.qsize(),
+                    "limits": {"cpu_s": self.cpu_s, "wall_s": self.wall_s, "memory_mb": self.memory_mb,
+                               "output_max_bytes": SANDBOX_OUTPUT_MAX_BYTES},
+                    **self.counters}
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            workers = list(self._workers)
+        for worker in workers:
+            self._retire(worker)
+
+
+class SessionLimitReached(Exception):
+    """Every session slot is busy running a cell or starting its worker."""
+
+
+class SessionStartFailed(RuntimeError):
+    """The session's worker could not be started."""
+
+
+class Session:
+
+    def __init__(self, session_id: str, worker: SandboxWorker, memory_mb: int):
+        self.session_id = session_id
+        self.worker = worker
+        self.memory_mb = memory_mb
+        self.created_at = time.time()
+        self.last_used = time.monotonic()
+        self.cells = 0
+        self.lock = threading.Lock()  # One cell at a time
+
+    def info(self) -> dict:
+        return {"session_id": self.session_id, "pid": self.worker.pid, "cells": self.cells,
+                "memory_mb": self.memory_mb, "idle_s": round(time.monotonic() - self.last_used, 1),
+                "busy": self.lock.locked()}
+
+
+class SessionManager:
+
+    def __init__(self, max_sessions: int = SANDBOX_MAX_SESSIONS, idle_s: float = SANDBOX_SESSION_IDLE_S,
+                 memory_mb: int = SANDBOX_SESSION_MEMORY_MB, cpu_s: float = SANDBOX_CPU_S,
+                 wall_s: float = SANDBOX_WALL_S, preload: str = SANDBOX_PRELOAD):
+        self.max_sessions = max_sessions
+        self.idle_s = idle_s
+        self.memory_mb = memory_mb
+        self.cpu_s = cpu_s
+        self.wall_s = wall_s
+        self.preload = preload
+        self._sessions = {}
+        self._starting = 0  # Slots reserved by create() calls still starting their worker
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.counters = {"created": 0, "closed": 0, "evicted_idle": 0, "evicted_lru": 0, "lost": 0, "cells": 0}
+
+    def start(self) -> "SessionManager":
+        threading.Thread(target=self._reap_idle, name="session-reaper", daemon=True).start()
+        return self
+
+    def _reap_idle(self):
+        while not self._stop.wait(min(30.0, self.idle_s / 2)):
+            now = time.monotonic()
+            expired = []
+            with self._lock:
+                # Claim each one (as create() does for LRU victims), so a cell
+                # starting now finds the session gone instead of losing its worker.
+                for session in list(self._sessions.values()):
+                    if now - session.last_used > self.idle_s and session.lock.acquire(blocking=False):
+                        if now - session.last_used > self.idle_s:
+                            expired.append(self._sessions.pop(session.session_id))
+                            self.counters["evicted_idle"] += 1
+                        else:
+                            session.lock.release()
+            for session in expired:
+                print(f"--- 🧹 [SandboxSessions] closing idle session {session.session_id} ---")
+                session.worker.kill()
+                session.lock.release()
+
+    def create(self, memory_mb: int = None) -> dict:
+        memory_mb = min(memory_mb or self.memory_mb, self.memory_mb)
+        with self._lock:
+            # The slot is reserved here, in the same critical section as the
+            # check, so concurrent creates can't overshoot max_sessions.
+            victim = None
+            if len(self._sessions) + self._starting >= self.max_sessions:
+                # Claim the least recently used idle session; a cell sent to
+                # it from now on finds it gone instead of losing its worker.
+                for session in sorted(self._sessions.values(), key=lambda s: s.last_used):
+                    if session.lock.acquire(blocking=False):
+                        victim = self._sessions.pop(session.session_id)
+                        self.counters["evicted_lru"] += 1
+                        break
+                else:
+                    raise SessionLimitReached(f"all {self.max_sessions} sessions are busy or starting")
+            self._starting += 1
+        if victim is not None:
+            print(f"--- 🧹 [SandboxSessions] evicting least recently used session {victim.session_id} ---")
+            victim.worker.kill()
+            victim.lock.release()
+
+        worker = None
+        try:
+            worker = SandboxWorker(memory_mb, self.preload)
+            worker.wait_ready()
+        except BaseException as e:
+            with self._lock:
+                self._starting -= 1
+            if worker is not None:
+                worker.kill()
+            if isinstance(e, (TimeoutError, WorkerLost)):
+                raise SessionStartFailed(f"session worker failed to start: {e!r}")
+            raise
+        session = Session(uuid.uuid4().hex[:12], worker, memory_mb)
+        with self._lock:
+            self._starting -= 1
+            self._sessions[session.session_id] = session
+            self.counters["created"] += 1
+        return session.info()
+
+    def execute(self, session_id: str, code: str, cpu_s: float = None, wall_s: float = None,
+                max_output_bytes: int = None, on_output=None) -> dict:
+        """Runs a cell in the session. Raises KeyError for an unknown (or closed) session."""
+        with self._lock:
+            session = self._sessions[session_id]
+        cpu_s = min(cpu_s or self.cpu_s, self.cpu_s)
+        wall_s = min(wall_s or self.wall_s, self.wall_s)
+        with session.lock:
+            if session_id not in self._sessions:
+                raise KeyError(session_id)
+            started = time.monotonic()
+            job = {"code": code, "cpu_s": cpu_s, "session": True, "max_output_bytes": output_limit(max_output_bytes)}
+            result, reason = run_on_worker(session.worker, job, cpu_s, wall_s, on_output)
+            session.cells += 1
+            session.last_used = time.monotonic()
+        with self._lock:
+            self.counters["cells"] += 1
+        if reason is not None or result.pop("recycle", False):
+            # The namespace died with the worker (or can't be trusted after a MemoryError)
+            self.close(session_id, reason="lost")
+            result = {**result, "session_lost": True,
+                      "error": f"{result['error']} (session {session_id} was closed; create a new one)"}
+        return {**result, "session_id": session_id, "seconds": round(time.monotonic() - started, 4)}
+
+    def close(self, session_id: str, reason: str = "closed") -> bool:
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self.counters[reason] += 1
+        if session is None:
+            return False
+        session.worker.kill()
+        return True
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = [s.info() for s in self._sessions.values()]
+            starting = self._starting
+            counters = dict(self.counters)
+        return {"live": len(sessions), "starting": starting, "max_sessions": self.max_sessions,
+                "idle_timeout_s": self.idle_s, "sessions": sessions, **counters}
+
+    def shutdown(self):
+        self._stop.set()
+        with self._lock:
+            session_ids = list(self._sessions)
+        for session_id in session_ids:
+            self.close(session_id)
@@ -0,0 +1,220 @@
+import os
+import io
+import ast
+import sys
+import json
+import codecs
+import struct
+import resource
+import textwrap
+import threading
+
+# --- SANDBOX WORKER ---
+# One warm Python process in the code executor's pool (utils/sandbox_pool.py).
+# It runs as a plain script, so it only imports the stdlib, and it reads
+# jobs from stdin and answers on stdout as length-prefixed JSON frames.
+# User code's prints go to a per-job OutputCapture, never to the protocol
+# pipe. It keeps the first and last max_output_bytes / 2 of the output and
+# drops the middle, so a chatty job can't grow the worker or the reply.
+# Jobs with "stream" set also send their output as OUTPUT frames while
+# they run; the frames add up to exactly the (truncated) final output.
+# A flusher thread sends what is pending every STREAM_INTERVAL_S, so a
+# print followed by a long computation reaches the caller right away.
+# Jobs with "session" set run in the worker's persistent namespace.
+# The address-space limit (SANDBOX_MEMORY_MB) is set once at start-up;
+# before each job the worker raises its CPU-time soft limit to (CPU used so far + the job's budget), so
+# a runaway job gets SIGXCPU and the parent replaces the process.
+# This is not an agent tool.
+
+HEADER = struct.Struct(">I")
+STREAM_CHUNK_BYTES = 4096
+STREAM_INTERVAL_S = 0.1
+
+# A session worker keeps one namespace for its whole life; its cells run at
+# the top level of it, so imports and variables carry over between cells.
+# One-off jobs run as the body of a function instead, so a bare `return`
+# ends a one-off job but is a SyntaxError in a session cell.
+SESSION_GLOBALS = {"__name__": "__session__"}
+
+
+def read_exact(stream, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def read_frame(stream):
+    header = read_exact(stream, HEADER.size)
+    if header is None:
+        return None
+    (length,) = HEADER.unpack(header)
+    return json.loads(read_exact(stream, length).decode("utf-8"))
+
+
+def write_frame(stream, message: dict):
+    data = json.dumps(message).encode("utf-8")
+    stream.write(HEADER.pack(len(data)) + data)
+    stream.flush()
+
+
+def cpu_seconds_used() -> float:
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+class OutputCapture(io.TextIOBase):
+    """A head + tail byte buffer for a job's stdout/stderr; emit(text) streams it."""
+
+    def __init__(self, max_bytes: int, emit=None):
+        self.head_cap = max_bytes // 2
+        self.tail_cap = max_bytes - self.head_cap
+        self.head, self.tail = bytearray(), bytearray()
+        self.total = 0
+        self.emit = emit
+        self.pending = bytearray()
+        self.decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self.lock = threading.RLock()  # Shared by the job's writes and the flusher thread
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        data = text.encode("utf-8", "replace")
+        with self.lock:
+            self.total += len(data)
+            room = self.head_cap - len(self.head)
+            if room > 0:
+                self.head += data[:room]
+                self.pending += data[:room]
+                data = data[room:]
+            if data:
+                self.tail += data
+                del self.tail[:max(0, len(self.tail) - self.tail_cap)]
+            if len(self.pending) >= STREAM_CHUNK_BYTES:
+                self.flush()
+        return len(text)
+
+    def flush(self):
+        with self.lock:
+            if self.emit and self.pending:
+                text = self.decoder.decode(bytes(self.pending))
+                if text:
+                    self.emit(text)
+            self.pending.clear()
+
+    def flush_every(self, interval_s: float, stop: threading.Event):
+        """The flusher thread's loop: flushes every interval_s until stop is set."""
+        while not stop.wait(interval_s):
+            self.flush()
+
+    @property
+    def omitted(self) -> int:
+        return self.total - len(self.head) - len(self.tail)
+
+    def rest(self) -> str:
+        """Everything after the head: the omission marker (if any) and the tail."""
+        marker = f"\n... [{self.omitted} bytes of output omitted] ...\n" if self.omitted else ""
+        return marker + self.tail.decode("utf-8", "ignore")
+
+    def getvalue(self) -> str:
+        return self.head.decode("utf-8", "ignore") + self.rest()
+
+    def finish(self) -> dict:
+        """Streams whatever is left and returns the result fields for the output."""
+        with self.lock:
+            self.flush()
+            if self.emit and (self.tail or self.omitted):
+                self.emit(self.rest())
+            return {"output": self.getvalue(), "output_bytes": self.total, "truncated": bool(self.omitted)}
+
+
+def session_cell(code: str) -> ast.Module:
+    """A session cell's code; a cell sent with a common leading indent is dedented."""
+    try:
+        return ast.parse(code, "<string>")
+    except IndentationError:
+        return ast.parse(textwrap.dedent(code), "<string>")
+
+
+def function_job(code: str) -> ast.Module:
+    """
+    A one-off job: code as the body of sandboxed_execution(), then the call.
+    Unindented code is parsed and put into the function as a tree, so its
+    text (string literals included) is never rewritten. Indented code, as
+    /execute has always taken it, is placed under the def as is.
+    """
+    try:
+        body = ast.parse(code, "<string>").body
+    except IndentationError:
+        return ast.parse(f"def sandboxed_execution():\n{code}\n_output = sandboxed_execution()", "<string>")
+    module = ast.parse("def sandboxed_execution():\n    pass\n_output = sandboxed_execution()")
+    if body:
+        module.body[0].body = body
+    return ast.fix_missing_locations(module)
+
+
+def run_job(job: dict, replies=None) -> dict:
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    soft = int(cpu_seconds_used() + job["cpu_s"]) + 1
+    resource.setrlimit(resource.RLIMIT_CPU, (soft if hard == resource.RLIM_INFINITY else min(soft, hard), hard))
+
+    emit = (lambda text: write_frame(replies, {"status": "OUTPUT", "data": text})) if job.get("stream") else None
+    output = OutputCapture(job["max_output_bytes"], emit)
+    stop_flusher = threading.Event()
+    if emit:
+        flusher = threading.Thread(target=output.flush_every, args=(STREAM_INTERVAL_S, stop_flusher), daemon=True)
+        flusher.start()
+    sys.stdout = sys.stderr = output
+    try:
+        if job.get("session"):
+            exec(compile(session_cell(job["code"]), "<string>", "exec"), SESSION_GLOBALS)
+        else:
+            # We wrap the code in a function so that 'exec' doesn't pollute the global scope
+            exec(compile(function_job(job["code"]), "<string>", "exec"), {})
+        result = {"status": "COMPLETED"}
+    except MemoryError:
+        result = {"status": "FAILED", "error": "Execution Error: MemoryError: memory limit exceeded", "recycle": True}
+    except BaseException as e:  # SystemExit from user code ends the job, not the worker
+        result = {"status": "FAILED", "error": f"Execution Error: {type(e).__name__}: {str(e)}"}
+    finally:
+        sys.stdout, sys.stderr = sys.__stdout__, sys.__stderr__
+        stop_flusher.set()
+        if emit:
+            flusher.join()
+    return {**result, **output.finish()}
+
+def main():
+    # Keep the protocol on private copies of stdin/stdout and point fds 0-2
+    # at /dev/null, so neither user code nor C extensions can corrupt it.
+    requests = os.fdopen(os.dup(0), "rb", buffering=0)
+    replies = os.fdopen(os.dup(1), "wb")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+
+    memory_mb = int(os.environ.get("SANDBOX_MEMORY_MB", 0))
+    if memory_mb:
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+    preload_errors = []
+    for module in filter(None, (m.strip() for m in os.environ.get("SANDBOX_PRELOAD", "").split(","))):
+        try:
+            __import__(module)
+        except Exception as e:
+            preload_errors.append(f"{module}: {type(e).__name__}: {e}")
+
+    write_frame(replies, {"status": "READY", "pid": os.getpid(), "preload_errors": preload_errors})
+    while True:
+        job = read_frame(requests)
+        if job is None:
+            return
+        write_frame(replies, run_job(job, replies))
+
+
+if __name__ == "__main__":
+    main()
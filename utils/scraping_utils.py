@@ -1,18 +1,251 @@
-import requests
-from bs4 import BeautifulSoup
+import os
+import time
+import codecs
+import asyncio
+import threading
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+import httpx
+from utils.http_cache import aconditional
 
-def scrape_website(url: str) -> str:
+# --- SCRAPING ENGINE ---
+# One pooled httpx client per event loop, with a per-host concurrency limit
+# and a minimum gap between requests to the same host. Every fetch has a
+# hard timeout and streams its body under a byte cap. Page text comes from
+# a streaming html.parser pass that never builds a tree and stops reading
+# the response as soon as it has MAX_WORDS words.
+# Sync callers (the agent tools) share one background loop via run_sync(),
+# so they keep the connection pool between calls too. Scraped text goes
+# through the shared response cache (source "web"), revalidated with the
+# page's ETag / Last-Modified.
+# This is not an agent tool.
+
+USER_AGENT = "Mozilla/5.0"
+SCRAPE_TIMEOUT_S = float(os.environ.get("SCRAPE_TIMEOUT_S", 15.0))
+SCRAPE_MAX_BYTES = int(os.environ.get("SCRAPE_MAX_BYTES", 2_000_000))
+SCRAPE_PER_HOST = int(os.environ.get("SCRAPE_PER_HOST", 4))
+SCRAPE_HOST_INTERVAL_S = float(os.environ.get("SCRAPE_HOST_INTERVAL_S", 0.2))
+SCRAPE_RETRIES = int(os.environ.get("SCRAPE_RETRIES", 2))  # connection failures only
+MAX_WORDS = 500
+
+SKIPPED_TAGS = {"script", "style", "noscript", "template"}
+
+
+class TextExtractor(HTMLParser):
+    """Collects the words of a page outside <script>/<style>, up to max_words."""
+
+    def __init__(self, max_words: int = MAX_WORDS):
+        super().__init__(convert_charrefs=True)
+        self.max_words = max_words
+        self.words = []
+        self._skip_depth = 0
+
+    @property
+    def done(self) -> bool:
+        return len(self.words) >= self.max_words
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+
+    def handle_data(self, data):
+        if not self._skip_depth and not self.done:
+            self.words.extend(data.split())
+
+    def text(self) -> str:
+        return " ".join(self.words[:self.max_words])
+
+
+class ScrapeEngine:
+    """The pooled client and per-host gates for one event loop."""
+
+    def __init__(self, per_host: int = SCRAPE_PER_HOST, host_interval_s: float = SCRAPE_HOST_INTERVAL_S,
+                 timeout_s: float = SCRAPE_TIMEOUT_S, max_bytes: int = SCRAPE_MAX_BYTES):
+        self.per_host = per_host
+        self.host_interval_s = host_interval_s
+        self.timeout_s = timeout_s
+        self.max_bytes = max_bytes
+        self.client = httpx.AsyncClient(
+            headers={"User-Agent": USER_AGENT},
+            follow_redirects=True,
+            timeout=httpx.Timeout(timeout_s, connect=5.0),
+            transport=httpx.AsyncHTTPTransport(
+                retries=SCRAPE_RETRIES,
+                limits=httpx.Limits(max_connections=64, max_keepalive_connections=16, keepalive_expiry=30.0),
+            ),
+        )
+        self._semaphores = {}
+        self._next_start = {}
+
+    async def _host_turn(self, host: str):
+        """Waits until host_interval_s has passed since the last request to host started."""
+        now = time.monotonic()
+        start = max(now, self._next_start.get(host, 0.0))
+        self._next_start[host] = start + self.host_interval_s
+        if start > now:
+            await asyncio.sleep(start - now)
+
+    async def stream(self, url: str, consume, headers: dict = None):
+        """
+        GETs url under the host's limits and the hard timeout, handing each
+        decoded text chunk to consume(chunk) until it returns True or the
+        byte cap is reached. Returns the response (body not kept).
+        """
+        host = urlsplit(url).netloc
+        semaphore = self._semaphores.setdefault(host, asyncio.Semaphore(self.per_host))
+        async with asyncio.timeout(self.timeout_s):
+            async with semaphore:
+                await self._host_turn(host)
+                async with self.client.stream("GET", url, headers=headers) as response:
+                    if response.status_code == 200:
+                        decoder = codecs.getincrementaldecoder(response.encoding or "utf-8")(errors="replace")
+                        received = 0
+                        async for chunk in response.aiter_bytes():
+                            chunk = chunk[:self.max_bytes - received]
+                            received += len(chunk)
+                            if consume(decoder.decode(chunk)) or received >= self.max_bytes:
+                                break
+                        consume(decoder.decode(b"", final=True))
+                    return response
+
+    async def fetch(self, url: str, headers: dict = None) -> tuple:
+        """(response, body text up to the byte cap); the text is '' unless the status is 200."""
+        parts = []
+        response = await self.stream(url, lambda chunk: parts.append(chunk), headers)
+        return response, "".join(parts)
+
+    async def fetch_text(self, url: str, headers: dict = None) -> tuple:
+        """(status code, body text up to the byte cap)."""
+        response, text = await self.fetch(url, headers)
+        return response.status_code, text
+
+    async def extract(self, url: str, max_words: int = MAX_WORDS, headers: dict = None) -> tuple:
+        """(response, the first max_words words of the page's text)."""
+        extractor = TextExtractor(max_words)
+
+        def consume(chunk):
+            extractor.feed(chunk)
+            return extractor.done
+
+        response = await self.stream(url, consume, headers)
+        extractor.close()
+        return response, extractor.text()
+
+    async def scrape(self, url: str, max_words: int = MAX_WORDS) -> str:
+        response, text = await self.extract(url, max_words)
+        if response.status_code != 200:
+            return f"Error: Failed to retrieve content from {url}"
+        return text
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+async def _close_at_shutdown(registry: dict, lock, key, resource):
+    # An async generator parked at its yield: the loop's shutdown_asyncgens()
+    # (run by asyncio.run and uvicorn on exit) closes it, running the finally.
+    try:
+        yield
+    finally:
+        with lock:
+            registry.pop(key, None)
+        await resource.aclose()
+
+
+def loop_local(registry: dict, lock, factory, name=None):
     """
-    A helper function to scrape text content from a URL.
-    This is not an agent tool.
+    The object factory() made for (running event loop, name), made on first
+    use. It is aclose()d when that loop shuts down, so its connection pool
+    doesn't outlive the loop. Entries of loops closed without a shutdown
+    are dropped.
     """
+    loop = asyncio.get_running_loop()
+    key = (loop, name)
+    with lock:
+        for other in [k for k in registry if k[0].is_closed()]:
+            del registry[other]
+        if key not in registry:
+            resource = factory()
+            closer = _close_at_shutdown(registry, lock, key, resource)
+            loop.create_task(closer.__anext__())  # Registers it with the loop and runs it to the yield
+            registry[key] = (resource, closer)
+        return registry[key][0]
+
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine() -> ScrapeEngine:
+    """The ScrapeEngine for the running event loop, made on first use."""
+    return loop_local(_engines, _engines_lock, ScrapeEngine)
+
+
+_sync_loop = None
+_sync_loop_lock = threading.Lock()
+
+
+def run_sync(coro, timeout: float = None):
+    """Runs coro on the shared background loop and waits for its result."""
+    global _sync_loop
+    with _sync_loop_lock:
+        if _sync_loop is None:
+            _sync_loop = asyncio.new_event_loop()
+            threading.Thread(target=_sync_loop.run_forever, name="scraping-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _sync_loop).result(timeout)
+
+
+def validators(response) -> dict:
+    """The response's cache validators, for conditional revalidation."""
+    return {"etag": response.headers.get("etag"), "last_modified": response.headers.get("last-modified")}
+
+
+async def afetch_text(url: str, headers: dict = None) -> tuple:
+    return await get_engine().fetch_text(url, headers)
+
+
+async def acached_page(source: str, url: str, parse):
+    """
+    parse(html) for the page at url, cached under source and revalidated
+    with the page's validators. parse's result must be JSON-serialisable.
+    """
+    async def fetch(headers):
+        response, html = await get_engine().fetch(url, headers)
+        return response.status_code, parse(html) if response.status_code == 200 else None, validators(response)
+    return await aconditional(source, (url,), fetch)
+
+
+async def ascrape_website(url: str, max_words: int = MAX_WORDS) -> str:
+    """
+    Async scrape_website: the first max_words words of the page's text,
+    or an "Error ..." string.
+    """
+    async def fetch(headers):
+        response, text = await get_engine().extract(url, max_words, headers)
+        if response.status_code not in (200, 304):
+            text = f"Error: Failed to retrieve content from {url}"
+        return response.status_code, text, validators(response)
+
     try:
-        response = requests.get(url, headers={'User-Agent': 'Mozilla/5.0'})
-        if response.status_code != 200:
-            return f"Error: Failed to retrieve content from {url}"
-        soup = BeautifulSoup(response.content, 'html.parser')
-        for script in soup(["script", "style"]): script.decompose()
-        text = soup.get_text(separator=' ', strip=True)
-        return ' '.join(text.split()[:500])
+        return await aconditional("web", (url, max_words), fetch)
+    except TimeoutError:
+        return f"Error scraping {url}: timed out after {SCRAPE_TIMEOUT_S}s"
     except Exception as e:
         return f"Error scraping {url}: {e}"
+
+
+async def ascrape_many(urls: list, max_words: int = MAX_WORDS) -> list:
+    """Scrapes all urls concurrently (within the per-host limits); results are in input order."""
+    return await asyncio.gather(*(ascrape_website(url, max_words) for url in urls))
+
+
+def scrape_website(url: str) -> str:
+    """
+    A helper function to scrape text content from a URL.
+    This is not an agent tool.
+    """
+    return run_sync(ascrape_website(url))
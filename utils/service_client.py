@@ -0,0 +1,81 @@
+import os
+import asyncio
+import functools
+import threading
+import httpx
+from utils.scraping_utils import run_sync, loop_local
+
+# --- SERVICE CLIENTS ---
+# Pooled async clients for the project's own microservices (quantum
+# server, code executor). There is one keep-alive client per (event loop,
+# base URL), so a tool called from the ResearchGraph's loop, a crew's loop
+# or the shared run_sync() loop reuses its connections instead of opening
+# new ones per call. Connection failures are retried by the transport (the
+# request never reached the server). Idempotent calls are also retried on
+# 502/503/504 with a short backoff.
+# async_tool() gives an async @tool the thin sync wrapper that the sync
+# callers (CrewAI, .invoke()) need.
+# This is not an agent tool.
+
+SERVICE_RETRIES = int(os.environ.get("SERVICE_RETRIES", 2))
+SERVICE_RETRY_BACKOFF_S = 0.5
+RETRY_STATUSES = {502, 503, 504}
+
+
+class ServiceClient:
+
+    def __init__(self, base_url: str, timeout_s: float, retries: int = SERVICE_RETRIES):
+        self.base_url = base_url
+        self.retries = retries
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(timeout_s, connect=5.0),
+            transport=httpx.AsyncHTTPTransport(
+                retries=retries,
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=8, keepalive_expiry=30.0),
+            ),
+        )
+
+    async def request(self, method: str, path: str, idempotent: bool = None, **kwargs) -> httpx.Response:
+        """Sends the request and raises for an error status. idempotent defaults to method == "GET"."""
+        idempotent = method == "GET" if idempotent is None else idempotent
+        for attempt in range(self.retries + 1):
+            response = await self.client.request(method, path, **kwargs)
+            if not idempotent or response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                break
+            await asyncio.sleep(SERVICE_RETRY_BACKOFF_S * 2 ** attempt)
+        response.raise_for_status()
+        return response
+
+    async def get_json(self, path: str, **kwargs):
+        return (await self.request("GET", path, **kwargs)).json()
+
+    async def post_json(self, path: str, payload: dict, idempotent: bool = False, **kwargs):
+        return (await self.request("POST", path, idempotent=idempotent, json=payload, **kwargs)).json()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_service_client(base_url: str, timeout_s: float) -> ServiceClient:
+    """The ServiceClient for base_url on the running event loop (closed with the loop)."""
+    return loop_local(_clients, _clients_lock, lambda: ServiceClient(base_url, timeout_s), base_url)
+
+
+def async_tool(tool):
+    """
+    Lets an async @tool also be called synchronously: the sync entry point
+    runs the coroutine on the shared run_sync() loop. Returns the tool.
+    """
+    coroutine = tool.coroutine
+
+    @functools.wraps(coroutine)
+    def func(*args, **kwargs):
+        return run_sync(coroutine(*args, **kwargs))
+
+    tool.func = func
+    return tool